@@ -0,0 +1,217 @@
+from typing import (Callable, Dict, List, Optional)
+from pathlib import Path
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+# Allow running the script directly from a checkout
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import sqlparse
+
+from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer
+from sql_analyzer.backends import DEFAULT_BACKEND
+from benchmarks.synthetic import generate_corpus
+
+# Metrics compared against a baseline run; higher values are worse for all of them
+COMPARED_METRICS = ("total_seconds", "p50_ms", "p99_ms", "peak_memory_kib")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Returns the nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(items: List, func: Callable, track_memory: bool = True, repeat: int = 1) -> Dict[str, float]:
+    """
+    Runs func on every item and reports wall time, latency percentiles and peak memory.
+
+    Latencies are measured without tracing, keeping the fastest of repeat runs for each
+    item to filter out scheduling noise; peak memory is measured in a separate pass with
+    tracemalloc, which would otherwise distort the timings.
+
+    Args:
+        items (List): The inputs of the stage, one per query.
+        func (Callable): The stage to measure.
+        track_memory (bool): Whether to run the memory pass.
+        repeat (int): The number of timed runs per item.
+
+    Returns:
+        Dict[str, float]: The stage statistics.
+    """
+    latencies = [float("inf")] * len(items)
+    failures = 0
+    for _ in range(repeat):
+        failures = 0
+        for index, item in enumerate(items):
+            start = time.perf_counter()
+            try:
+                func(item)
+            except Exception:
+                failures += 1
+            latencies[index] = min(latencies[index], time.perf_counter() - start)
+    latencies.sort()
+
+    peak = 0
+    if track_memory:
+        tracemalloc.start()
+        for item in items:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            try:
+                func(item)
+            except Exception:
+                pass
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+    return {
+        "queries": len(items),
+        "failures": failures,
+        "total_seconds": sum(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p90_ms": percentile(latencies, 0.90) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1e3,
+        "peak_memory_kib": peak / 1024,
+    }
+
+
+def run_suite(queries: List[str], track_memory: bool = True, repeat: int = 1) -> Dict[str, Dict[str, float]]:
+    """
+    Measures tokenization, parsing, every registered analyzer and the full analysis.
+
+    Each analyzer is timed on its own against a RawSQLAnalyzer built from the already
+    parsed statement, so that its figures exclude the parse.
+
+    Args:
+        queries (List[str]): The corpus.
+        track_memory (bool): Whether to measure peak memory.
+        repeat (int): The number of timed runs per query.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The statistics of each stage.
+    """
+    stages = {
+        "tokenize": measure(queries, DEFAULT_BACKEND.tokenize, track_memory, repeat),
+        "parse": measure(queries, DEFAULT_BACKEND.parse, track_memory, repeat),
+    }
+
+    statements = []
+    for query in queries:
+        try:
+            statements.append(DEFAULT_BACKEND.parse(query))
+        except Exception:
+            pass
+
+    for name in RawSQLAnalyzer._analyzer_names():
+        stages[name] = measure(
+            statements,
+            lambda statement, name=name: RawSQLAnalyzer.from_statement(statement).run_analyzer(name),
+            track_memory,
+            repeat,
+        )
+
+    stages["perform_full_analysis"] = measure(
+        queries, lambda query: RawSQLAnalyzer(query).perform_full_analysis(), track_memory, repeat)
+    return stages
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Lists the stage metrics that got worse than the baseline by more than threshold.
+
+    Args:
+        current (Dict): The results of this run.
+        baseline (Dict): The results of a previous run, as written by --output.
+        threshold (float): The tolerated relative increase, e.g. 0.2 for 20%.
+
+    Returns:
+        List[str]: A description of each regression.
+    """
+    regressions = []
+    for stage, stats in current["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric, 0), stats.get(metric, 0)
+            if before > 0 and after > before * (1 + threshold):
+                regressions.append(f"{stage}.{metric}: {before:.3f} -> {after:.3f} (+{after / before - 1:.0%})")
+    return regressions
+
+
+def print_report(stages: Dict[str, Dict[str, float]]) -> None:
+    """
+    Prints the statistics of each stage as a table.
+    """
+    print(f"{'stage':<38}{'total s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'peak KiB':>11}")
+    for stage, stats in stages.items():
+        print(f"{stage:<38}{stats['total_seconds']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p90_ms']:>10.3f}"
+              f"{stats['p99_ms']:>10.3f}{stats['max_ms']:>10.3f}{stats['peak_memory_kib']:>11.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark parsing and every RawSQLAnalyzer analyzer.")
+    parser.add_argument("--queries", type=int, default=500, help="Number of synthetic queries.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus.")
+    parser.add_argument("--max-nesting-depth", type=int, default=3)
+    parser.add_argument("--max-join-width", type=int, default=4)
+    parser.add_argument("--max-in-list-length", type=int, default=50)
+    parser.add_argument("--max-cte-count", type=int, default=2)
+    parser.add_argument("--statement-count", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per query; the fastest is kept.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory measurement.")
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file.")
+    parser.add_argument("--compare", type=Path, help="JSON results of a previous run to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative increase reported as a regression (default: 0.2).")
+    args = parser.parse_args(argv)
+
+    corpus_options = {
+        "seed": args.seed,
+        "max_nesting_depth": args.max_nesting_depth,
+        "max_join_width": args.max_join_width,
+        "max_in_list_length": args.max_in_list_length,
+        "max_cte_count": args.max_cte_count,
+        "statement_count": args.statement_count,
+    }
+    queries = generate_corpus(args.queries, **corpus_options)
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlparse": sqlparse.__version__,
+            "platform": platform.platform(),
+            "queries": args.queries,
+            "repeat": args.repeat,
+            "corpus": corpus_options,
+        },
+        "stages": run_suite(queries, track_memory=not args.no_memory, repeat=args.repeat),
+    }
+    print_report(results["stages"])
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("meta", {}).get("corpus") != corpus_options:
+            print("warning: the baseline was run on a different corpus")
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
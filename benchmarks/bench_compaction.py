@@ -0,0 +1,101 @@
+from typing import (Dict, List)
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+# Allow running the script directly from a checkout
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sql_analyzer import utils
+from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer
+
+
+def in_list_query(size: int) -> str:
+    """
+    Builds a SELECT filtering on an IN list of size integers.
+    """
+    values = ", ".join(str(i) for i in range(size))
+    return f"SELECT a, COUNT(b) FROM t JOIN u ON t.id = u.id WHERE a IN ({values}) GROUP BY a"
+
+
+def values_query(size: int) -> str:
+    """
+    Builds an INSERT of size rows of literals.
+    """
+    rows = ", ".join(f"({i}, 'name {i}', {i * 0.5}, NULL)" for i in range(size))
+    return f"INSERT INTO t (id, name, score, note) VALUES {rows}"
+
+
+def run(query: str, compact_literals: bool, repeat: int) -> Dict:
+    """
+    Analyzes a query, keeping the best time of repeat runs, and measures peak memory
+    in a separate traced run.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = RawSQLAnalyzer(query, compact_literals=compact_literals).perform_full_analysis()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    RawSQLAnalyzer(query, compact_literals=compact_literals).perform_full_analysis()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": best, "peak_memory_kib": peak / 1024, "result": result}
+
+
+def compare(kind: str, sizes: List[int], repeat: int) -> List[Dict]:
+    """
+    Times full analyses of growing IN lists or VALUES blocks with and without compaction.
+    """
+    build = in_list_query if kind == "in_list" else values_query
+    reports = []
+    for size in sizes:
+        query = build(size)
+        plain = run(query, False, repeat)
+        compacted = run(query, True, repeat)
+        start = time.perf_counter()
+        utils.compact_literal_runs(query)
+        reports.append({
+            "kind": kind,
+            "size": size,
+            "query_bytes": len(query),
+            "plain_seconds": plain["seconds"],
+            "compacted_seconds": compacted["seconds"],
+            "compaction_seconds": time.perf_counter() - start,
+            "plain_peak_memory_kib": plain["peak_memory_kib"],
+            "compacted_peak_memory_kib": compacted["peak_memory_kib"],
+            "same_result": plain["result"] == compacted["result"],
+        })
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the literal-run compaction pre-pass.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000],
+                        help="Numbers of IN list elements and VALUES rows.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions; the best run is kept.")
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    reports = compare("in_list", args.sizes, args.repeat) + compare("values", args.sizes, args.repeat)
+    print(f"{'kind':<8} {'size':>6} {'bytes':>9} {'plain':>9} {'compacted':>10} "
+          f"{'plain peak':>11} {'compacted peak':>15}  same result")
+    for report in reports:
+        print(f"{report['kind']:<8} {report['size']:>6} {report['query_bytes']:>9} "
+              f"{report['plain_seconds']:>8.4f}s {report['compacted_seconds']:>9.4f}s "
+              f"{report['plain_peak_memory_kib']:>8.0f}KiB {report['compacted_peak_memory_kib']:>12.0f}KiB"
+              f"  {report['same_result']}")
+    if not all(report["same_result"] for report in reports):
+        print("Results differ where the plain analysis exceeded the grouping limit of sqlparse "
+              "and lost the metrics that need the parse tree.")
+
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
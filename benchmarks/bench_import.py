@@ -0,0 +1,94 @@
+from typing import (Dict, List, Tuple)
+from pathlib import Path
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Statements run in a fresh interpreter, from the cheapest entry point to a full analysis
+SCENARIOS: List[Tuple[str, str]] = [
+    ("sqlparse", "import sqlparse"),
+    ("package", "import sql_analyzer"),
+    ("analyze_text", "from sql_analyzer.text import analyze_text; analyze_text('SELECT a FROM t JOIN u ON t.id = u.id')"),
+    ("analyzer_import", "from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer"),
+    ("first_analysis", "from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer; "
+                       "RawSQLAnalyzer('SELECT a FROM t JOIN u ON t.id = u.id').perform_full_analysis()"),
+    ("cli_import", "import sql_analyzer.cli"),
+]
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """
+    Reads the output of python -X importtime into the cumulative microseconds of each
+    top-level import.
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def run_once(statement: str) -> Dict:
+    """
+    Runs a statement in a fresh interpreter with -X importtime.
+    """
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                             capture_output=True, text=True, env=env, cwd=ROOT, check=True)
+    wall = time.perf_counter() - start
+    imports = parse_importtime(process.stderr)
+    loaded = {line.rsplit("|", 1)[-1].strip() for line in process.stderr.splitlines() if "|" in line}
+    return {
+        "wall_seconds": wall,
+        "import_us": sum(cumulative for name, cumulative in imports.items()
+                         if name not in ("site", "encodings") and not name.startswith("encodings.")),
+        "loads_sqlparse": "sqlparse" in loaded,
+    }
+
+
+def run(repeat: int) -> List[Dict]:
+    """
+    Runs every scenario repeat times and keeps the medians.
+    """
+    reports = []
+    for name, statement in SCENARIOS:
+        runs = [run_once(statement) for _ in range(repeat)]
+        reports.append({
+            "scenario": name,
+            "statement": statement,
+            "wall_ms": statistics.median(r["wall_seconds"] for r in runs) * 1000,
+            "import_ms": statistics.median(r["import_us"] for r in runs) / 1000,
+            "loads_sqlparse": any(r["loads_sqlparse"] for r in runs),
+        })
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the startup cost of the entry points with python -X importtime.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per scenario; medians are kept.")
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    reports = run(args.repeat)
+    print(f"{'scenario':<16} {'imports':>9} {'process':>9}  loads sqlparse")
+    for report in reports:
+        print(f"{report['scenario']:<16} {report['import_ms']:>7.1f}ms {report['wall_ms']:>7.1f}ms  "
+              f"{report['loads_sqlparse']}")
+
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from typing import (Dict, List, Optional)
+from itertools import cycle, islice
+from pathlib import Path
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import time
+
+# Allow running the script directly from a checkout
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer
+from benchmarks.synthetic import generate_corpus
+
+
+def current_rss_kib() -> Optional[float]:
+    """
+    Returns the resident set size of the process, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_kib() -> float:
+    """
+    Returns the peak resident set size of the process.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == "darwin" else float(peak)
+
+
+def run(queries: int, results_only: bool, retain: bool, samples: int, distinct: int) -> Dict:
+    """
+    Analyzes queries drawn in turn from a pool of distinct synthetic queries, optionally
+    keeping every analyzer alive next to its result as pipelines do, and samples the RSS.
+    """
+    pool = generate_corpus(distinct)
+    retained: List[RawSQLAnalyzer] = []
+    every = max(1, queries // samples)
+    rss = []
+    gc.collect()
+    baseline = current_rss_kib()
+    start = time.perf_counter()
+    for count, query in enumerate(islice(cycle(pool), queries), start=1):
+        analyzer = RawSQLAnalyzer(query, results_only=results_only)
+        analyzer.perform_full_analysis()
+        if retain:
+            retained.append(analyzer)
+        if count % every == 0:
+            rss.append({"queries": count, "rss_kib": current_rss_kib()})
+    elapsed = time.perf_counter() - start
+
+    growth = None
+    if baseline is not None and len(rss) >= 2:
+        # Slope over the second half of the run, once allocator pools have warmed up
+        first, last = rss[len(rss) // 2], rss[-1]
+        if last["queries"] > first["queries"]:
+            growth = (last["rss_kib"] - first["rss_kib"]) * 1024 / (last["queries"] - first["queries"])
+    return {
+        "mode": "results_only" if results_only else "default",
+        "retain": retain,
+        "queries": queries,
+        "seconds": elapsed,
+        "baseline_rss_kib": baseline,
+        "final_rss_kib": rss[-1]["rss_kib"] if rss else None,
+        "peak_rss_kib": peak_rss_kib(),
+        "growth_bytes_per_query": growth,
+        "samples": rss,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the RSS of long analysis runs with and without the results-only mode.")
+    parser.add_argument("--queries", type=int, default=20000,
+                        help="Number of queries analyzed; use 1000000 for the full run.")
+    parser.add_argument("--distinct", type=int, default=1000, help="Size of the pool of synthetic queries.")
+    parser.add_argument("--samples", type=int, default=20, help="Number of RSS samples.")
+    parser.add_argument("--mode", choices=("results-only", "default"), default="results-only",
+                        help="Run one mode per process, so that each starts from a clean heap.")
+    parser.add_argument("--no-retain", action="store_true",
+                        help="Drop each analyzer after its analysis instead of keeping it with its result.")
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    report = run(args.queries, args.mode == "results-only", not args.no_retain, args.samples, args.distinct)
+    print(f"mode={report['mode']} retain={report['retain']} queries={report['queries']} "
+          f"time={report['seconds']:.1f}s")
+    for sample in report["samples"]:
+        print(f"  {sample['queries']:>9} queries  rss {sample['rss_kib'] or 0:>10.0f} KiB")
+    if report["growth_bytes_per_query"] is not None:
+        print(f"  growth over the second half: {report['growth_bytes_per_query']:.0f} bytes/query")
+    print(f"  peak rss {report['peak_rss_kib']:.0f} KiB")
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
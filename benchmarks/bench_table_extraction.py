@@ -0,0 +1,84 @@
+from typing import (Callable, Dict, List)
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+
+# Allow running the script directly from a checkout
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sql_analyzer import utils
+from sql_analyzer.backends import DEFAULT_BACKEND
+from benchmarks.synthetic import generate_corpus
+from tests.queries import sql_queries
+
+
+def time_per_query(queries: List, func: Callable, repeat: int) -> float:
+    """
+    Returns the best total time, over repeat runs, of calling func on every query.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            func(query)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(name: str, queries: List[str], repeat: int) -> Dict:
+    """
+    Times the regex and token-based table extractors on a corpus and measures how often
+    they agree.
+
+    The token-based extractor is timed both on pre-tokenized statements, which is its cost
+    inside perform_full_analysis where the token stream is shared with other analyzers,
+    and including tokenization.
+    """
+    token_streams = [DEFAULT_BACKEND.tokenize(query) for query in queries]
+    regex_tables = [utils.extract_tables_with_regex(query) for query in queries]
+    token_tables = [utils.extract_tables_from_tokens(tokens) for tokens in token_streams]
+    disagreements = [
+        {"query": query, "regex": sorted(regex), "tokens": sorted(tokens)}
+        for query, regex, tokens in zip(queries, regex_tables, token_tables) if regex != tokens
+    ]
+    return {
+        "corpus": name,
+        "queries": len(queries),
+        "regex_seconds": time_per_query(queries, utils.extract_tables_with_regex, repeat),
+        "tokens_seconds": time_per_query(token_streams, utils.extract_tables_from_tokens, repeat),
+        "tokenize_and_tokens_seconds": time_per_query(
+            queries, lambda query: utils.extract_tables_from_tokens(DEFAULT_BACKEND.tokenize(query)), repeat),
+        "agreement": 1 - len(disagreements) / len(queries),
+        "disagreements": disagreements[:10],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the regex and token-based table extractors.")
+    parser.add_argument("--synthetic", type=int, default=2000, help="Number of synthetic queries.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions; the best run is kept.")
+    parser.add_argument("--json", type=Path, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    reports = [
+        compare("tests/queries.py", sql_queries, args.repeat),
+        compare("synthetic", generate_corpus(args.synthetic, seed=args.seed), args.repeat),
+    ]
+
+    for report in reports:
+        n = report["queries"]
+        print(f"{report['corpus']}: {n} queries, agreement {report['agreement']:.1%}")
+        for key in ("regex_seconds", "tokens_seconds", "tokenize_and_tokens_seconds"):
+            print(f"  {key[:-8]:<20} {report[key]:.4f}s total  {report[key] / n * 1e6:9.1f}us/query")
+        for disagreement in report["disagreements"][:3]:
+            print(f"  differs: regex={disagreement['regex']} tokens={disagreement['tokens']}")
+
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+from typing import List
+import random
+
+
+def _subquery(rng: random.Random, depth: int) -> str:
+    """
+    Builds a scalar subquery nested depth levels deep.
+    """
+    table = f"sub_{rng.randrange(50)}"
+    if depth <= 1:
+        return f"(SELECT MAX(val) FROM {table} WHERE flag = {rng.randrange(2)})"
+    return f"(SELECT MAX(val) FROM {table} WHERE val > {_subquery(rng, depth - 1)})"
+
+
+def generate_query(rng: random.Random,
+                   nesting_depth: int = 1,
+                   join_width: int = 2,
+                   in_list_length: int = 10,
+                   cte_count: int = 0) -> str:
+    """
+    Generates a SELECT query with the requested shape.
+
+    Args:
+        rng (random.Random): The source of randomness.
+        nesting_depth (int): The depth of the nested scalar subquery in the WHERE clause;
+            0 for no subquery.
+        join_width (int): The number of tables joined to the main table.
+        in_list_length (int): The number of literals in the IN list; 0 for no IN list.
+        cte_count (int): The number of common table expressions in a WITH clause.
+
+    Returns:
+        str: The generated query.
+    """
+    parts = []
+    if cte_count:
+        ctes = [f"cte_{i} AS (SELECT id, val FROM base_{rng.randrange(100)} WHERE val > {rng.randrange(1000)})"
+                for i in range(cte_count)]
+        parts.append("WITH " + ",\n     ".join(ctes))
+
+    main = "cte_0" if cte_count else f"fact_{rng.randrange(100)}"
+    parts.append(f"SELECT t0.id, COUNT(t0.val) AS n, SUM(t0.amount) AS total\nFROM {main} t0")
+    for i in range(1, join_width + 1):
+        kind = rng.choice(["JOIN", "LEFT JOIN", "INNER JOIN"])
+        source = f"cte_{i % cte_count}" if cte_count and i < cte_count else f"dim_{rng.randrange(200)}"
+        parts.append(f"{kind} {source} t{i} ON t{i - 1}.id = t{i}.id")
+
+    conditions = [f"t0.status = '{rng.choice(['open', 'closed', 'pending'])}'"]
+    if in_list_length:
+        values = ", ".join(str(rng.randrange(1_000_000)) for _ in range(in_list_length))
+        conditions.append(f"t0.id IN ({values})")
+    if nesting_depth:
+        conditions.append(f"t0.val > {_subquery(rng, nesting_depth)}")
+    parts.append("WHERE " + "\n  AND ".join(conditions))
+    parts.append("GROUP BY t0.id")
+    return "\n".join(parts)
+
+
+def generate_script(rng: random.Random, statement_count: int = 3, **knobs) -> str:
+    """
+    Generates a script of several statements separated by semicolons.
+
+    Args:
+        rng (random.Random): The source of randomness.
+        statement_count (int): The number of statements in the script.
+        **knobs: Shape parameters passed to generate_query.
+
+    Returns:
+        str: The generated script.
+    """
+    return ";\n".join(generate_query(rng, **knobs) for _ in range(statement_count)) + ";"
+
+
+def generate_corpus(n_queries: int,
+                    seed: int = 0,
+                    max_nesting_depth: int = 3,
+                    max_join_width: int = 4,
+                    max_in_list_length: int = 50,
+                    max_cte_count: int = 2,
+                    statement_count: int = 1) -> List[str]:
+    """
+    Generates a reproducible corpus of queries whose shape varies up to the given maxima.
+
+    Args:
+        n_queries (int): The number of queries (or scripts) to generate.
+        seed (int): The seed of the random generator.
+        max_nesting_depth (int): The maximum subquery nesting depth.
+        max_join_width (int): The maximum number of joins.
+        max_in_list_length (int): The maximum IN list length.
+        max_cte_count (int): The maximum number of CTEs.
+        statement_count (int): The number of statements per query; more than one produces scripts.
+
+    Returns:
+        List[str]: The generated queries.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n_queries):
+        knobs = {
+            "nesting_depth": rng.randint(0, max_nesting_depth),
+            "join_width": rng.randint(0, max_join_width),
+            "in_list_length": rng.randint(0, max_in_list_length),
+            "cte_count": rng.randint(0, max_cte_count),
+        }
+        if statement_count > 1:
+            corpus.append(generate_script(rng, statement_count, **knobs))
+        else:
+            corpus.append(generate_query(rng, **knobs))
+    return corpus
@@ -0,0 +1,39 @@
+import importlib
+
+# Public names and the submodule defining each one. Submodules are imported on first
+# access, so that importing the package does not load asyncio, multiprocessing or sqlparse.
+_EXPORTS = {
+    "AsyncAnalyzer": "sql_analyzer.aio",
+    "analyze_many": "sql_analyzer.batch",
+    "analyze_by_template": "sql_analyzer.batch",
+    "QueryResult": "sql_analyzer.batch",
+    "TemplateBatch": "sql_analyzer.batch",
+    "AnalysisCache": "sql_analyzer.cache",
+    "SQLiteAnalysisCache": "sql_analyzer.cache",
+    "CostModel": "sql_analyzer.cost",
+    "TableCatalog": "sql_analyzer.cost",
+    "AnalysisResult": "sql_analyzer.columnar",
+    "ResultBatch": "sql_analyzer.columnar",
+    "QueryIndex": "sql_analyzer.index",
+    "CorpusRunner": "sql_analyzer.runner",
+    "analyze_file": "sql_analyzer.stream",
+    "iter_queries": "sql_analyzer.stream",
+    "split_statements": "sql_analyzer.stream",
+    "analyze_text": "sql_analyzer.text",
+    "WorkloadAggregator": "sql_analyzer.workload",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,211 @@
+from typing import (Any, Dict, Iterable, List, Optional, Sequence)
+from concurrent.futures import (Executor, ProcessPoolExecutor)
+import asyncio
+import logging
+
+from sql_analyzer.raw_sql_analyzer import (AnalysisBudget, RawSQLAnalyzer)
+from sql_analyzer.batch import QueryResult
+
+
+logger = logging.getLogger(__name__)
+
+
+def _analyze(query: str,
+             include: Optional[Sequence[str]] = None,
+             exclude: Optional[Sequence[str]] = None,
+             budget: Optional[AnalysisBudget] = None) -> Dict[str, Any]:
+    """
+    Runs a full analysis in the executor. Defined at module level so that process pools
+    can pickle it.
+    """
+    return RawSQLAnalyzer(query, budget=budget).perform_full_analysis(include, exclude)
+
+
+class AsyncAnalyzer:
+    """
+    This class is an asyncio facade over RawSQLAnalyzer for services that analyze queries
+    on request. Parsing and analysis run in an executor, so the event loop is never
+    blocked by a large query.
+
+    At most max_in_flight analyses are submitted to the executor at a time; further
+    requests wait for a slot, which bounds the queue of the executor and pushes back on
+    callers. A request that times out or is cancelled is removed from the executor if it
+    has not started. An analysis that has already started cannot be interrupted; it keeps
+    its slot until it completes, so abandoned work cannot pile up behind new requests.
+
+    By default a process pool is used, which keeps CPU-bound parsing off the GIL of the
+    event loop thread. A thread pool or any other concurrent.futures.Executor can be
+    passed instead; an executor passed in is not shut down by close.
+
+    A budget bounds the work spent in the executor on each query: a pathological query
+    gets an approximate result instead of holding a slot until it is parsed.
+
+    Attributes:
+        max_in_flight (int): The maximum number of analyses submitted at a time.
+        timeout (Optional[float]): The default per-request timeout in seconds.
+        budget (Optional[AnalysisBudget]): The limits on the work spent on each query.
+    """
+
+    def __init__(self,
+                 executor: Optional[Executor] = None,
+                 workers: Optional[int] = None,
+                 max_in_flight: Optional[int] = None,
+                 timeout: Optional[float] = None,
+                 budget: Optional[AnalysisBudget] = None):
+        """
+        Initializes the facade. The default process pool is created on first use.
+
+        Args:
+            executor (Optional[Executor]): The executor running the analyses. Defaults to
+                a ProcessPoolExecutor owned by the facade.
+            workers (Optional[int]): The number of processes of the default pool.
+            max_in_flight (Optional[int]): The maximum number of analyses submitted at a
+                time. Defaults to twice the number of workers, or 8 with an executor passed in.
+            timeout (Optional[float]): The default per-request timeout in seconds. None
+                waits indefinitely.
+            budget (Optional[AnalysisBudget]): The limits on the work spent on each query,
+                see RawSQLAnalyzer.
+
+        Raises:
+            ValueError: If workers, max_in_flight or timeout is not positive.
+        """
+        if workers is not None and workers < 1:
+            raise ValueError("workers must be a positive integer.")
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be a positive integer.")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("timeout must be positive.")
+
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._workers = workers
+        self.max_in_flight = max_in_flight or (2 * workers if workers else 8)
+        self.timeout = timeout
+        self.budget = budget
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._closed = False
+
+    @property
+    def in_flight(self) -> int:
+        """
+        The number of analyses currently submitted to the executor.
+        """
+        return self._in_flight
+
+    def _get_executor(self) -> Executor:
+        """
+        Returns the executor, creating the default process pool on first use.
+        """
+        if self._closed:
+            raise RuntimeError("The AsyncAnalyzer is closed.")
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self._workers)
+        return self._executor
+
+    async def analyze(self, query: str,
+                      timeout: Optional[float] = None,
+                      include: Optional[Sequence[str]] = None,
+                      exclude: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Analyzes a query without blocking the event loop.
+
+        Args:
+            query (str): The raw SQL query string to be analyzed.
+            timeout (Optional[float]): The timeout of this request in seconds, including
+                the wait for a slot. Defaults to the timeout of the facade.
+            include (Optional[Sequence[str]]): The analyzers to run, see perform_full_analysis.
+            exclude (Optional[Sequence[str]]): The analyzers to skip.
+
+        Returns:
+            Dict[str, Any]: The result of perform_full_analysis.
+
+        Raises:
+            ValueError: If the query is not a valid string.
+            asyncio.TimeoutError: If the analysis did not complete in time.
+            asyncio.CancelledError: If the request was cancelled.
+        """
+        if not isinstance(query, str):
+            raise ValueError("The query must be a string.")
+        timeout = self.timeout if timeout is None else timeout
+        return await asyncio.wait_for(self._submit(query, include, exclude), timeout)
+
+    async def _submit(self, query: str,
+                      include: Optional[Sequence[str]],
+                      exclude: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """
+        Waits for a slot, runs the analysis in the executor and releases the slot once
+        the executor is done with it, even if the caller stopped waiting.
+        """
+        loop = asyncio.get_running_loop()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        slots = self._slots
+        await slots.acquire()
+        try:
+            future = self._get_executor().submit(_analyze, query, include, exclude, self.budget)
+        except BaseException:
+            slots.release()
+            raise
+        self._in_flight += 1
+        released = False
+
+        def release_slot() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._in_flight -= 1
+                slots.release()
+
+        def release_later(_) -> None:
+            try:
+                loop.call_soon_threadsafe(release_slot)
+            except RuntimeError:
+                pass  # The event loop is already closed
+
+        future.add_done_callback(release_later)
+        try:
+            # Cancelling the wrapper cancels the executor future if it has not started yet
+            return await asyncio.wrap_future(future)
+        finally:
+            if future.done():
+                release_slot()
+
+    async def analyze_batch(self, queries: Iterable[str],
+                            timeout: Optional[float] = None) -> List[QueryResult]:
+        """
+        Analyzes several queries concurrently, within the in-flight limit. Failures and
+        timeouts are captured per query instead of failing the batch.
+
+        Args:
+            queries (Iterable[str]): The raw SQL queries to analyze.
+            timeout (Optional[float]): The timeout of each query in seconds.
+
+        Returns:
+            List[QueryResult]: One result per query, in input order.
+        """
+        async def run(index: int, query: str) -> QueryResult:
+            try:
+                return QueryResult(index, await self.analyze(query, timeout), None)
+            except asyncio.TimeoutError:
+                return QueryResult(index, None, "TimeoutError: the analysis did not complete in time")
+            except Exception as e:
+                return QueryResult(index, None, f"{type(e).__name__}: {e}")
+
+        return list(await asyncio.gather(*(run(index, query) for index, query in enumerate(queries))))
+
+    def close(self) -> None:
+        """
+        Shuts down the default process pool, cancelling the analyses that have not
+        started. An executor passed to the constructor is left running.
+        """
+        self._closed = True
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def __aenter__(self) -> "AsyncAnalyzer":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
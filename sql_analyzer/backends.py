@@ -0,0 +1,100 @@
+from typing import (Iterator, List)
+
+from sql_analyzer.lazy import lazy_import
+
+# Loaded on the first tokenize or parse call, not when a backend is created
+sqlparse = lazy_import("sqlparse")
+
+
+class ParserBackend:
+    """
+    This class is the interface between RawSQLAnalyzer and the parser that turns a query
+    into tokens. A backend provides two views of the first statement of a query: the flat
+    token stream produced by the lexer, which is cheap, and the grouped parse tree, which
+    requires sqlparse's grouping pass. RawSQLAnalyzer only asks for the parse tree when an
+    analyzer that needs it is run.
+    """
+
+    name = "base"
+    builds_trees = True
+
+    def tokenize(self, query: str) -> List["sqlparse.sql.Token"]:
+        """
+        Returns the ungrouped tokens of the first statement of a query.
+
+        Args:
+            query (str): The raw SQL query string.
+
+        Returns:
+            List[Token]: The leaf tokens of the first statement, in order.
+
+        Raises:
+            IndexError: If the query does not contain any statement.
+        """
+        return list(self.parse(query).flatten())
+
+    def parse(self, query: str) -> "sqlparse.sql.Statement":
+        """
+        Returns the grouped parse tree of the first statement of a query. The remaining
+        statements are not parsed.
+
+        Args:
+            query (str): The raw SQL query string.
+
+        Returns:
+            Statement: The parsed statement.
+
+        Raises:
+            IndexError: If the query does not contain any statement.
+        """
+        statement = next(self.iter_statements(query), None)
+        if statement is None:
+            raise IndexError("The query does not contain any SQL statement.")
+        return statement
+
+    def iter_statements(self, query: str) -> Iterator["sqlparse.sql.Statement"]:
+        """
+        Lazily parses the statements of a query into grouped trees, one at a time.
+
+        Args:
+            query (str): The raw SQL query string.
+
+        Returns:
+            Iterator[Statement]: The parsed statements, in order.
+        """
+        raise NotImplementedError(f"The '{self.name}' backend does not build parse trees.")
+
+
+class SqlparseBackend(ParserBackend):
+    """
+    The default backend. Parse trees are built with sqlparse.parsestream, which stops
+    after the first statement; token streams are produced by the lexer and the statement
+    splitter alone, skipping the grouping pass.
+    """
+
+    name = "sqlparse"
+
+    def tokenize(self, query: str) -> List["sqlparse.sql.Token"]:
+        statement = next(sqlparse.engine.FilterStack().run(query), None)
+        if statement is None:
+            raise IndexError("The query does not contain any SQL statement.")
+        return statement.tokens
+
+    def iter_statements(self, query: str) -> Iterator["sqlparse.sql.Statement"]:
+        return sqlparse.parsestream(query)
+
+
+class TokenOnlyBackend(SqlparseBackend):
+    """
+    A lightweight backend that only tokenizes. Analyzers that need a grouped parse tree
+    raise NotImplementedError, which guarantees the grouping pass is never paid for.
+    """
+
+    name = "tokens"
+    builds_trees = False
+
+    def iter_statements(self, query: str) -> Iterator["sqlparse.sql.Statement"]:
+        return ParserBackend.iter_statements(self, query)
+
+
+DEFAULT_BACKEND = SqlparseBackend()
@@ -0,0 +1,415 @@
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple)
+# Pools are created through the module, which defers importing multiprocessing to the first pool
+from concurrent import futures
+from concurrent.futures import (Future, FIRST_COMPLETED, wait)
+from collections import deque
+from itertools import islice
+import logging
+import os
+
+from sql_analyzer.raw_sql_analyzer import (AnalysisBudget, RawSQLAnalyzer)
+from sql_analyzer.cache import copy_result
+from sql_analyzer.instrumentation import (AnalysisMetrics, CallbackSink)
+from sql_analyzer.lazy import lazy_import
+
+
+logger = logging.getLogger(__name__)
+utils = lazy_import("sql_analyzer.utils")
+
+
+class QueryResult(NamedTuple):
+    """
+    The outcome of analyzing a single query in a batch.
+
+    Attributes:
+        index (int): The position of the query in the input.
+        result (Optional[Dict[str, Any]]): The dictionary returned by perform_full_analysis,
+            or None if the analysis failed.
+        error (Optional[str]): A description of the failure, or None if the analysis succeeded.
+        metrics (Optional[AnalysisMetrics]): The instrumentation of the analysis, labelled
+            with the index, when the batch collects metrics.
+    """
+    index: int
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    metrics: Optional[AnalysisMetrics] = None
+
+
+def analyze_query(index: int, query: str, collect_metrics: bool = False,
+                  include: Optional[Sequence[str]] = None,
+                  exclude: Optional[Sequence[str]] = None,
+                  cache: Optional[Any] = None,
+                  compact_literals: bool = False,
+                  budget: Optional[AnalysisBudget] = None) -> QueryResult:
+    """
+    Runs a full analysis of a single query, capturing any failure in the result.
+
+    Args:
+        index (int): The position of the query in the input.
+        query (str): The raw SQL query string to be analyzed.
+        collect_metrics (bool): Whether to attach the AnalysisMetrics of the analysis.
+        include (Optional[Sequence[str]]): The analyzers to run, see perform_full_analysis.
+        exclude (Optional[Sequence[str]]): The analyzers to skip.
+        cache (Optional[Any]): A cache of full analysis results, see RawSQLAnalyzer.
+        compact_literals (bool): Whether literal runs are collapsed before parsing.
+        budget (Optional[AnalysisBudget]): Limits on the work spent on the query.
+
+    Returns:
+        QueryResult: The analysis result or the error raised while producing it.
+    """
+    captured: List[AnalysisMetrics] = []
+    sink = CallbackSink(captured.append) if collect_metrics else None
+    try:
+        analyzer = RawSQLAnalyzer(query, metrics_sink=sink, cache=cache,
+                                  compact_literals=compact_literals, budget=budget)
+        result = analyzer.perform_full_analysis(include, exclude)
+    except Exception as e:
+        return QueryResult(index, None, f"{type(e).__name__}: {e}")
+
+    metrics = captured[0] if captured else None
+    if metrics is not None:
+        metrics.label = index
+    return QueryResult(index, result, None, metrics)
+
+
+def _analyze_chunk(start: int, queries: List[str], collect_metrics: bool = False,
+                   include: Optional[Sequence[str]] = None,
+                   exclude: Optional[Sequence[str]] = None,
+                   cache: Optional[Any] = None,
+                   compact_literals: bool = False,
+                   budget: Optional[AnalysisBudget] = None) -> List[QueryResult]:
+    """
+    Analyzes a chunk of consecutive queries inside a worker process.
+
+    Args:
+        start (int): The input position of the first query in the chunk.
+        queries (List[str]): The queries of the chunk.
+        collect_metrics (bool): Whether to attach the AnalysisMetrics of each analysis.
+        include (Optional[Sequence[str]]): The analyzers to run.
+        exclude (Optional[Sequence[str]]): The analyzers to skip.
+        cache (Optional[Any]): A cache of full analysis results.
+        compact_literals (bool): Whether literal runs are collapsed before parsing.
+        budget (Optional[AnalysisBudget]): Limits on the work spent on each query.
+
+    Returns:
+        List[QueryResult]: One result per query, in chunk order.
+    """
+    return [analyze_query(start + offset, query, collect_metrics, include, exclude, cache,
+                          compact_literals, budget)
+            for offset, query in enumerate(queries)]
+
+
+def _chunked(queries: Iterable[str], chunksize: int) -> Iterator[Tuple[int, List[str]]]:
+    """
+    Splits an iterable of queries into lists of at most chunksize queries.
+
+    Args:
+        queries (Iterable[str]): The queries to split.
+        chunksize (int): The maximum number of queries per chunk.
+
+    Returns:
+        Iterator[Tuple[int, List[str]]]: Pairs of the first input position and the chunk.
+    """
+    iterator = iter(queries)
+    start = 0
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def _failed_chunk(start: int, queries: List[str], error: BaseException) -> List[QueryResult]:
+    """
+    Builds error results for every query of a chunk whose worker failed as a whole.
+    """
+    message = f"{type(error).__name__}: {error}"
+    return [QueryResult(start + offset, None, message) for offset in range(len(queries))]
+
+
+def _submit(executor: futures.Executor, function: Callable[..., Any], *args: Any) -> Future:
+    """
+    Submits a call to a pool. If a worker died and broke the pool, returns a future
+    holding the error instead of raising, so the chunk fails like the ones in flight.
+    """
+    try:
+        return executor.submit(function, *args)
+    except futures.BrokenExecutor as e:
+        future = Future()
+        future.set_exception(e)
+        return future
+
+
+def analyze_many(queries: Iterable[str],
+                 workers: Optional[int] = None,
+                 chunksize: int = 64,
+                 ordered: bool = True,
+                 max_pending: Optional[int] = None,
+                 collect_metrics: bool = False,
+                 include: Optional[Sequence[str]] = None,
+                 exclude: Optional[Sequence[str]] = None,
+                 cache: Optional[Any] = None,
+                 compact_literals: bool = False,
+                 budget: Optional[AnalysisBudget] = None) -> Iterator[QueryResult]:
+    """
+    Runs perform_full_analysis over many queries on a pool of worker processes.
+
+    Queries are consumed lazily and dispatched in chunks, with at most max_pending chunks
+    in flight at a time, so arbitrarily long inputs can be streamed. A query that fails
+    produces a QueryResult carrying the error instead of interrupting the batch.
+
+    Args:
+        queries (Iterable[str]): The raw SQL queries to analyze.
+        workers (Optional[int]): The number of worker processes. Defaults to os.cpu_count();
+            a value of 1 analyzes the queries in the calling process.
+        chunksize (int): The number of queries sent to a worker at once.
+        ordered (bool): If True, results are yielded in input order; otherwise they are
+            yielded in completion order.
+        max_pending (Optional[int]): The maximum number of chunks in flight. Defaults to
+            twice the number of workers.
+        collect_metrics (bool): If True, every result carries the AnalysisMetrics of its
+            query, which can be fed to a MetricsAggregator to find the slowest queries
+            and stages of the batch.
+        include (Optional[Sequence[str]]): The analyzers to run, see perform_full_analysis.
+            Analyzers added with register_analyzer must be registered when the module
+            defining them is imported, so that worker processes see them too.
+        exclude (Optional[Sequence[str]]): The analyzers to skip.
+        cache (Optional[Any]): A cache of full analysis results consulted before parsing
+            each query. With worker processes it must be picklable and shareable across
+            processes, such as SQLiteAnalysisCache.
+        compact_literals (bool): Whether huge IN lists and VALUES blocks are collapsed
+            before parsing, see RawSQLAnalyzer.
+        budget (Optional[AnalysisBudget]): Limits on the work spent on each query. Queries
+            over budget get an approximate result flagged with 'approximate', which bounds
+            the time a pathological query can hold a worker.
+
+    Returns:
+        Iterator[QueryResult]: One result per input query.
+
+    Raises:
+        ValueError: If workers, chunksize or max_pending is not a positive integer, or
+            if include or exclude name an unknown analyzer.
+    """
+    if (workers is not None and workers < 1) or chunksize < 1 or (max_pending is not None and max_pending < 1):
+        raise ValueError("workers, chunksize and max_pending must be positive integers.")
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    if include is not None or exclude is not None:
+        RawSQLAnalyzer._select_analyzers(include, exclude)  # Fail before dispatching any query
+
+    if workers == 1:
+        return (analyze_query(index, query, collect_metrics, include, exclude, cache, compact_literals, budget)
+                for index, query in enumerate(queries))
+    return _analyze_in_pool(queries, workers, chunksize, ordered, max_pending,
+                            collect_metrics, include, exclude, cache, compact_literals, budget)
+
+
+def _analyze_in_pool(queries: Iterable[str],
+                     workers: int,
+                     chunksize: int,
+                     ordered: bool,
+                     max_pending: int,
+                     collect_metrics: bool = False,
+                     include: Optional[Sequence[str]] = None,
+                     exclude: Optional[Sequence[str]] = None,
+                     cache: Optional[Any] = None,
+                     compact_literals: bool = False,
+                     budget: Optional[AnalysisBudget] = None) -> Iterator[QueryResult]:
+    """
+    Generator behind analyze_many that keeps up to max_pending chunks in flight on a
+    process pool and yields their results as they are collected.
+    """
+    chunks = _chunked(queries, chunksize)
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: "deque[Tuple[Future, int, List[str]]]" = deque()
+
+        def submit_next() -> bool:
+            chunk = next(chunks, None)
+            if chunk is None:
+                return False
+            start, chunk_queries = chunk
+            future = _submit(executor, _analyze_chunk, start, chunk_queries, collect_metrics,
+                             include, exclude, cache, compact_literals, budget)
+            pending.append((future, start, chunk_queries))
+            return True
+
+        try:
+            while len(pending) < max_pending and submit_next():
+                pass
+
+            while pending:
+                if ordered:
+                    completed = [pending.popleft()]
+                else:
+                    done, _ = wait([future for future, _, _ in pending], return_when=FIRST_COMPLETED)
+                    completed = [entry for entry in pending if entry[0] in done]
+                    for entry in completed:
+                        pending.remove(entry)
+
+                for future, start, chunk_queries in completed:
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        logger.error(f"Worker failed on queries {start}-{start + len(chunk_queries) - 1}: {e}")
+                        results = _failed_chunk(start, chunk_queries, e)
+                    submit_next()
+                    yield from results
+        finally:
+            # Drop the work that was never consumed if the caller stops iterating early
+            for future, _, _ in pending:
+                future.cancel()
+
+
+class TemplateGroup(NamedTuple):
+    """
+    The queries of a batch sharing a template, analyzed once through their first member.
+
+    Attributes:
+        fingerprint (str): The hash of the template, as computed by utils.fingerprint_query.
+        template (str): The normalized query shared by the members, see utils.normalize_query.
+        members (List[int]): The input positions of the queries of the template, in order.
+        result (Optional[Dict[str, Any]]): The analysis of the first member, or None if it failed.
+        error (Optional[str]): The error raised by the analysis, if any.
+    """
+    fingerprint: str
+    template: str
+    members: List[int]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+    @property
+    def count(self) -> int:
+        """
+        The number of occurrences of the template in the batch.
+        """
+        return len(self.members)
+
+
+class TemplateBatch(NamedTuple):
+    """
+    The outcome of analyze_by_template.
+
+    Attributes:
+        results (List[QueryResult]): One result per input query, in input order.
+        groups (List[TemplateGroup]): The templates, in order of first occurrence.
+    """
+    results: List[QueryResult]
+    groups: List[TemplateGroup]
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns the number of occurrences of each template, most frequent first.
+
+        Returns:
+            Dict[str, int]: The occurrence counts, by template.
+        """
+        ranked = sorted(self.groups, key=lambda group: -group.count)
+        return {group.template: group.count for group in ranked}
+
+
+def _normalize_chunk(queries: List[Any]) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Normalizes a chunk of queries inside a worker process.
+
+    Returns:
+        List[Tuple[Optional[str], Optional[str]]]: The template of each query, or None
+        with the error that prevented normalizing it.
+    """
+    normalized = []
+    for query in queries:
+        try:
+            normalized.append((utils.normalize_query(query), None))
+        except Exception as e:
+            normalized.append((None, f"{type(e).__name__}: {e}"))
+    return normalized
+
+
+def analyze_by_template(queries: Iterable[str],
+                        workers: Optional[int] = None,
+                        chunksize: int = 64,
+                        collect_metrics: bool = False,
+                        include: Optional[Sequence[str]] = None,
+                        exclude: Optional[Sequence[str]] = None,
+                        cache: Optional[Any] = None,
+                        compact_literals: bool = False,
+                        budget: Optional[AnalysisBudget] = None) -> TemplateBatch:
+    """
+    Analyzes a batch once per template. Every query is first normalized with the lexer
+    alone, which is much cheaper than a full analysis; queries sharing a fingerprint are
+    grouped, the first query of each group is analyzed with analyze_many, and its result
+    is copied to every other member.
+
+    As with AnalysisCache, a result that depends on the content of a literal, such as a
+    table name the regex extractor found inside a string, is the one of the first member.
+    Metrics, when collected, are only attached to the result of the first member.
+
+    Args:
+        queries (Iterable[str]): The raw SQL queries to analyze. They are all read before
+            any analysis starts.
+        workers (Optional[int]): The number of worker processes used to normalize and to
+            analyze. Defaults to os.cpu_count(); 1 works in the calling process.
+        chunksize (int): The number of queries sent to a worker at once.
+        collect_metrics (bool): Whether to collect the AnalysisMetrics of each analysis.
+        include (Optional[Sequence[str]]): The analyzers to run, see perform_full_analysis.
+        exclude (Optional[Sequence[str]]): The analyzers to skip.
+        cache (Optional[Any]): A cache of full analysis results, see analyze_many.
+        compact_literals (bool): Whether literal runs are collapsed before parsing.
+        budget (Optional[AnalysisBudget]): Limits on the work spent on each analysis.
+
+    Returns:
+        TemplateBatch: A result per query and the templates with their members. Queries
+        that cannot be normalized get an error result and belong to no template.
+
+    Raises:
+        ValueError: If workers or chunksize is not a positive integer, or if include or
+            exclude name an unknown analyzer.
+    """
+    if (workers is not None and workers < 1) or chunksize < 1:
+        raise ValueError("workers and chunksize must be positive integers.")
+    workers = workers or os.cpu_count() or 1
+    if include is not None or exclude is not None:
+        RawSQLAnalyzer._select_analyzers(include, exclude)
+
+    queries = list(queries)
+    if workers == 1:
+        normalized = _normalize_chunk(queries)
+    else:
+        normalized = []
+        with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            submitted = [(start, chunk, _submit(executor, _normalize_chunk, chunk))
+                         for start, chunk in _chunked(queries, chunksize)]
+            for start, chunk, future in submitted:
+                try:
+                    normalized.extend(future.result())
+                except Exception as e:
+                    logger.error(f"Worker failed on queries {start}-{start + len(chunk) - 1}: {e}")
+                    normalized.extend((None, item.error) for item in _failed_chunk(start, chunk, e))
+
+    results: List[Optional[QueryResult]] = [None] * len(queries)
+    groups: Dict[str, Tuple[str, List[int]]] = {}
+    for index, (template, error) in enumerate(normalized):
+        if template is None:
+            results[index] = QueryResult(index, None, error)
+            continue
+        fingerprint = utils.content_hash(template)
+        group = groups.get(fingerprint)
+        if group is None:
+            groups[fingerprint] = (template, [index])
+        else:
+            group[1].append(index)
+
+    representatives = [queries[members[0]] for _, members in groups.values()]
+    analyses = analyze_many(representatives, workers=workers, chunksize=chunksize,
+                            collect_metrics=collect_metrics, include=include, exclude=exclude,
+                            cache=cache, compact_literals=compact_literals, budget=budget)
+    template_groups = []
+    for (fingerprint, (template, members)), analysis in zip(groups.items(), analyses):
+        template_groups.append(TemplateGroup(fingerprint, template, members, analysis.result, analysis.error))
+        for member in members:
+            result = copy_result(analysis.result) if analysis.result is not None else None
+            metrics = analysis.metrics if member == members[0] else None
+            if metrics is not None:
+                metrics.label = member
+            results[member] = QueryResult(member, result, analysis.error, metrics)
+    return TemplateBatch(results, template_groups)
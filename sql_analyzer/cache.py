@@ -0,0 +1,446 @@
+from typing import (Any, Dict, Iterable, Optional)
+from collections import OrderedDict
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 << 20  # 256 MiB
+
+
+def copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Copies an analysis result so that callers cannot mutate a cached entry.
+
+    Args:
+        result (Dict[str, Any]): The dictionary returned by perform_full_analysis.
+
+    Returns:
+        Dict[str, Any]: A copy of the result with its sets copied as well.
+    """
+    return {key: set(value) if isinstance(value, set) else value for key, value in result.items()}
+
+
+class AnalysisCache:
+    """
+    This class is a bounded, least-recently-used cache of full analysis results placed in
+    front of RawSQLAnalyzer. Queries are keyed by template: the key of
+    RawSQLAnalyzer.cache_key with by_template hashes utils.normalize_query together with the
+    analyzer class, backend, table extraction mode and selected analyzers, so every query
+    of the same template (differing only in literals, comments, whitespace or keyword case)
+    is parsed and analyzed once per configuration.
+
+    Pass the cache to RawSQLAnalyzer, to analyze_many with a single worker, or call
+    analyze. Because the key ignores literal values, a result that depends on the content
+    of a literal, such as a table name the regex extractor found inside a string, is the
+    one computed for the first query seen with that shape.
+
+    Attributes:
+        maxsize (int): The maximum number of cached results.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that required an analysis.
+        evictions (int): The number of results dropped to respect maxsize.
+    """
+
+    # Tells RawSQLAnalyzer to key the entries by template rather than by exact text
+    keys_by_template = True
+
+    def __init__(self, maxsize: int = 10000):
+        """
+        Initializes an empty cache.
+
+        Args:
+            maxsize (int): The maximum number of cached results.
+
+        Raises:
+            ValueError: If maxsize is not a positive integer.
+        """
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ValueError("maxsize must be a positive integer.")
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up a cached result and marks it as recently used.
+
+        Args:
+            key (str): The cache key of the analysis, see RawSQLAnalyzer.cache_key.
+
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the cached result, or None on a miss.
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy_result(result)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Stores a result, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (str): The cache key of the analysis, see RawSQLAnalyzer.cache_key.
+            result (Dict[str, Any]): The dictionary returned by perform_full_analysis.
+        """
+        with self._lock:
+            self._entries[key] = copy_result(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def analyze(self, query: str,
+                include: Optional[Iterable[str]] = None,
+                exclude: Optional[Iterable[str]] = None,
+                **options: Any) -> Dict[str, Any]:
+        """
+        Returns the full analysis of a query, from the cache when a query of the same
+        template has already been analyzed with the same options.
+
+        Args:
+            query (str): The raw SQL query string to be analyzed.
+            include (Optional[Iterable[str]]): The analyzers to run, see perform_full_analysis.
+            exclude (Optional[Iterable[str]]): The analyzers to skip.
+            **options: Other arguments of RawSQLAnalyzer, such as backend or table_extraction.
+
+        Returns:
+            Dict[str, Any]: The result of perform_full_analysis for the query.
+
+        Raises:
+            ValueError: If the query is not a valid string.
+        """
+        return RawSQLAnalyzer(query, cache=self, **options).perform_full_analysis(include, exclude)
+
+    def clear(self) -> None:
+        """
+        Removes every cached result and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the current size of the cache and its hit, miss and eviction counters.
+
+        Returns:
+            Dict[str, int]: The cache statistics.
+        """
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteAnalysisCache:
+    """
+    This class is a persistent cache of full analysis results stored in a local SQLite
+    file, so that results survive between runs. Unlike AnalysisCache, entries are keyed by
+    RawSQLAnalyzer.cache_key, a hash of the exact query text together with the analysis
+    version, analyzer class, backend, table extraction mode and selected analyzers, so a
+    cached result is only reused for the very same query analyzed the same way.
+
+    Pass the cache to RawSQLAnalyzer or to analyze_many; analyses that completed without
+    errors are stored and later runs return them without parsing. The cache can be shared
+    by several worker processes and runs: the database uses write-ahead logging, waits up
+    to timeout seconds for locks, and every process opens its own connection (the cache
+    is picklable and reconnects after being sent to a worker). Errors of the database are
+    logged and treated as misses, so the cache never fails an analysis.
+
+    When the data stored exceeds max_bytes, the least recently used entries are evicted
+    down to 90% of it. The size is read from the database itself, so that every process
+    sees the writes of the others: each copy of the cache checks it on its first store,
+    as when a worker receives the cache with a task, then every 64 stores or 5 seconds.
+    Use time is refreshed at most once per touch_interval seconds, so that reads rarely
+    write. Results are serialized with pickle: only open cache files you trust.
+
+    The hits, misses and evictions counters are those of the copy they are read on. The
+    copies sent to the worker processes of analyze_many count their own lookups and are
+    discarded with the tasks, so after a batch on a pool the counters of the caller stay
+    at zero; stats() still reports the size of the shared database.
+
+    Attributes:
+        path (str): The SQLite database file.
+        max_bytes (int): The size above which entries are evicted.
+        namespace (str): Separates entries of different pipelines or analyzer
+            configurations sharing a file; change it to invalidate every entry.
+        hits (int): The number of lookups answered by this copy of the cache.
+        misses (int): The number of lookups of this copy that found nothing.
+        evictions (int): The number of entries evicted by this copy.
+    """
+
+    # Number of stores and of seconds between two checks of the database size
+    _EVICTION_CHECK_INTERVAL = 64
+    _EVICTION_CHECK_SECONDS = 5.0
+
+    def __init__(self, path: os.PathLike,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 namespace: str = "",
+                 touch_interval: float = 3600.0,
+                 timeout: float = 30.0):
+        """
+        Opens or creates a cache file.
+
+        Args:
+            path (os.PathLike): The SQLite database file.
+            max_bytes (int): The size above which entries are evicted.
+            namespace (str): The namespace of the entries read and written.
+            touch_interval (float): The minimum number of seconds between two refreshes
+                of the use time of an entry.
+            timeout (float): The number of seconds to wait for a lock held by another process.
+
+        Raises:
+            ValueError: If max_bytes is not a positive integer.
+        """
+        if not isinstance(max_bytes, int) or max_bytes < 1:
+            raise ValueError("max_bytes must be a positive integer.")
+
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self.touch_interval = touch_interval
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stores = 0
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._connect()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_pid"] = None
+        # A copy checks the size of the database on its first store
+        state["_stores"] = 0
+        state["_next_check"] = 0.0
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the current process, opening it and creating the schema
+        if needed. Connections are not shared with forked children.
+        """
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " result BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key)"
+            ") WITHOUT ROWID")
+        connection.execute("CREATE INDEX IF NOT EXISTS analyses_accessed ON analyses (accessed)")
+        self._connection = connection
+        self._pid = os.getpid()
+        return connection
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT COUNT(*) FROM analyses WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Looks up a cached result.
+
+        Args:
+            key (str): The cache key of the analysis, see RawSQLAnalyzer.cache_key.
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached result, or None on a miss.
+        """
+        with self._lock:
+            try:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT result, accessed FROM analyses WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                now = time.time()
+                if now - row[1] > self.touch_interval:
+                    connection.execute("UPDATE analyses SET accessed = ? WHERE namespace = ? AND key = ?",
+                                       (now, self.namespace, key))
+            except sqlite3.Error as e:
+                logger.warning(f"Analysis cache lookup failed in {self.path}: {e}")
+                self.misses += 1
+                return None
+            try:
+                result = pickle.loads(row[0])
+            except Exception as e:
+                # Truncated blobs and pickles of renamed classes fail with many error types
+                logger.warning(f"Dropping an unreadable entry of the analysis cache {self.path}: "
+                               f"{type(e).__name__}: {e}")
+                try:
+                    connection.execute("DELETE FROM analyses WHERE namespace = ? AND key = ?",
+                                       (self.namespace, key))
+                except sqlite3.Error:
+                    pass
+                self.misses += 1
+                return None
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Stores a result, evicting the least recently used entries if the cache is full.
+
+        Args:
+            key (str): The cache key of the analysis, see RawSQLAnalyzer.cache_key.
+            result (Dict[str, Any]): The dictionary returned by perform_full_analysis.
+        """
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO analyses (namespace, key, result, size, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, data, len(data), time.time()))
+                self._stores += 1
+                now = time.monotonic()
+                if (self._stores == 1 or self._stores % self._EVICTION_CHECK_INTERVAL == 0
+                        or now >= self._next_check):
+                    self._next_check = now + self._EVICTION_CHECK_SECONDS
+                    self._evict(connection)
+            except sqlite3.Error as e:
+                logger.warning(f"Analysis cache store failed in {self.path}: {e}")
+
+    def _used_bytes(self, connection: sqlite3.Connection) -> int:
+        """
+        Returns the number of bytes of the database pages in use.
+        """
+        page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Deletes the least recently used entries of every namespace until the data stored
+        is below 90% of max_bytes. Runs in a write transaction so that concurrent
+        processes do not evict the same entries twice.
+        """
+        if self._used_bytes(connection) <= self.max_bytes:
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            excess = self._used_bytes(connection) - int(self.max_bytes * 0.9)
+            stored = connection.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+            # Page usage includes keys and indexes; scale the sizes of the results accordingly
+            ratio = self._used_bytes(connection) / stored if stored else 1.0
+            freed = 0
+            victims = []
+            for namespace, key, size in connection.execute(
+                    "SELECT namespace, key, size FROM analyses ORDER BY accessed"):
+                if freed >= excess:
+                    break
+                victims.append((namespace, key))
+                freed += size * ratio
+            connection.executemany("DELETE FROM analyses WHERE namespace = ? AND key = ?", victims)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.evictions += len(victims)
+
+    def analyze(self, query: str) -> Dict[str, Any]:
+        """
+        Returns the full analysis of a query, from the cache when the same query has
+        already been analyzed, in this run or a previous one.
+
+        Args:
+            query (str): The raw SQL query string to be analyzed.
+
+        Returns:
+            Dict[str, Any]: The result of perform_full_analysis for the query.
+
+        Raises:
+            ValueError: If the query is not a valid string.
+        """
+        return RawSQLAnalyzer(query, cache=self).perform_full_analysis()
+
+    def clear(self) -> None:
+        """
+        Removes every entry of the namespace and resets the counters.
+        """
+        with self._lock:
+            self._connect().execute("DELETE FROM analyses WHERE namespace = ?", (self.namespace,))
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of entries of the namespace, the size of the database and the
+        hit, miss and eviction counters of this copy of the cache.
+
+        Returns:
+            Dict[str, int]: The cache statistics.
+        """
+        with self._lock:
+            connection = self._connect()
+            size = connection.execute(
+                "SELECT COUNT(*) FROM analyses WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+            used_bytes = self._used_bytes(connection)
+        return {
+            "size": size,
+            "bytes": used_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        """
+        Closes the connection of the current process.
+        """
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._pid = None
+
+    def __enter__(self) -> "SQLiteAnalysisCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
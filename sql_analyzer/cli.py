@@ -0,0 +1,363 @@
+from typing import (Any, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple)
+from pathlib import Path
+import argparse
+import csv
+import glob
+import json
+import logging
+import os
+import sys
+
+from sql_analyzer import text
+from sql_analyzer.batch import (analyze_many, QueryResult)
+from sql_analyzer.cost import (CostModel, TableCatalog)
+from sql_analyzer.raw_sql_analyzer import (AnalysisBudget, RawSQLAnalyzer)
+from sql_analyzer.stream import (detect_format, iter_log_records, iter_queries, split_statements)
+from sql_analyzer.workload import WorkloadAggregator
+
+
+logger = logging.getLogger(__name__)
+
+# Extensions of the files picked up when walking a directory
+SQL_EXTENSIONS = (".sql",)
+OUTPUT_FORMATS = ("ndjson", "csv", "summary")
+CSV_COLUMNS = ("source", "statement", "query_type", "tables", "functions", "where", "joins",
+               "subqueries", "max_depth", "approximate", "error")
+# Columns added to the CSV output when a catalog is given
+COST_COLUMNS = ("scan_bytes", "complexity", "full_scan")
+STDIN = "-"
+
+
+def iter_sources(paths: Sequence[str]) -> Iterator[str]:
+    """
+    Expands the inputs of the command line into the files to read. Directories are
+    walked recursively for .sql files, in sorted order; arguments containing wildcards
+    are expanded as globs, with '**' matching nested directories.
+
+    Args:
+        paths (Sequence[str]): Files, directories, glob patterns or '-' for stdin.
+
+    Returns:
+        Iterator[str]: The files to read, and '-' for stdin.
+
+    Raises:
+        FileNotFoundError: If a path does not exist or a pattern matches nothing.
+    """
+    for path in paths:
+        if path == STDIN:
+            yield path
+        elif glob.has_magic(path):
+            matches = sorted(match for match in glob.glob(path, recursive=True) if os.path.isfile(match))
+            if not matches:
+                raise FileNotFoundError(f"No file matches {path}")
+            yield from matches
+        elif os.path.isdir(path):
+            for directory, subdirectories, files in os.walk(path):
+                subdirectories.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SQL_EXTENSIONS):
+                        yield os.path.join(directory, name)
+        elif os.path.isfile(path):
+            yield path
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
+
+
+def iter_statements(sources: Iterable[str], fmt: Optional[str] = None,
+                    column: str = "query") -> Iterator[Tuple[str, int, str]]:
+    """
+    Reads the statements of every source lazily, one file at a time.
+
+    Args:
+        sources (Iterable[str]): Files to read, or '-' for SQL text on stdin.
+        fmt (Optional[str]): 'sql', 'jsonl' or 'csv'. Inferred from each extension if omitted.
+        column (str): The query field of JSONL and CSV logs.
+
+    Returns:
+        Iterator[Tuple[str, int, str]]: The source, the position of the statement in it and
+        the statement text. The position is the 1-based statement number in SQL scripts,
+        the line number in JSONL logs and the record number in CSV logs, counting the
+        records that are skipped.
+    """
+    for source in sources:
+        if source == STDIN:
+            statements = _iter_stdin(fmt, column)
+        else:
+            statements = _iter_file(source, fmt, column)
+        for number, statement in statements:
+            yield source, number, statement
+
+
+def _iter_file(path: str, fmt: Optional[str], column: str) -> Iterator[Tuple[int, str]]:
+    """
+    Reads the numbered statements of a SQL script, or the numbered queries of a JSONL or CSV log.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "sql":
+        yield from enumerate(iter_queries(path, fmt), start=1)
+        return
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from iter_log_records(f, fmt, column, path)
+
+
+def _iter_stdin(fmt: Optional[str], column: str) -> Iterator[Tuple[int, str]]:
+    """
+    Reads the numbered statements of a SQL script, or the numbered queries of a JSONL or
+    CSV log, from stdin.
+    """
+    if fmt in (None, "sql"):
+        yield from enumerate(split_statements(iter(lambda: sys.stdin.read(1 << 16), "")), start=1)
+        return
+    yield from iter_log_records(sys.stdin, fmt, column, "<stdin>")
+
+
+def to_json(value: Any) -> Any:
+    """
+    Serializes the sets of analysis results as sorted lists.
+    """
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def to_record(source: str, number: int, item: QueryResult, query: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Builds the output record of one statement.
+
+    Args:
+        source (str): The file the statement was read from, or '-' for stdin.
+        number (int): The 1-based position of the statement in its source.
+        item (QueryResult): The analysis of the statement.
+        query (Optional[str]): The statement text, included when given.
+
+    Returns:
+        Dict[str, Any]: The source, the statement number, the result or the error, and
+        the query if given.
+    """
+    record: Dict[str, Any] = {"source": source, "statement": number}
+    if query is not None:
+        record["query"] = query
+    if item.error is not None:
+        record["error"] = item.error
+    else:
+        record["result"] = item.result
+    return record
+
+
+def to_csv_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flattens an output record into the CSV_COLUMNS, tables being joined with ';', and
+    the COST_COLUMNS if the record has a cost.
+    """
+    result = record.get("result") or {}
+    subqueries, max_depth = result.get("subqueries_and_maxdepth", ("", ""))
+    row = {
+        "source": record["source"],
+        "statement": record["statement"],
+        "query_type": result.get("query_type", ""),
+        "tables": ";".join(sorted(result.get("tables", ()))),
+        "functions": result.get("functions", ""),
+        "where": result.get("where", ""),
+        "joins": result.get("joins", ""),
+        "subqueries": subqueries,
+        "max_depth": max_depth,
+        "approximate": result.get("approximate", False),
+        "error": record.get("error", ""),
+    }
+    if "cost" in record:
+        row.update((column, record["cost"][column]) for column in COST_COLUMNS)
+    return row
+
+
+def analyze_text_query(index: int, query: str) -> QueryResult:
+    """
+    Analyzes one statement with text.analyze_text, capturing the error of an invalid one.
+
+    Args:
+        index (int): The position of the statement in the input.
+        query (str): The statement text.
+
+    Returns:
+        QueryResult: The approximate analysis or the error raised while producing it.
+    """
+    try:
+        return QueryResult(index, text.analyze_text(query), None)
+    except Exception as e:
+        return QueryResult(index, None, f"{type(e).__name__}: {e}")
+
+
+def add_budget_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the --max-length, --max-tokens and --max-seconds options read by budget_from_args.
+    """
+    parser.add_argument("--max-length", type=int, help="Analyze longer statements approximately.")
+    parser.add_argument("--max-tokens", type=int, help="Analyze statements with more tokens approximately.")
+    parser.add_argument("--max-seconds", type=float, help="Per-statement time budget.")
+
+
+def budget_from_args(args: argparse.Namespace) -> Optional[AnalysisBudget]:
+    """
+    Builds the analysis budget of the options added by add_budget_arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+
+    Returns:
+        Optional[AnalysisBudget]: The budget, or None if no limit is given.
+
+    Raises:
+        ValueError: If a limit is not positive.
+    """
+    limits = (args.max_length, args.max_tokens, args.max_seconds)
+    if any(limit is not None and limit <= 0 for limit in limits):
+        raise ValueError("--max-length, --max-tokens and --max-seconds must be positive.")
+    if all(limit is None for limit in limits):
+        return None
+    return AnalysisBudget(*limits)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the argument parser of the command line.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m sql_analyzer",
+        description="Analyze SQL files, query logs or stdin and stream one result per statement.")
+    parser.add_argument("paths", nargs="*", default=[STDIN],
+                        help="Files, directories (walked for .sql files), glob patterns, or '-' for stdin (default).")
+    parser.add_argument("--input-format", choices=("sql", "jsonl", "csv"),
+                        help="Input format; inferred from each file extension by default.")
+    parser.add_argument("--column", default="query", help="Query field of JSONL and CSV logs.")
+    parser.add_argument("-f", "--format", choices=OUTPUT_FORMATS, default="ndjson",
+                        help="ndjson: one JSON line per statement; csv: one row per statement; "
+                             "summary: a single workload report at the end.")
+    parser.add_argument("-o", "--output", type=Path, help="Write to this file instead of stdout.")
+    parser.add_argument("-w", "--workers", type=int,
+                        help="Number of worker processes; defaults to the number of CPUs.")
+    parser.add_argument("--chunksize", type=int, default=16, help="Statements sent to a worker at once.")
+    parser.add_argument("--unordered", action="store_true",
+                        help="Write results as they complete instead of in input order.")
+    parser.add_argument("--include", action="append", metavar="ANALYZER",
+                        help="Run only this analyzer; may be repeated.")
+    parser.add_argument("--exclude", action="append", metavar="ANALYZER",
+                        help="Skip this analyzer; may be repeated.")
+    parser.add_argument("--list-analyzers", action="store_true", help="List the analyzers and exit.")
+    parser.add_argument("--with-query", action="store_true", help="Include the statement text in NDJSON records.")
+    parser.add_argument("--compact-literals", action="store_true",
+                        help="Collapse huge IN lists and VALUES blocks before parsing.")
+    add_budget_arguments(parser)
+    parser.add_argument("--catalog", type=Path,
+                        help="JSON or CSV file of table row counts and byte sizes; adds the estimated cost "
+                             "of each statement.")
+    parser.add_argument("--regex-only", action="store_true",
+                        help="Analyze statements approximately from their text, in this process, "
+                             "without loading the parser.")
+    return parser
+
+
+def run(args: argparse.Namespace, out: TextIO, cost_model: Optional[CostModel] = None) -> int:
+    """
+    Analyzes the inputs selected by parsed arguments and writes the results to out.
+
+    Args:
+        args (argparse.Namespace): The parsed command line.
+        out (TextIO): Where the results are written.
+        cost_model (Optional[CostModel]): Adds the estimated cost of each statement to its
+            record when given.
+
+    Returns:
+        int: The exit status: 0 on success, 1 if any statement failed to be analyzed.
+    """
+    budget = budget_from_args(args)
+
+    # Remember where each statement came from until its result is written
+    origins: Dict[int, Tuple[str, int, str]] = {}
+
+    def queries() -> Iterator[str]:
+        for index, (source, number, query) in enumerate(iter_statements(iter_sources(args.paths),
+                                                                          args.input_format, args.column)):
+            origins[index] = (source, number, query)
+            yield query
+
+    if args.regex_only:
+        results = (analyze_text_query(index, query) for index, query in enumerate(queries()))
+    else:
+        results = analyze_many(queries(), workers=args.workers, chunksize=args.chunksize,
+                               ordered=not args.unordered, include=args.include, exclude=args.exclude,
+                               compact_literals=args.compact_literals, budget=budget)
+
+    failures = 0
+    writer = None
+    aggregator = WorkloadAggregator() if args.format == "summary" else None
+    if args.format == "csv":
+        writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS + (COST_COLUMNS if cost_model else ()))
+        writer.writeheader()
+    for item in results:
+        source, number, query = origins.pop(item.index)
+        failures += item.error is not None
+        if aggregator is not None:
+            if item.result is None:
+                aggregator.failures += 1
+            else:
+                aggregator.add(item.result, query)
+            continue
+        record = to_record(source, number, item, query if args.with_query else None)
+        if cost_model is not None and item.result is not None:
+            record["cost"] = cost_model.estimate(item.result)._asdict()
+        if writer is not None:
+            writer.writerow(to_csv_row(record))
+        else:
+            out.write(json.dumps(record, default=to_json) + "\n")
+        out.flush()
+
+    if aggregator is not None:
+        out.write(json.dumps(aggregator.report(), default=str, indent=2) + "\n")
+    if failures:
+        logger.warning(f"{failures} statement(s) could not be analyzed")
+    return 1 if failures else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entry point of python -m sql_analyzer.
+
+    Args:
+        argv (Optional[List[str]]): The command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status: 0 on success, 1 if a statement failed, 2 on invalid usage.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.list_analyzers:
+        for name, spec in RawSQLAnalyzer.get_analyzers().items():
+            print(f"{name}\t{spec.requires}")
+        return 0
+    if (args.workers is not None and args.workers < 1) or args.chunksize < 1:
+        parser.error("--workers and --chunksize must be positive integers.")
+    if args.regex_only and (args.include or args.exclude):
+        parser.error("--regex-only cannot be combined with --include or --exclude.")
+    cost_model = None
+    try:
+        budget_from_args(args)
+        RawSQLAnalyzer._select_analyzers(args.include, args.exclude)
+        if args.catalog is not None:
+            cost_model = CostModel(TableCatalog.load(args.catalog))
+        for path in args.paths:
+            if path != STDIN and not glob.has_magic(path) and not os.path.exists(path):
+                raise FileNotFoundError(f"No such file or directory: {path}")
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+
+    try:
+        if args.output is not None:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                return run(args, out, cost_model)
+        return run(args, sys.stdout, cost_model)
+    except BrokenPipeError:
+        # The reader of the pipe, such as head, stopped early
+        sys.stderr.close()
+        return 0
+    except FileNotFoundError as e:
+        logger.error(str(e))
+        return 2
@@ -0,0 +1,364 @@
+from typing import (Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Union)
+from array import array
+import os
+
+from sql_analyzer.batch import QueryResult
+
+# Count columns of a batch, in export order
+COUNT_COLUMNS = ("functions", "where", "joins", "subqueries", "max_depth")
+
+# Value stored in a count column when the analyzer producing it did not run or failed
+MISSING = -1
+
+_INT32 = "i"
+_INT64 = "q"
+_INT8 = "b"
+
+
+class AnalysisResult:
+    """
+    This class is a compact form of the dictionary returned by perform_full_analysis.
+    It stores the figures of the built-in analyzers in slots instead of a dictionary
+    holding a set and a tuple, which takes about a third less memory per query.
+
+    Attributes:
+        query_type (Optional[str]): The statement type, or None if it was not computed.
+        tables (Optional[FrozenSet[str]]): The names of the tables used by the query, or
+            None if they were not computed.
+        functions (int): The number of functions, or MISSING.
+        where (int): The number of 'WHERE' clauses, or MISSING.
+        joins (int): The number of JOIN clauses, or MISSING.
+        subqueries (int): The number of subqueries, or MISSING.
+        max_depth (int): The maximum subquery depth, or MISSING.
+        extra (Optional[Dict[str, Any]]): The results of registered analyzers, if any.
+        approximate (bool): Whether the result comes from approximate_analysis.
+    """
+
+    __slots__ = ("query_type", "tables", "functions", "where", "joins", "subqueries", "max_depth", "extra",
+                 "approximate")
+
+    def __init__(self,
+                 query_type: Optional[str] = None,
+                 tables: Optional[Iterable[str]] = None,
+                 functions: int = MISSING,
+                 where: int = MISSING,
+                 joins: int = MISSING,
+                 subqueries: int = MISSING,
+                 max_depth: int = MISSING,
+                 extra: Optional[Dict[str, Any]] = None,
+                 approximate: bool = False):
+        self.query_type = query_type
+        self.tables = frozenset(tables) if tables is not None else None
+        self.functions = functions
+        self.where = where
+        self.joins = joins
+        self.subqueries = subqueries
+        self.max_depth = max_depth
+        self.extra = extra or None
+        self.approximate = bool(approximate)
+
+    @classmethod
+    def from_dict(cls, result: Dict[str, Any]) -> "AnalysisResult":
+        """
+        Converts the dictionary returned by perform_full_analysis.
+
+        Args:
+            result (Dict[str, Any]): The analysis result.
+
+        Returns:
+            AnalysisResult: The compact result. Keys of registered analyzers are kept in extra.
+        """
+        subqueries, max_depth = result.get("subqueries_and_maxdepth", (MISSING, MISSING))
+        extra = {key: value for key, value in result.items() if key not in _RESULT_KEYS}
+        return cls(
+            result.get("query_type"),
+            result.get("tables"),
+            result.get("functions", MISSING),
+            result.get("where", MISSING),
+            result.get("joins", MISSING),
+            subqueries,
+            max_depth,
+            extra,
+            result.get("approximate", False),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Converts the result back to the dictionary form of perform_full_analysis, leaving
+        out the figures that were not computed.
+
+        Returns:
+            Dict[str, Any]: The analysis result.
+        """
+        result: Dict[str, Any] = {}
+        if self.query_type is not None:
+            result["query_type"] = self.query_type
+        if self.tables is not None:
+            result["tables"] = set(self.tables)
+        for key in ("functions", "where", "joins"):
+            value = getattr(self, key)
+            if value != MISSING:
+                result[key] = value
+        if self.subqueries != MISSING:
+            result["subqueries_and_maxdepth"] = (self.subqueries, self.max_depth)
+        if self.extra:
+            result.update(self.extra)
+        if self.approximate:
+            result["approximate"] = True
+        return result
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, AnalysisResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"AnalysisResult({fields})"
+
+
+# Keys of perform_full_analysis stored in dedicated slots of AnalysisResult
+_RESULT_KEYS = frozenset({"query_type", "tables", "functions", "where", "joins", "subqueries_and_maxdepth",
+                          "approximate"})
+
+
+class ResultBatch:
+    """
+    This class stores the analysis results of many queries column by column. Counts are
+    kept in typed arrays of 32-bit integers, and statement types and table names are
+    dictionary-encoded: each distinct string is stored once and queries refer to it by id.
+    The tables of query i are table_ids[table_offsets[i]:table_offsets[i + 1]].
+
+    The arrays can be exported without copying to NumPy (to_numpy) or Arrow (to_arrow),
+    and written to Parquet (write_parquet). NumPy and pyarrow are optional and are only
+    imported by the export methods. While an exported view is alive the batch cannot grow,
+    since the buffers it points to cannot be reallocated.
+
+    Results of registered analyzers are not stored; failed queries are flagged in the
+    'failed' column and have MISSING counts and no tables, and the approximate results of
+    queries over budget are flagged in the 'approximate' column.
+
+    Attributes:
+        query_types (List[Optional[str]]): The dictionary of statement types, by id.
+        table_names (List[str]): The dictionary of table names, by id.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty batch.
+        """
+        self.query_types: List[Optional[str]] = []
+        self.table_names: List[str] = []
+        self._query_type_ids: Dict[Optional[str], int] = {}
+        self._table_name_ids: Dict[str, int] = {}
+        self._columns: Dict[str, array] = {
+            "index": array(_INT64),
+            "failed": array(_INT8),
+            "approximate": array(_INT8),
+            "query_type": array(_INT32),
+            **{name: array(_INT32) for name in COUNT_COLUMNS},
+        }
+        self._table_ids = array(_INT32)
+        self._table_offsets = array(_INT64, [0])
+
+    def __len__(self) -> int:
+        return len(self._columns["index"])
+
+    def append(self, result: Union[Dict[str, Any], AnalysisResult, None],
+               index: Optional[int] = None) -> None:
+        """
+        Adds the result of one query.
+
+        Args:
+            result (Union[Dict[str, Any], AnalysisResult, None]): The result of
+                perform_full_analysis, or None for a query whose analysis failed.
+            index (Optional[int]): The position of the query in the input. Defaults to
+                the number of results already in the batch.
+        """
+        columns = self._columns
+        columns["index"].append(len(self) if index is None else index)
+        columns["failed"].append(result is None)
+        if result is None:
+            result = AnalysisResult()
+        elif not isinstance(result, AnalysisResult):
+            result = AnalysisResult.from_dict(result)
+
+        columns["approximate"].append(result.approximate)
+        columns["query_type"].append(self._encode(result.query_type, self._query_type_ids, self.query_types))
+        for name in COUNT_COLUMNS:
+            columns[name].append(getattr(result, name))
+        for table in sorted(result.tables or ()):
+            self._table_ids.append(self._encode(table, self._table_name_ids, self.table_names))
+        self._table_offsets.append(len(self._table_ids))
+
+    def extend(self, results: Iterable[QueryResult]) -> "ResultBatch":
+        """
+        Adds the results of a batch, such as the output of analyze_many or analyze_file.
+
+        Args:
+            results (Iterable[QueryResult]): The results to add.
+
+        Returns:
+            ResultBatch: The batch itself.
+        """
+        for item in results:
+            self.append(item.result, item.index)
+        return self
+
+    @classmethod
+    def from_results(cls, results: Iterable[QueryResult]) -> "ResultBatch":
+        """
+        Builds a batch from the results of analyze_many, consuming them one at a time so
+        that no result dictionary outlives its conversion.
+
+        Args:
+            results (Iterable[QueryResult]): The results to store.
+
+        Returns:
+            ResultBatch: The batch.
+        """
+        return cls().extend(results)
+
+    @staticmethod
+    def _encode(value: Any, ids: Dict[Any, int], values: List[Any]) -> int:
+        """
+        Returns the dictionary id of value, adding it to the dictionary if it is new.
+        """
+        encoded = ids.get(value)
+        if encoded is None:
+            encoded = ids[value] = len(values)
+            values.append(value)
+        return encoded
+
+    def __getitem__(self, position: int) -> AnalysisResult:
+        """
+        Decodes the result stored at a position of the batch.
+
+        Args:
+            position (int): The position in the batch, which is not necessarily the query index.
+
+        Returns:
+            AnalysisResult: The decoded result.
+        """
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("ResultBatch index out of range")
+        columns = self._columns
+        start, end = self._table_offsets[position], self._table_offsets[position + 1]
+        tables = None
+        if not columns["failed"][position]:
+            tables = (self.table_names[table_id] for table_id in self._table_ids[start:end])
+        return AnalysisResult(
+            self.query_types[columns["query_type"][position]],
+            tables,
+            *(columns[name][position] for name in COUNT_COLUMNS),
+            approximate=bool(columns["approximate"][position]),
+        )
+
+    def __iter__(self) -> Iterator[AnalysisResult]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def nbytes(self) -> int:
+        """
+        Returns the size of the column buffers in bytes, excluding the dictionaries.
+
+        Returns:
+            int: The number of bytes held by the typed arrays.
+        """
+        buffers = [*self._columns.values(), self._table_ids, self._table_offsets]
+        return sum(len(buffer) * buffer.itemsize for buffer in buffers)
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """
+        Exports the columns as NumPy arrays sharing memory with the batch.
+
+        Returns:
+            Dict[str, numpy.ndarray]: The 'index', 'failed', 'approximate', 'query_type' and count columns,
+            'table_ids' and 'table_offsets', plus the 'query_types' and 'table_names'
+            dictionaries as object arrays (which are copies).
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError("to_numpy requires NumPy: pip install numpy") from e
+
+        exported = {name: np.frombuffer(column, dtype=_numpy_dtype(column)) for name, column in self._columns.items()}
+        exported["failed"] = exported["failed"].view(np.bool_)
+        exported["approximate"] = exported["approximate"].view(np.bool_)
+        exported["table_ids"] = np.frombuffer(self._table_ids, dtype=_numpy_dtype(self._table_ids))
+        exported["table_offsets"] = np.frombuffer(self._table_offsets, dtype=_numpy_dtype(self._table_offsets))
+        exported["query_types"] = np.array(self.query_types, dtype=object)
+        exported["table_names"] = np.array(self.table_names, dtype=object)
+        return exported
+
+    def to_arrow(self):
+        """
+        Exports the batch as an Arrow record batch whose integer buffers are shared with
+        the batch. 'query_type' is a dictionary-encoded string column and 'tables' a list
+        of dictionary-encoded strings; MISSING counts are kept as -1.
+
+        Returns:
+            pyarrow.RecordBatch: The results, one row per query.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+        except ImportError as e:
+            raise ImportError("to_arrow requires pyarrow: pip install pyarrow") from e
+
+        def wrap(column: array, arrow_type) -> "pa.Array":
+            return pa.Array.from_buffers(arrow_type, len(column), [None, pa.py_buffer(column)])
+
+        columns = self._columns
+        query_type_ids = wrap(columns["query_type"], pa.int32())
+        missing_type = self._query_type_ids.get(None)
+        if missing_type is not None:
+            # Arrow dictionaries cannot hold nulls, so rows without a statement type become null indices
+            query_type_ids = pc.if_else(pc.equal(query_type_ids, missing_type), None, query_type_ids)
+        arrays = {
+            "index": wrap(columns["index"], pa.int64()),
+            "failed": wrap(columns["failed"], pa.int8()).cast(pa.bool_()),
+            "approximate": wrap(columns["approximate"], pa.int8()).cast(pa.bool_()),
+            "query_type": pa.DictionaryArray.from_arrays(
+                query_type_ids, pa.array([value or "" for value in self.query_types], type=pa.string())),
+            **{name: wrap(columns[name], pa.int32()) for name in COUNT_COLUMNS},
+            "tables": pa.LargeListArray.from_arrays(
+                wrap(self._table_offsets, pa.int64()),
+                pa.DictionaryArray.from_arrays(
+                    wrap(self._table_ids, pa.int32()), pa.array(self.table_names, type=pa.string()))),
+        }
+        return pa.RecordBatch.from_arrays(list(arrays.values()), names=list(arrays))
+
+    def write_parquet(self, path: os.PathLike, **kwargs) -> None:
+        """
+        Writes the batch to a Parquet file.
+
+        Args:
+            path (os.PathLike): The file to write.
+            **kwargs: Further keyword arguments for pyarrow.parquet.write_table, such as compression.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("write_parquet requires pyarrow: pip install pyarrow") from e
+
+        pq.write_table(pa.Table.from_batches([self.to_arrow()]), path, **kwargs)
+
+
+def _numpy_dtype(column: array) -> str:
+    """
+    Returns the NumPy dtype matching the item type of a typed array.
+    """
+    return f"i{column.itemsize}"
@@ -0,0 +1,236 @@
+from typing import (Any, Dict, Mapping, NamedTuple, Optional, Tuple)
+from pathlib import Path
+import csv
+import json
+import math
+import os
+
+# Fraction of the rows of the scanned tables assumed to survive a WHERE clause
+DEFAULT_WHERE_SELECTIVITY = 0.1
+
+
+class TableStats(NamedTuple):
+    """
+    The size of a table, as recorded in a catalog.
+
+    Attributes:
+        rows (int): The number of rows.
+        bytes (int): The number of bytes read by a full scan.
+    """
+    rows: int
+    bytes: int
+
+
+class CostEstimate(NamedTuple):
+    """
+    The static cost of a query, estimated from its analysis and a table catalog.
+
+    Attributes:
+        scan_bytes (int): The bytes read by scanning every table the query accesses.
+        scan_rows (int): The rows of these tables.
+        complexity (float): A unitless score ranking queries by the work they imply, see
+            CostModel.estimate.
+        full_scan (bool): Whether the query reads tables without any WHERE clause.
+        unknown_tables (Tuple[str, ...]): The tables missing from the catalog, counted
+            with the default statistics.
+    """
+    scan_bytes: int
+    scan_rows: int
+    complexity: float
+    full_scan: bool
+    unknown_tables: Tuple[str, ...] = ()
+
+
+class TableCatalog:
+    """
+    This class maps table names to their row counts and byte sizes, read from a local
+    file such as an export of information_schema, so that costs can be estimated offline.
+
+    Names are matched case-insensitively. A qualified name such as 'sales.orders' that is
+    not in the catalog falls back to its last part, 'orders'.
+    """
+
+    def __init__(self, tables: Optional[Mapping[str, TableStats]] = None):
+        """
+        Initializes a catalog.
+
+        Args:
+            tables (Optional[Mapping[str, TableStats]]): The statistics by table name.
+        """
+        self._tables: Dict[str, TableStats] = {}
+        for name, stats in (tables or {}).items():
+            self.add(name, *stats)
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def add(self, name: str, rows: int, size: int) -> None:
+        """
+        Records the statistics of a table, replacing any previous ones.
+
+        Args:
+            name (str): The table name.
+            rows (int): The number of rows.
+            size (int): The number of bytes read by a full scan.
+
+        Raises:
+            ValueError: If a statistic is not a non-negative integer.
+        """
+        try:
+            rows, size = int(rows), int(size)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid statistics for table {name}: rows={rows!r}, bytes={size!r}") from None
+        if rows < 0 or size < 0:
+            raise ValueError(f"Invalid statistics for table {name}: rows and bytes must be non-negative.")
+        self._tables[name.lower()] = TableStats(rows, size)
+
+    def get(self, name: str) -> Optional[TableStats]:
+        """
+        Looks up the statistics of a table.
+
+        Args:
+            name (str): The table name, possibly qualified, in any case.
+
+        Returns:
+            Optional[TableStats]: The statistics, or None if the table is unknown.
+        """
+        key = name.lower()
+        stats = self._tables.get(key)
+        if stats is None and "." in key:
+            stats = self._tables.get(key.rsplit(".", 1)[1])
+        return stats
+
+    @classmethod
+    def load(cls, path: os.PathLike) -> "TableCatalog":
+        """
+        Reads a catalog file. A .json file holds an object mapping each table name to an
+        object with 'rows' and 'bytes'; a .csv file has the columns 'table', 'rows' and
+        'bytes'.
+
+        Args:
+            path (os.PathLike): The catalog file.
+
+        Returns:
+            TableCatalog: The catalog.
+
+        Raises:
+            ValueError: If the file is not a valid catalog.
+        """
+        catalog = cls()
+        if Path(path).suffix.lower() == ".csv":
+            with open(path, newline="", encoding="utf-8") as f:
+                reader = csv.DictReader(f)
+                if not {"table", "rows", "bytes"} <= set(reader.fieldnames or ()):
+                    raise ValueError(f"{path} must have the columns table, rows and bytes.")
+                for row in reader:
+                    catalog.add(row["table"], row["rows"], row["bytes"])
+            return catalog
+
+        with open(path, encoding="utf-8") as f:
+            tables = json.load(f)
+        if not isinstance(tables, dict):
+            raise ValueError(f"{path} must hold an object mapping table names to their statistics.")
+        for name, stats in tables.items():
+            if not isinstance(stats, dict) or "rows" not in stats or "bytes" not in stats:
+                raise ValueError(f"Invalid statistics for table {name} in {path}.")
+            catalog.add(name, stats["rows"], stats["bytes"])
+        return catalog
+
+
+class CostModel:
+    """
+    This class estimates the cost of queries before they run, from the results of
+    perform_full_analysis and a TableCatalog, without any network access. An estimate
+    is a handful of dictionary lookups, so it can run inline on every query of a batch.
+
+    The model is static: it does not know about indexes, partitions or the columns
+    read, so scan_bytes is the size of every table accessed, an upper bound for row
+    stores and unpartitioned column stores. The tables written by INSERT, UPDATE and
+    DELETE are counted as read. Its purpose is to rank queries and flag the expensive
+    ones, not to predict a bill.
+
+    Attributes:
+        catalog (TableCatalog): The table statistics.
+        where_selectivity (float): The fraction of rows assumed to pass a WHERE clause.
+        default_stats (TableStats): The statistics assumed for tables missing from the catalog.
+        max_scan_bytes (Optional[int]): The scan size above which a query is expensive.
+        max_complexity (Optional[float]): The complexity above which a query is expensive.
+    """
+
+    def __init__(self, catalog: TableCatalog,
+                 where_selectivity: float = DEFAULT_WHERE_SELECTIVITY,
+                 default_stats: TableStats = TableStats(0, 0),
+                 max_scan_bytes: Optional[int] = None,
+                 max_complexity: Optional[float] = None):
+        """
+        Initializes a cost model.
+
+        Args:
+            catalog (TableCatalog): The table statistics.
+            where_selectivity (float): The fraction of rows assumed to pass a WHERE clause.
+            default_stats (TableStats): The statistics of tables missing from the catalog.
+            max_scan_bytes (Optional[int]): The scan size above which is_expensive is True.
+            max_complexity (Optional[float]): The complexity above which is_expensive is True.
+
+        Raises:
+            ValueError: If where_selectivity is not in (0, 1].
+        """
+        if not 0 < where_selectivity <= 1:
+            raise ValueError("where_selectivity must be in (0, 1].")
+        self.catalog = catalog
+        self.where_selectivity = where_selectivity
+        self.default_stats = TableStats(*default_stats)
+        self.max_scan_bytes = max_scan_bytes
+        self.max_complexity = max_complexity
+
+    def estimate(self, result: Dict[str, Any]) -> CostEstimate:
+        """
+        Estimates the cost of a query from its analysis.
+
+        The complexity is log10(1 + rows) * (1 + joins) * (1 + max_depth), where rows are
+        the rows of the tables accessed, scaled by where_selectivity when the query has a
+        WHERE clause. It grows with the order of magnitude of the data, and multiplies
+        with every JOIN and every level of subquery nesting. Metrics missing from the
+        result, as in approximate analyses, count as zero, so a query whose WHERE
+        clauses were not counted is treated as a full scan.
+
+        Args:
+            result (Dict[str, Any]): The dictionary returned by perform_full_analysis.
+
+        Returns:
+            CostEstimate: The estimated scan size and complexity.
+        """
+        scan_rows = scan_bytes = 0
+        unknown = []
+        tables = result.get("tables") or ()
+        for table in tables:
+            stats = self.catalog.get(table)
+            if stats is None:
+                unknown.append(table)
+                stats = self.default_stats
+            scan_rows += stats.rows
+            scan_bytes += stats.bytes
+
+        filtered = (result.get("where") or 0) > 0
+        rows = scan_rows * self.where_selectivity if filtered else scan_rows
+        joins = max(result.get("joins") or 0, 0)
+        max_depth = max((result.get("subqueries_and_maxdepth") or (0, 0))[1], 0)
+        complexity = math.log10(1 + rows) * (1 + joins) * (1 + max_depth)
+        return CostEstimate(scan_bytes, scan_rows, round(complexity, 3),
+                            bool(tables) and not filtered, tuple(sorted(unknown)))
+
+    def is_expensive(self, estimate: CostEstimate) -> bool:
+        """
+        Checks an estimate against the thresholds of the model.
+
+        Args:
+            estimate (CostEstimate): The estimate of a query.
+
+        Returns:
+            bool: Whether the scan size or the complexity exceeds its threshold.
+        """
+        return ((self.max_scan_bytes is not None and estimate.scan_bytes > self.max_scan_bytes)
+                or (self.max_complexity is not None and estimate.complexity > self.max_complexity))
@@ -0,0 +1,368 @@
+from typing import (Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union)
+from array import array
+from bisect import bisect_left
+from itertools import chain
+import os
+import pickle
+
+from sql_analyzer.batch import QueryResult
+
+
+# Version of the file format written by QueryIndex.save
+INDEX_FORMAT_VERSION = 2
+
+# Integer metrics indexed by value, with the function reading each one from a result
+INDEXED_METRICS = {
+    "functions": lambda result: result.get("functions"),
+    "where": lambda result: result.get("where"),
+    "joins": lambda result: result.get("joins"),
+    "subqueries": lambda result: result.get("subqueries_and_maxdepth", (None, None))[0],
+    "max_depth": lambda result: result.get("subqueries_and_maxdepth", (None, None))[1],
+}
+
+
+class QueryIndex:
+    """
+    This class is an inverted index over the analysis results of a query corpus. It maps
+    tables, statement types and the values of the integer metrics to the ids of the
+    queries, so that questions such as "which queries touch table X", "which queries
+    access both A and B" or "which queries have a subquery depth above 3" are answered
+    from posting lists instead of analyzing the corpus again.
+
+    Query ids are the positions of the queries in the corpus, as in QueryResult.index, or
+    any other integers chosen by the caller. Table names are matched case-insensitively.
+    Posting lists are kept sorted and free of duplicates as ids are added and merged, so
+    lookups return them as they are and find intersects them without sorting.
+
+    The index grows incrementally with add and add_results, and is persisted with save
+    and load. Files are serialized with pickle: only load index files you trust.
+
+    Attributes:
+        size (int): The number of queries indexed.
+        failures (int): The number of failed analyses skipped by add_results.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty index.
+        """
+        self.size = 0
+        self.failures = 0
+        self._next_id = 0
+        self._all_ids = array("q")
+        # Whether a query id was indexed twice, possibly under several values of a metric
+        self._reindexed = False
+        self._tables: Dict[str, array] = {}
+        self._query_types: Dict[str, array] = {}
+        self._metrics: Dict[str, Dict[int, array]] = {name: {} for name in INDEXED_METRICS}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def _insert(posting: array, query_id: int) -> bool:
+        """
+        Adds a query id to a sorted posting list unless it is already there. Ids usually
+        arrive in ascending order and are appended.
+
+        Returns:
+            bool: Whether the id was added.
+        """
+        if not posting or query_id > posting[-1]:
+            posting.append(query_id)
+            return True
+        position = bisect_left(posting, query_id)
+        if posting[position] == query_id:
+            return False
+        posting.insert(position, query_id)
+        return True
+
+    @classmethod
+    def _post(cls, postings: Dict[Any, array], key: Any, query_id: int) -> None:
+        """
+        Adds a query id to the posting list of a key.
+        """
+        posting = postings.get(key)
+        if posting is None:
+            postings[key] = array("q", (query_id,))
+        else:
+            cls._insert(posting, query_id)
+
+    def add(self, result: Dict[str, Any], query_id: Optional[int] = None) -> int:
+        """
+        Indexes the analysis of one query.
+
+        Args:
+            result (Dict[str, Any]): The dictionary returned by perform_full_analysis.
+            query_id (Optional[int]): The id of the query. Defaults to one more than the
+                largest id indexed so far.
+
+        Returns:
+            int: The id of the query.
+        """
+        if query_id is None:
+            query_id = self._next_id
+        self._next_id = max(self._next_id, query_id + 1)
+        self.size += 1
+        if not self._insert(self._all_ids, query_id):
+            self._reindexed = True
+
+        for table in {table.lower() for table in result.get("tables", ())}:
+            self._post(self._tables, table, query_id)
+
+        query_type = result.get("query_type")
+        if query_type is not None:
+            self._post(self._query_types, query_type, query_id)
+
+        for name, read in INDEXED_METRICS.items():
+            value = read(result)
+            if value is not None and value >= 0:
+                self._post(self._metrics[name], value, query_id)
+        return query_id
+
+    def add_results(self, results: Iterable[Union[QueryResult, Dict[str, Any]]]) -> "QueryIndex":
+        """
+        Indexes a stream of results, such as the output of analyze_many. QueryResults are
+        indexed under their index; failed analyses are counted in failures and skipped,
+        their ids remaining reserved.
+
+        Args:
+            results (Iterable[Union[QueryResult, Dict[str, Any]]]): The results to index.
+
+        Returns:
+            QueryIndex: The index itself.
+        """
+        for item in results:
+            if isinstance(item, QueryResult):
+                if item.result is None:
+                    self.failures += 1
+                    self._next_id = max(self._next_id, item.index + 1)
+                    continue
+                self.add(item.result, item.index)
+            else:
+                self.add(item)
+        return self
+
+    @staticmethod
+    def _ids(posting: Optional[Sequence[int]]) -> List[int]:
+        """
+        Returns the ids of a posting list, which are sorted and distinct, as a list.
+        """
+        if not posting:
+            return []
+        return posting.tolist() if isinstance(posting, array) else list(posting)
+
+    @staticmethod
+    def _intersect(smaller: Sequence[int], larger: Sequence[int]) -> List[int]:
+        """
+        Intersects two sorted lists of distinct ids. A short list is looked up in the
+        long one by binary search, resuming from the last match; lists of similar length
+        are intersected with a set of the shorter one, keeping the order of the longer.
+        """
+        if len(smaller) * 32 < len(larger):
+            found = []
+            low, end = 0, len(larger)
+            for query_id in smaller:
+                low = bisect_left(larger, query_id, low, end)
+                if low == end:
+                    break
+                if larger[low] == query_id:
+                    found.append(query_id)
+            return found
+        members = set(smaller)
+        return [query_id for query_id in larger if query_id in members]
+
+    def with_table(self, table: str) -> List[int]:
+        """
+        Finds the queries accessing a table.
+
+        Args:
+            table (str): The table name, in any case.
+
+        Returns:
+            List[int]: The query ids, in ascending order.
+        """
+        return self._ids(self._tables.get(table.lower()))
+
+    def with_query_type(self, query_type: str) -> List[int]:
+        """
+        Finds the queries of a statement type.
+
+        Args:
+            query_type (str): The statement type, e.g. 'SELECT'.
+
+        Returns:
+            List[int]: The query ids, in ascending order.
+        """
+        return self._ids(self._query_types.get(query_type.upper()))
+
+    def with_metric(self, metric: str, minimum: Optional[int] = None,
+                    maximum: Optional[int] = None) -> List[int]:
+        """
+        Finds the queries whose metric lies in a range, e.g. with_metric('max_depth', minimum=4).
+
+        Args:
+            metric (str): One of the names of INDEXED_METRICS.
+            minimum (Optional[int]): The smallest value included. Defaults to no lower bound.
+            maximum (Optional[int]): The largest value included. Defaults to no upper bound.
+
+        Returns:
+            List[int]: The query ids, in ascending order.
+
+        Raises:
+            ValueError: If the metric is not indexed.
+        """
+        return self._ids(self._metric_ids(metric, minimum, maximum))
+
+    def _metric_ids(self, metric: str, minimum: Optional[int], maximum: Optional[int]) -> Sequence[int]:
+        """
+        Returns the sorted, distinct ids of the queries whose metric lies in a range: the
+        posting list itself when a single value matches.
+        """
+        postings = self._metrics.get(metric)
+        if postings is None:
+            raise ValueError(f"Unknown metric: {metric}. Indexed metrics: {', '.join(INDEXED_METRICS)}")
+        selected = [posting for value, posting in postings.items()
+                    if (minimum is None or value >= minimum) and (maximum is None or value <= maximum)]
+        if len(selected) <= 1:
+            return selected[0] if selected else ()
+        # Sorting concatenated sorted runs is close to linear
+        ids = sorted(chain.from_iterable(selected))
+        return list(dict.fromkeys(ids)) if self._reindexed else ids
+
+    def find(self, tables: Iterable[str] = (),
+             query_type: Optional[str] = None,
+             ranges: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None) -> List[int]:
+        """
+        Finds the queries matching every given condition, e.g.
+        find(tables=["orders"], ranges={"max_depth": (4, None)}). The queries accessing
+        two tables and containing a JOIN are find(tables=[a, b], ranges={"joins": (1, None)}),
+        although results do not record whether those two tables are joined to each other.
+
+        Args:
+            tables (Iterable[str]): Tables that must all be accessed.
+            query_type (Optional[str]): The statement type.
+            ranges (Optional[Dict[str, Tuple[Optional[int], Optional[int]]]]): Inclusive
+                (minimum, maximum) bounds by metric name; None leaves a side unbounded.
+
+        Returns:
+            List[int]: The query ids, in ascending order. Without any condition, every
+            indexed query id.
+
+        Raises:
+            ValueError: If a metric is not indexed.
+        """
+        candidates: List[Sequence[int]] = [self._tables.get(table.lower(), ()) for table in tables]
+        if query_type is not None:
+            candidates.append(self._query_types.get(query_type.upper(), ()))
+        for metric, (minimum, maximum) in (ranges or {}).items():
+            candidates.append(self._metric_ids(metric, minimum, maximum))
+        if not candidates:
+            return self._ids(self._all_ids)
+
+        # Intersect from the shortest list so that the working set only shrinks
+        candidates.sort(key=len)
+        ids = self._ids(candidates[0])
+        for other in candidates[1:]:
+            if not ids:
+                break
+            ids = self._intersect(ids, other)
+        return ids
+
+    def tables(self) -> Dict[str, int]:
+        """
+        Returns the number of queries accessing each indexed table.
+
+        Returns:
+            Dict[str, int]: The query counts, by lower-cased table name.
+        """
+        return {table: len(posting) for table, posting in self._tables.items()}
+
+    def merge(self, other: "QueryIndex") -> None:
+        """
+        Adds the postings of another index, e.g. one built per shard. The ids of both
+        indexes are kept as they are, so the shards should index distinct query ids.
+
+        Args:
+            other (QueryIndex): The index to merge into this one.
+        """
+        self.size += other.size
+        self.failures += other.failures
+        self._next_id = max(self._next_id, other._next_id)
+        expected = len(self._all_ids) + len(other._all_ids)
+        self._all_ids = self._merge_postings(self._all_ids, other._all_ids)
+        self._reindexed = self._reindexed or other._reindexed or len(self._all_ids) < expected
+        for mine, theirs in ((self._tables, other._tables), (self._query_types, other._query_types),
+                             *((self._metrics[name], other._metrics[name]) for name in INDEXED_METRICS)):
+            for key, posting in theirs.items():
+                mine[key] = self._merge_postings(mine.get(key), posting)
+
+    @staticmethod
+    def _merge_postings(mine: Optional[array], theirs: array) -> array:
+        """
+        Merges two sorted posting lists into one, appending when the ids of the second
+        follow those of the first, as with shards of consecutive ids.
+        """
+        if not mine:
+            return array("q", theirs)
+        if not theirs:
+            return mine
+        if theirs[0] > mine[-1]:
+            mine.extend(theirs)
+            return mine
+        return array("q", sorted(set(mine).union(theirs)))
+
+    def save(self, path: os.PathLike) -> None:
+        """
+        Writes the index to a file. The file is replaced atomically, so a reader never
+        sees a partially written index.
+
+        Args:
+            path (os.PathLike): The destination file.
+        """
+        state = {
+            "version": INDEX_FORMAT_VERSION,
+            "size": self.size,
+            "failures": self.failures,
+            "next_id": self._next_id,
+            "all_ids": self._all_ids,
+            "reindexed": self._reindexed,
+            "tables": self._tables,
+            "query_types": self._query_types,
+            "metrics": self._metrics,
+        }
+        temporary = f"{os.fspath(path)}.tmp"
+        with open(temporary, "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: os.PathLike) -> "QueryIndex":
+        """
+        Reads an index written by save. More results can be added to it and saved again.
+
+        Args:
+            path (os.PathLike): The index file.
+
+        Returns:
+            QueryIndex: The index.
+
+        Raises:
+            ValueError: If the file was written with another format version.
+        """
+        with open(path, "rb") as file:
+            state = pickle.load(file)
+        if not isinstance(state, dict) or state.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"{path} is not a query index of format version {INDEX_FORMAT_VERSION}.")
+        index = cls()
+        index.size = state["size"]
+        index.failures = state["failures"]
+        index._next_id = state["next_id"]
+        index._all_ids = state["all_ids"]
+        index._reindexed = state["reindexed"]
+        index._tables = state["tables"]
+        index._query_types = state["query_types"]
+        index._metrics = state["metrics"]
+        return index
@@ -0,0 +1,193 @@
+from typing import (Any, Callable, Dict, List, Optional)
+import heapq
+import itertools
+
+# Number of characters of the query kept with its metrics
+QUERY_PREFIX_LENGTH = 200
+
+
+class AnalysisMetrics:
+    """
+    This class holds the instrumentation of one perform_full_analysis call: the time spent
+    in each stage and counters describing the size of the query.
+
+    Only the beginning of the query is kept, so that metrics retained for a whole
+    corpus do not hold every query text.
+
+    Attributes:
+        query (str): The first QUERY_PREFIX_LENGTH characters of the analyzed query.
+        label (Optional[Any]): An identifier of the query, such as its position in a batch.
+        total_seconds (float): The wall time of the whole analysis.
+        stage_seconds (Dict[str, float]): The wall time of each stage ('parse', 'single_pass'
+            and each analyze_* method that ran on its own).
+        counters (Dict[str, int]): Sizes such as 'query_length', 'tokens', 'tree_nodes' and 'errors'.
+    """
+
+    __slots__ = ("query", "label", "total_seconds", "stage_seconds", "counters")
+
+    def __init__(self, query: str, label: Optional[Any] = None):
+        self.query = query[:QUERY_PREFIX_LENGTH]
+        self.label = label
+        self.total_seconds = 0.0
+        self.stage_seconds: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        return (f"AnalysisMetrics(label={self.label!r}, total_seconds={self.total_seconds:.6f}, "
+                f"stage_seconds={self.stage_seconds!r}, counters={self.counters!r})")
+
+
+class MetricsSink:
+    """
+    The interface of the objects RawSQLAnalyzer reports its instrumentation to.
+    """
+
+    def record(self, metrics: AnalysisMetrics) -> None:
+        """
+        Receives the metrics of one analysis.
+
+        Args:
+            metrics (AnalysisMetrics): The metrics to record.
+        """
+        raise NotImplementedError
+
+
+class CallbackSink(MetricsSink):
+    """
+    A sink that forwards every AnalysisMetrics to a callable, e.g. to push it to a
+    monitoring client or to append it to a list.
+    """
+
+    def __init__(self, callback: Callable[[AnalysisMetrics], None]):
+        self.callback = callback
+
+    def record(self, metrics: AnalysisMetrics) -> None:
+        self.callback(metrics)
+
+
+class MetricsAggregator(MetricsSink):
+    """
+    A sink that aggregates the metrics of a batch in constant memory: the total and
+    maximum time of each stage, the sum of each counter, and the slowest queries.
+
+    Attributes:
+        top_n (int): The number of slowest queries kept.
+        queries (int): The number of analyses recorded.
+        total_seconds (float): The summed wall time of the recorded analyses.
+    """
+
+    def __init__(self, top_n: int = 10):
+        """
+        Initializes an empty aggregator.
+
+        Args:
+            top_n (int): The number of slowest queries to keep.
+        """
+        self.top_n = top_n
+        self.queries = 0
+        self.total_seconds = 0.0
+        self._stage_totals: Dict[str, float] = {}
+        self._stage_calls: Dict[str, int] = {}
+        self._stage_max: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        self._slowest: List[tuple] = []  # Min-heap of (total_seconds, sequence, metrics)
+        self._sequence = itertools.count()
+
+    def record(self, metrics: AnalysisMetrics) -> None:
+        self.queries += 1
+        self.total_seconds += metrics.total_seconds
+        for stage, seconds in metrics.stage_seconds.items():
+            self._stage_totals[stage] = self._stage_totals.get(stage, 0.0) + seconds
+            self._stage_calls[stage] = self._stage_calls.get(stage, 0) + 1
+            self._stage_max[stage] = max(self._stage_max.get(stage, 0.0), seconds)
+        for name, value in metrics.counters.items():
+            self._counters[name] = self._counters.get(name, 0) + value
+
+        # The slowest analyses are summarized by report, not on every record
+        if self.top_n > 0:
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, (metrics.total_seconds, next(self._sequence), metrics))
+            elif metrics.total_seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, (metrics.total_seconds, next(self._sequence), metrics))
+
+    @staticmethod
+    def _summarize(metrics: AnalysisMetrics) -> Dict[str, Any]:
+        """
+        Keeps what the report needs from one analysis, with the query shortened.
+        """
+        slowest_stage = max(metrics.stage_seconds, key=metrics.stage_seconds.get, default=None)
+        return {
+            "label": metrics.label,
+            "query": " ".join(metrics.query.split()),
+            "total_seconds": metrics.total_seconds,
+            "slowest_stage": slowest_stage,
+            "counters": dict(metrics.counters),
+        }
+
+    def merge(self, other: "MetricsAggregator") -> None:
+        """
+        Adds the metrics aggregated by another aggregator, e.g. one per worker.
+
+        Args:
+            other (MetricsAggregator): The aggregator to merge into this one.
+        """
+        self.queries += other.queries
+        self.total_seconds += other.total_seconds
+        for stage, seconds in other._stage_totals.items():
+            self._stage_totals[stage] = self._stage_totals.get(stage, 0.0) + seconds
+            self._stage_calls[stage] = self._stage_calls.get(stage, 0) + other._stage_calls[stage]
+            self._stage_max[stage] = max(self._stage_max.get(stage, 0.0), other._stage_max[stage])
+        for name, value in other._counters.items():
+            self._counters[name] = self._counters.get(name, 0) + value
+        for total_seconds, _, metrics in other._slowest:
+            entry = (total_seconds, next(self._sequence), metrics)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, entry)
+            elif total_seconds > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarizes the recorded analyses.
+
+        Returns:
+            Dict[str, Any]: The number of queries and total time, per-stage statistics
+            ordered by total time, summed counters and the slowest queries.
+        """
+        stages = {}
+        for stage in sorted(self._stage_totals, key=self._stage_totals.get, reverse=True):
+            total = self._stage_totals[stage]
+            stages[stage] = {
+                "total_seconds": total,
+                "calls": self._stage_calls[stage],
+                "mean_ms": total / self._stage_calls[stage] * 1e3,
+                "max_ms": self._stage_max[stage] * 1e3,
+                "share": total / self.total_seconds if self.total_seconds else 0.0,
+            }
+        return {
+            "queries": self.queries,
+            "total_seconds": self.total_seconds,
+            "stages": stages,
+            "counters": dict(self._counters),
+            "slowest_queries": [self._summarize(metrics)
+                                for _, _, metrics in sorted(self._slowest, key=lambda entry: entry[:2], reverse=True)],
+        }
+
+    def format_report(self) -> str:
+        """
+        Renders report() as human-readable text.
+
+        Returns:
+            str: The report.
+        """
+        report = self.report()
+        lines = [f"{report['queries']} queries analyzed in {report['total_seconds']:.3f}s"]
+        lines.append(f"{'stage':<38}{'total s':>10}{'share':>8}{'mean ms':>10}{'max ms':>10}")
+        for stage, stats in report["stages"].items():
+            lines.append(f"{stage:<38}{stats['total_seconds']:>10.3f}{stats['share']:>8.1%}"
+                         f"{stats['mean_ms']:>10.3f}{stats['max_ms']:>10.3f}")
+        lines.append("slowest queries:")
+        for summary in report["slowest_queries"]:
+            lines.append(f"  {summary['total_seconds'] * 1e3:9.3f}ms  [{summary['label']}] "
+                         f"slowest stage: {summary['slowest_stage']}  {summary['query'][:80]}")
+        return "\n".join(lines)
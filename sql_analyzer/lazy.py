@@ -0,0 +1,34 @@
+from types import ModuleType
+import importlib
+import sys
+
+
+class LazyModule(ModuleType):
+    """
+    This class stands in for a module until one of its attributes is first read, which
+    imports the module normally and returns the attribute. Every later read is forwarded
+    to the real module, so patching the module is seen through the stand-in as well.
+
+    Used for sqlparse and the modules built on it, so that importing the package, or
+    analyzing queries from their text alone, never pays for loading the parser.
+    """
+
+    def __getattr__(self, name: str):
+        module = sys.modules.get(self.__name__)
+        if module is None:
+            module = importlib.import_module(self.__name__)
+        return getattr(module, name)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Returns a module that is only imported when one of its attributes is first read.
+
+    Args:
+        name (str): The absolute name of the module.
+
+    Returns:
+        ModuleType: The module itself if it was already imported, or a LazyModule.
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
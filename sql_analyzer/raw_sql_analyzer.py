@@ -1,17 +1,85 @@
 import logging
-from typing import (Tuple, Any, Dict, Set, List)
-import inspect
+from typing import (Tuple, Any, Dict, Set, List, Iterable, Iterator, Callable, Optional, Mapping, NamedTuple, Union)
+from collections import Counter
+from types import MappingProxyType
+import time
 
-import sqlparse
-from sqlparse.tokens import Token as TokenType
+from sql_analyzer import text
+from sql_analyzer.backends import (ParserBackend, DEFAULT_BACKEND)
+from sql_analyzer.instrumentation import (AnalysisMetrics, MetricsSink)
+from sql_analyzer.lazy import lazy_import
 
-from sql_analyzer import utils
+# The parser is only loaded once a query is tokenized or parsed
+sqlparse = lazy_import("sqlparse")
+utils = lazy_import("sql_analyzer.utils")
 
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Inputs an analyzer can depend on, from the cheapest to the most expensive to build
+REQUIRES_TEXT = "text"
+REQUIRES_TOKENS = "tokens"
+REQUIRES_TREE = "tree"
+
+# Ways of extracting table names: from the token stream, or with the raw-string regex fast mode
+TABLES_FROM_TOKENS = "tokens"
+TABLES_FROM_REGEX = "regex"
+
+# Part of every cache key; bump it whenever a change to an analyzer changes its results
+ANALYSIS_VERSION = "1"
+
+
+def requires(level: str) -> Callable:
+    """
+    Declares the input an analyze_* method needs: the raw text, the ungrouped token
+    stream or the grouped parse tree. Methods without a declaration are assumed to
+    need the parse tree.
+
+    Args:
+        level (str): One of REQUIRES_TEXT, REQUIRES_TOKENS or REQUIRES_TREE.
+
+    Returns:
+        Callable: A decorator recording the requirement on the method.
+    """
+    if level not in (REQUIRES_TEXT, REQUIRES_TOKENS, REQUIRES_TREE):
+        raise ValueError(f"Unknown analyzer requirement: {level}")
+
+    def decorator(method: Callable) -> Callable:
+        method.requires = level
+        return method
+    return decorator
+
+
+class AnalyzerSpec(NamedTuple):
+    """
+    An entry of the analyzer registry of a RawSQLAnalyzer class.
+
+    Attributes:
+        name (str): The name used to select the analyzer in perform_full_analysis.
+        func (Callable): Called with the RawSQLAnalyzer instance.
+        requires (str): The input the analyzer needs, REQUIRES_TEXT, REQUIRES_TOKENS or REQUIRES_TREE.
+        result_key (Optional[str]): The result key the return value of func is stored under,
+            or None for analyze_* methods, which store their own results.
+    """
+    name: str
+    func: Callable
+    requires: str
+    result_key: Optional[str]
+
+
+class AnalysisBudget(NamedTuple):
+    """
+    Limits on the work perform_full_analysis spends on one query. A query over budget
+    gets an approximate analysis from the raw text instead, see RawSQLAnalyzer.
+
+    Attributes:
+        max_length (Optional[int]): The maximum number of characters handed to the parser.
+        max_tokens (Optional[int]): The maximum number of tokens of a query that is parsed.
+        max_seconds (Optional[float]): The wall time after which no further stage is started.
+    """
+    max_length: Optional[int] = None
+    max_tokens: Optional[int] = None
+    max_seconds: Optional[float] = None
+
 
 class RawSQLAnalyzer:
     """
@@ -20,39 +88,274 @@ class RawSQLAnalyzer:
     like functions, 'WHERE' clauses, subqueries, and to determine the depth of these subqueries.
     It also allows retrieving the names of tables used in the query. 
 
+    perform_full_analysis collects the tree-based metrics in a single traversal of the
+    parsed query; the individual analyze_* methods remain available on their own.
+
+    Each analyze_* method declares whether it needs the raw text, the ungrouped token
+    stream or the grouped parse tree; the parse tree, whose grouping pass dominates parse
+    time, is only built by the configured backend when a method that needs it runs.
+
+    The analyze_* methods look at the first statement of the query only. Scripts holding
+    several statements are analyzed with iter_statement_analyses and perform_script_analysis,
+    which parse one statement at a time.
+
     Attributes:
         query (str): The raw SQL query string to be analyzed.
+        backend (ParserBackend): The parser used to tokenize and parse the query.
+        table_extraction (str): How table names are extracted, TABLES_FROM_TOKENS or TABLES_FROM_REGEX.
+        compact_literals (bool): Whether literal runs are collapsed before the query is tokenized.
+        budget (Optional[AnalysisBudget]): Limits on the work spent on the query; queries over
+            budget get an approximate analysis. No limit applies when it is None.
+        results_only (bool): Whether perform_full_analysis closes the analyzer when it is done.
+        closed (bool): Whether the parse tree and the query texts have been released by close.
         _parsed_query (sqlparse.sql.Statement): The parsed form of the SQL query.
+        _tokens (List[sqlparse.sql.Token]): The ungrouped tokens of the SQL query.
+        metrics_sink (Optional[MetricsSink]): Receives the AnalysisMetrics of every
+            perform_full_analysis call. Instrumentation is disabled when it is None.
+        cache (Optional[Any]): A result cache with get(key) and put(key, result) methods,
+            such as AnalysisCache or SQLiteAnalysisCache, consulted by perform_full_analysis.
         _extracted_data (Dict[str, Any]): A dictionary to store extracted data from the query.
     """
 
-    def __init__(self, query: str):
+    # Set on the class to instrument every analyzer, e.g. for the duration of a batch job
+    metrics_sink: Optional[MetricsSink] = None
+    # Set on the class to cache the results of every analyzer
+    cache: Optional[Any] = None
+    # Set on the class to bound the work spent on every query
+    budget: Optional[AnalysisBudget] = None
+
+    # Analyzers whose results are produced by the single-pass traversal, with their result key
+    _SINGLE_PASS_ANALYZERS = {
+        "analyze_count_functions": "functions",
+        "analyze_count_where": "where",
+        "analyze_count_subqueries_and_depth": "subqueries_and_maxdepth",
+        "analyze_count_joins": "joins",
+    }
+
+    def __init__(self, query: str, backend: Optional[ParserBackend] = None,
+                 table_extraction: str = TABLES_FROM_TOKENS,
+                 metrics_sink: Optional[MetricsSink] = None,
+                 cache: Optional[Any] = None,
+                 compact_literals: bool = False,
+                 budget: Optional[AnalysisBudget] = None,
+                 results_only: bool = False):
         """
         Initializes the RawSQLAnalyzer with a specific SQL query.
 
         Args:
             query (str): The raw SQL query string to be analyzed.
+            backend (Optional[ParserBackend]): The parser to use. Defaults to the sqlparse backend.
+            table_extraction (str): TABLES_FROM_TOKENS to resolve table names from the token
+                stream, or TABLES_FROM_REGEX for the faster regex scan of the raw query.
+            metrics_sink (Optional[MetricsSink]): Where to report the timings and counters of
+                perform_full_analysis. Defaults to the class-level metrics_sink.
+            cache (Optional[Any]): A cache of full analysis results with get(key) and
+                put(key, result) methods. Defaults to the class-level cache.
+            compact_literals (bool): Whether long runs of literals, such as huge IN lists
+                and VALUES blocks, are collapsed by text.compact_literal_runs before the
+                query is tokenized. The results are unchanged; parsing time and memory no
+                longer grow with the size of the data embedded in the query.
+            budget (Optional[AnalysisBudget]): Limits on the work spent on the query by
+                perform_full_analysis. Defaults to the class-level budget.
+            results_only (bool): Whether perform_full_analysis closes the analyzer once
+                it is done, keeping only the results. Analyzers retained next to their
+                results then no longer hold on to parse trees and query texts.
         """
         if not isinstance(query, str):
             raise ValueError("The query must be a string.")
+        if table_extraction not in (TABLES_FROM_TOKENS, TABLES_FROM_REGEX):
+            raise ValueError(f"Unknown table extraction mode: {table_extraction}")
+        if budget is not None and any(limit is not None and limit <= 0 for limit in budget):
+            raise ValueError("The limits of the budget must be positive.")
         
         self.query = query
+        self.backend = backend or DEFAULT_BACKEND
+        self.table_extraction = table_extraction
+        self.compact_literals = compact_literals
+        self.results_only = results_only
+        self.closed = False
+        if metrics_sink is not None:
+            self.metrics_sink = metrics_sink
+        if cache is not None:
+            self.cache = cache
+        if budget is not None:
+            self.budget = budget
+        self._source = None
         self._parsed_query = None
+        self._tokens = None
         self._extracted_data: Dict[str, Any] = {}
 
+    @classmethod
+    def from_statement(cls, statement: "sqlparse.sql.Statement",
+                       backend: Optional[ParserBackend] = None,
+                       table_extraction: str = TABLES_FROM_TOKENS,
+                       metrics_sink: Optional[MetricsSink] = None,
+                       cache: Optional[Any] = None,
+                       compact_literals: bool = False,
+                       budget: Optional[AnalysisBudget] = None,
+                       results_only: bool = False) -> "RawSQLAnalyzer":
+        """
+        Creates an analyzer for an already parsed statement, without parsing it again.
+
+        Args:
+            statement (sqlparse.sql.Statement): The parsed SQL statement.
+            backend (Optional[ParserBackend]): The parser to use. Defaults to the sqlparse backend.
+            table_extraction (str): How table names are extracted.
+            metrics_sink (Optional[MetricsSink]): Where to report the instrumentation.
+            cache (Optional[Any]): A cache of full analysis results.
+            compact_literals (bool): Whether literal runs are collapsed before parsing.
+            budget (Optional[AnalysisBudget]): Limits on the work spent on the statement.
+            results_only (bool): Whether the analyzer is closed after perform_full_analysis.
+
+        Returns:
+            RawSQLAnalyzer: An analyzer whose query is the text of the statement.
+        """
+        analyzer = cls(str(statement), backend, table_extraction, metrics_sink, cache,
+                       compact_literals, budget, results_only)
+        analyzer._parsed_query = statement
+        return analyzer
+
+    @property
+    def source(self) -> str:
+        """
+        The text handed to the parser: the query with its literal runs collapsed if
+        compact_literals is set, and otherwise the query itself. Regex-based analyses
+        and cache keys keep using the raw query.
+
+        Returns:
+            str: The text to tokenize.
+
+        Raises:
+            RuntimeError: If the analyzer is closed.
+        """
+        if self.closed:
+            raise RuntimeError("The analyzer is closed; only its results are available.")
+        if self._source is None:
+            self._source = text.compact_literal_runs(self.query) if self.compact_literals else self.query
+        return self._source
+
     @property
-    def parsed_query(self) -> sqlparse.sql.Statement:
+    def results(self) -> Dict[str, Any]:
+        """
+        The results gathered so far by perform_full_analysis and the analyze_* methods.
+        They remain available after the analyzer is closed.
+
+        Returns:
+            Dict[str, Any]: The results, by key.
+        """
+        return self._extracted_data
+
+    def close(self) -> None:
+        """
+        Releases the parse tree, the tokens and the texts of the query, keeping only the
+        results. The analyzer cannot analyze anything afterwards. Closing twice is harmless.
+        """
+        self.closed = True
+        self.query = None
+        self._source = None
+        self._parsed_query = None
+        self._tokens = None
+
+    def __enter__(self) -> "RawSQLAnalyzer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def parsed_query(self) -> "sqlparse.sql.Statement":
         """
         Parses the raw SQL query and returns it as a sqlparse.sql.Statement object. 
         If the query is already parsed, it returns the cached version.
 
+        Only the first statement of the query is parsed; the rest of a multi-statement
+        query is never tokenized.
+
         Returns:
             sqlparse.sql.Statement: The parsed SQL query.
+
+        Raises:
+            IndexError: If the query does not contain any statement.
         """
-        if not self._parsed_query:
-            self._parsed_query = sqlparse.parse(self.query)[0] # Assume single statement
+        if self._parsed_query is None:
+            self._parsed_query = self.backend.parse(self.source)
         return self._parsed_query
+
+    @property
+    def tokens(self) -> List["sqlparse.sql.Token"]:
+        """
+        Returns the ungrouped tokens of the first statement of the query. They are taken
+        from the parse tree if it has already been built, and otherwise produced by the
+        backend without the grouping pass.
+
+        Returns:
+            List[sqlparse.sql.Token]: The leaf tokens of the statement, in order.
+
+        Raises:
+            IndexError: If the query does not contain any statement.
+        """
+        if self._tokens is None:
+            if self._parsed_query is not None:
+                self._tokens = list(self._parsed_query.flatten())
+            else:
+                self._tokens = self.backend.tokenize(self.source)
+        return self._tokens
+
+    @property
+    def token_index(self) -> "utils.TokenIndex":
+        """
+        Returns the index of the parse tree, shared by every analyzer run on this query:
+        custom analyzers can look tokens up by class, ttype or value without walking the
+        tree, e.g. self.token_index.find_by_type(sqlparse.sql.Function).
+
+        Returns:
+            utils.TokenIndex: The index of the parsed statement.
+
+        Raises:
+            IndexError: If the query does not contain any statement.
+        """
+        return utils.token_index(self.parsed_query)
+
+    def iter_statements(self) -> Iterator["sqlparse.sql.Statement"]:
+        """
+        Lazily parses the statements of the query one at a time. Statements made only
+        of whitespace and comments are skipped.
+
+        Returns:
+            Iterator[sqlparse.sql.Statement]: The parsed statements, in order.
+        """
+        for statement in self.backend.iter_statements(self.source):
+            if not utils.is_empty_statement(statement):
+                yield statement
+
+    def iter_statement_analyses(self) -> Iterator[Dict]:
+        """
+        Performs a full analysis of every statement of the query. Each statement is parsed
+        when it is requested and its tree is released once its analysis is returned.
+
+        Returns:
+            Iterator[Dict]: The perform_full_analysis results of the statements, in order.
+        """
+        for statement in self.iter_statements():
+            analyzer = type(self).from_statement(statement, self.backend, self.table_extraction,
+                                                 self.metrics_sink, self.cache,
+                                                 self.compact_literals, self.budget,
+                                                 self.results_only)
+            yield analyzer.perform_full_analysis()
+
+    def perform_script_analysis(self) -> Dict:
+        """
+        Analyzes every statement of a multi-statement query and merges the results into
+        a script-level summary.
+
+        Returns:
+            Dict: The per-statement results under 'statements' and their merged summary
+            under 'summary'.
+        """
+        statements = list(self.iter_statement_analyses())
+        return {"statements": statements, "summary": merge_analysis_results(statements)}
  
+    @requires(REQUIRES_TREE)
     def analyze_count_functions(self) -> int:
         """
         Counts the number of SQL functions used in the query.
@@ -64,13 +367,14 @@ class RawSQLAnalyzer:
             Exception: If there is an error in counting functions.
         """
         try:
-            token_types: list = utils.find_by_type(self.parsed_query, sqlparse.sql.Function)
+            token_types = self.token_index.find_by_type(sqlparse.sql.Function)
             self._extracted_data["functions"] = len(token_types)
             return self._extracted_data['functions']
         except Exception as e:
             logger.error(f"Failed to count functions: {e}")
             raise
 
+    @requires(REQUIRES_TREE)
     def analyze_count_where(self) -> int:
         """
         Counts the number of 'WHERE' clauses in the query.
@@ -82,13 +386,14 @@ class RawSQLAnalyzer:
             Exception: If there is an error in counting 'WHERE' clauses.
         """
         try:
-            token_types: list = utils.find_by_type(self.parsed_query, sqlparse.sql.Where)
+            token_types = self.token_index.find_by_type(sqlparse.sql.Where)
             self._extracted_data["where"] = len(token_types)
             return self._extracted_data['where']
         except Exception as e:
             logger.error(f"Failed to count functions: {e}")
             raise
 
+    @requires(REQUIRES_TREE)
     def analyze_count_subqueries_and_depth(self) -> Tuple[int, int]:
         """
         Counts the number of subqueries in the SQL query and determines the maximum depth
@@ -108,9 +413,11 @@ class RawSQLAnalyzer:
             logger.error(f"Failed to count subqueries: {e}")
             raise
         
+    @requires(REQUIRES_TOKENS)
     def analyze_get_tables(self) -> Set[str]:
         """
-        Extracts the names of the tables used in the SQL query.
+        Extracts the names of the tables used in the SQL query, from the token stream or,
+        in the regex fast mode, from the raw query string.
 
         Returns:
             Set[str]: A set containing the names of the tables found in the query.
@@ -119,13 +426,17 @@ class RawSQLAnalyzer:
             Exception: If there is an error in extracting table names.
         """
         try:
-            tables = utils.extract_tables_with_regex(self.query)
+            if self.table_extraction == TABLES_FROM_REGEX:
+                tables = text.extract_tables_with_regex(self.query)
+            else:
+                tables = utils.extract_tables_from_tokens(self.tokens)
             self._extracted_data["tables"] = tables
             return self._extracted_data["tables"]
         except Exception as e:
             logger.error(f"Failed to get tables: {e}")
             raise
     
+    @requires(REQUIRES_TOKENS)
     def analyze_get_statement_type(self) -> str:
         """
         Extracts the type of statement of the parsed query.
@@ -137,12 +448,13 @@ class RawSQLAnalyzer:
             Exception: If there is an error in extracting statement type.
         """
         try:
-            self._extracted_data["query_type"] = self.parsed_query.get_type()
+            self._extracted_data["query_type"] = utils.get_statement_type(self.tokens)
             return self._extracted_data["query_type"]
         except Exception as e:
             logger.error(f"Failed to extract query type: {e}")
             raise
 
+    @requires(REQUIRES_TOKENS)
     def analyze_count_joins(self) -> List:
         """
         Finds JOIN clauses in a SQL query.
@@ -153,27 +465,489 @@ class RawSQLAnalyzer:
         Returns:
             List: A list of JOIN clauses.
         """
-        join_keywords = ["JOIN", "INNER JOIN", "LEFT JOIN", "RIGHT JOIN", "FULL JOIN", "CROSS JOIN"]
         try:
-            joins: list = utils.find_by_ttype_and_values(self.parsed_query, TokenType.Keyword, join_keywords)
-            self._extracted_data["joins"] = len(joins)
+            self._extracted_data["joins"] = utils.count_join_tokens(self.tokens, utils.JOIN_KEYWORDS)
             return self._extracted_data['joins']
         except Exception as e:
             logger.error(f"Failed to count joins: {e}")
             raise
  
-    def perform_full_analysis(self) -> Dict:
+    @classmethod
+    def get_analyzers(cls) -> Mapping[str, AnalyzerSpec]:
+        """
+        Returns the analyzer registry of the class: its analyze_* methods in alphabetical
+        order, followed by the analyzers registered with register_analyzer on the class
+        and its bases. The registry is built once per class and rebuilt only after a
+        registration, so looking it up does not inspect the class or trigger parsing.
+
+        Returns:
+            Mapping[str, AnalyzerSpec]: The analyzers, by name.
         """
-        Performs a full analysis of the query by dynamically running all methods 
-        that start with 'analyze'.
+        registry = cls.__dict__.get("_registry")
+        if registry is None:
+            entries = {}
+            for name in sorted(dir(cls)):
+                member = getattr(cls, name)
+                if name.startswith("analyze") and callable(member):
+                    entries[name] = AnalyzerSpec(name, member, getattr(member, "requires", REQUIRES_TREE), None)
+            for klass in reversed(cls.__mro__):
+                entries.update(klass.__dict__.get("_registered_analyzers", {}))
+            registry = MappingProxyType(entries)
+            cls._registry = registry
+        return registry
+
+    @classmethod
+    def register_analyzer(cls, name: str, func: Optional[Callable] = None,
+                          requires: str = REQUIRES_TREE) -> Callable:
+        """
+        Adds an analyzer to the registry of the class and its subclasses, without
+        subclassing. The analyzer is called with the RawSQLAnalyzer instance, and may use
+        its query, tokens or parsed_query; its return value is stored under name in the
+        results of perform_full_analysis. Registering a name again replaces the analyzer.
+
+        Can be used as a decorator when func is omitted:
+
+            @RawSQLAnalyzer.register_analyzer("has_limit", requires=REQUIRES_TOKENS)
+            def has_limit(analyzer):
+                return any(token.normalized == "LIMIT" for token in analyzer.tokens)
+
+        Args:
+            name (str): The name of the analyzer and the key of its result.
+            func (Optional[Callable]): The analyzer.
+            requires (str): The input the analyzer needs, see requires.
+
+        Returns:
+            Callable: func, or a decorator registering the decorated function.
+
+        Raises:
+            ValueError: If the name is taken by an analyze_* method or requires is unknown.
+        """
+        if func is None:
+            return lambda decorated: cls.register_analyzer(name, decorated, requires)
+        if requires not in (REQUIRES_TEXT, REQUIRES_TOKENS, REQUIRES_TREE):
+            raise ValueError(f"Unknown analyzer requirement: {requires}")
+        existing = cls.get_analyzers().get(name)
+        if existing is not None and existing.result_key is None:
+            raise ValueError(f"The analyzer name '{name}' is already used by a method.")
+
+        if "_registered_analyzers" not in cls.__dict__:
+            cls._registered_analyzers = {}
+        cls._registered_analyzers[name] = AnalyzerSpec(name, func, requires, name)
+        cls._invalidate_registry()
+        return func
+
+    @classmethod
+    def unregister_analyzer(cls, name: str) -> None:
+        """
+        Removes an analyzer added with register_analyzer on this class.
+
+        Args:
+            name (str): The name of the analyzer.
+
+        Raises:
+            ValueError: If no analyzer of that name was registered on the class.
+        """
+        if name not in cls.__dict__.get("_registered_analyzers", {}):
+            raise ValueError(f"No analyzer named '{name}' is registered on {cls.__name__}.")
+        del cls._registered_analyzers[name]
+        cls._invalidate_registry()
+
+    @classmethod
+    def _invalidate_registry(cls) -> None:
+        """
+        Drops the cached registry of the class and of all its subclasses.
+        """
+        stack = [cls]
+        while stack:
+            klass = stack.pop()
+            if "_registry" in klass.__dict__:
+                del klass._registry
+            stack.extend(klass.__subclasses__())
+
+    @classmethod
+    def _analyzer_names(cls) -> List[str]:
+        """
+        Lists the names of the registered analyzers, in registry order.
+
+        Returns:
+            List[str]: The names of the analyzers.
+        """
+        return list(cls.get_analyzers())
+
+    @classmethod
+    def _analyzer_requirement(cls, name: str) -> str:
+        """
+        Returns the input an analyzer declared, defaulting to the parse tree.
+        """
+        return cls.get_analyzers()[name].requires
+
+    def run_analyzer(self, name: str) -> Any:
+        """
+        Runs a single analyzer of the registry and stores its result.
+
+        Args:
+            name (str): The name of the analyzer.
+
+        Returns:
+            Any: The value returned by the analyzer.
+
+        Raises:
+            ValueError: If no analyzer of that name is registered.
+            RuntimeError: If the analyzer is closed.
+        """
+        if self.closed:
+            raise RuntimeError("The analyzer is closed; only its results are available.")
+        spec = self.get_analyzers().get(name)
+        if spec is None:
+            raise ValueError(f"Unknown analyzer: {name}")
+        return self._run_analyzer(spec)
+
+    def _run_analyzer(self, spec: AnalyzerSpec) -> Any:
+        """
+        Calls an analyzer, storing its return value when it does not store its own results.
+        """
+        value = spec.func(self)
+        if spec.result_key is not None:
+            self._extracted_data[spec.result_key] = value
+        return value
+
+    @classmethod
+    def _select_analyzers(cls, include: Optional[Union[str, Iterable[str]]],
+                          exclude: Optional[Union[str, Iterable[str]]]) -> List[str]:
+        """
+        Resolves the include and exclude arguments of perform_full_analysis into the names
+        of the analyzers to run, in registry order.
+
+        Raises:
+            ValueError: If an unknown analyzer name is given.
+        """
+        registry = cls.get_analyzers()
+        selected = []
+        for names in (include, exclude):
+            names = [names] if isinstance(names, str) else list(names or ())
+            unknown = [name for name in names if name not in registry]
+            if unknown:
+                raise ValueError(f"Unknown analyzers: {', '.join(unknown)}")
+            selected.append(set(names))
+        included, excluded = selected
+        return [name for name in registry
+                if (include is None or name in included) and name not in excluded]
+
+    def _analyze_single_pass(self, names: Iterable[str] = _SINGLE_PASS_ANALYZERS) -> None:
+        """
+        Counts functions, 'WHERE' clauses, JOIN clauses and subqueries in one traversal
+        of the parsed query and stores them under the same keys as the individual
+        analyze_* methods.
+
+        Args:
+            names (Iterable[str]): The single-pass analyzers whose results are stored.
+
+        Raises:
+            Exception: If there is an error in traversing the parsed query.
+        """
+        metrics = utils.collect_statement_metrics(self.parsed_query, utils.JOIN_KEYWORDS)
+        values = {
+            "functions": metrics["functions"],
+            "joins": metrics["joins"],
+            "subqueries_and_maxdepth": (metrics["subqueries"], metrics["max_depth"]),
+            "where": metrics["where"],
+        }
+        for name in names:
+            key = self._SINGLE_PASS_ANALYZERS[name]
+            self._extracted_data[key] = values[key]
+
+    def perform_full_analysis(self, include: Optional[Union[str, Iterable[str]]] = None,
+                              exclude: Optional[Union[str, Iterable[str]]] = None) -> Dict:
+        """
+        Performs a full analysis of the query by running the analyzers of the registry:
+        the methods that start with 'analyze' and the analyzers added with register_analyzer.
+
+        include and exclude restrict the analysis to the named analyzers, so that e.g. a
+        job only needing table names and the statement type never builds a parse tree:
+
+            analyzer.perform_full_analysis(include=["analyze_get_tables", "analyze_get_statement_type"])
+
+        With a backend that does not build parse trees, the analyzers that need one are
+        skipped and the grouping pass is never run.
+
+        The built-in tree-based analyzers are computed together in a single traversal;
+        if that traversal fails, every analyzer is run on its own so that errors are
+        reported per analyzer as before.
+
+        When a metrics sink is set, the parse, the single pass and every analyzer run on its
+        own are timed separately, and an AnalysisMetrics is recorded in the sink once the
+        analysis is complete. Without a sink no timer is read.
+
+        When a cache is set, the result is looked up by cache_key before anything is parsed,
+        and analyses that complete without errors are stored in the cache. Caches with a
+        true keys_by_template attribute, such as AnalysisCache, are keyed by template.
+
+        When a budget is set, a query longer than max_length or with more than max_tokens
+        tokens is not parsed, and the analysis stops once max_seconds have elapsed. The
+        deadline is checked between stages: a stage that has started runs to completion,
+        so max_tokens is what keeps the parse itself bounded. Such queries get the
+        approximate analysis of approximate_analysis instead, flagged by an 'approximate'
+        key set to True, which is never cached.
+
+        With results_only, the analyzer is closed once the analysis is done, whether it
+        succeeded or not, so that only the returned results stay in memory.
+
+        Args:
+            include (Optional[Union[str, Iterable[str]]]): The names of the analyzers to run.
+                Defaults to every registered analyzer.
+            exclude (Optional[Union[str, Iterable[str]]]): The names of analyzers to skip.
 
         Returns:
             Dict: A dictionary containing the results of the analysis.
+
+        Raises:
+            ValueError: If include or exclude name an unknown analyzer.
+            RuntimeError: If the analyzer is closed.
+        """
+        if self.closed:
+            raise RuntimeError("The analyzer is closed; only its results are available.")
+        try:
+            return self._perform_full_analysis(include, exclude)
+        finally:
+            if self.results_only:
+                self.close()
+
+    def _perform_full_analysis(self, include: Optional[Union[str, Iterable[str]]],
+                               exclude: Optional[Union[str, Iterable[str]]]) -> Dict:
+        """
+        Runs the analysis described in perform_full_analysis.
+        """
+        metrics = AnalysisMetrics(self.query) if self.metrics_sink is not None else None
+        start = time.perf_counter() if metrics is not None else 0.0
+        registry = self.get_analyzers()
+        if include is None and exclude is None:
+            names = list(registry)
+        else:
+            names = self._select_analyzers(include, exclude)
+        builds_trees = self.backend.builds_trees
+        errors = 0
+
+        cache = self.cache
+        if cache is not None:
+            key = self.cache_key(names, getattr(cache, "keys_by_template", False))
+            cached = self._run_stage(metrics, "cache_lookup", lambda: cache.get(key))
+            if cached is not None:
+                self._extracted_data = cached
+                if metrics is not None:
+                    metrics.counters["cache_hits"] = 1
+                    self._finish_metrics(metrics, start, errors)
+                return self._extracted_data
+
+        budget = self.budget
+        deadline = None
+        if budget is not None:
+            if budget.max_seconds is not None:
+                deadline = (start if metrics is not None else time.perf_counter()) + budget.max_seconds
+            if self._over_budget(budget, names, metrics):
+                return self._finish_approximately(names, metrics, start, errors)
+
+        # Built-in analyzers computed by the single pass, unless a subclass overrides them
+        single_pass = [name for name in names if name in self._SINGLE_PASS_ANALYZERS
+                       and registry[name].func is getattr(RawSQLAnalyzer, name)]
+        # The pass only pays off when a tree-based analyzer is selected; JOINs alone are counted on tokens
+        if builds_trees and any(registry[name].requires == REQUIRES_TREE for name in single_pass):
+            if self._past_deadline(deadline):
+                return self._finish_approximately(names, metrics, start, errors)
+            try:
+                if metrics is not None:
+                    # Time the parse on its own so that it is not charged to the first analyzer
+                    self._run_stage(metrics, "parse", lambda: self.parsed_query)
+                self._run_stage(metrics, "single_pass", lambda: self._analyze_single_pass(single_pass))
+            except Exception as e:
+                errors += 1
+                single_pass = []
+                logger.error(f"Single-pass analysis failed, running analyzers individually: {e}")
+        else:
+            single_pass = []
+
+        for name in names:
+            if name in single_pass:
+                continue
+            spec = registry[name]
+            if not builds_trees and spec.requires == REQUIRES_TREE:
+                continue
+            if self._past_deadline(deadline):
+                return self._finish_approximately(names, metrics, start, errors)
+            try:
+                self._run_stage(metrics, name, lambda: self._run_analyzer(spec))
+            except Exception as e:
+                errors += 1
+                logger.error(f"Error running {name}: {e}")
+
+        if cache is not None and not errors:
+            self._run_stage(metrics, "cache_store", lambda: cache.put(key, self._extracted_data))
+        if metrics is not None:
+            self._finish_metrics(metrics, start, errors)
+        return self._extracted_data
+
+    def approximate_analysis(self, names: Optional[Iterable[str]] = None) -> Dict:
         """
-        for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
-            if name.startswith("analyze"):
+        Performs a fast, approximate analysis from the raw query alone, in time linear in
+        its length: the statement type from its first keyword, the tables with
+        extract_tables_with_regex and the JOIN count from the JOIN keywords. Metrics that
+        need the token stream or the parse tree are left out, and the analyzers declared
+        with REQUIRES_TEXT are run as usual. The results replace those gathered so far and
+        carry an 'approximate' key set to True.
+
+        Args:
+            names (Optional[Iterable[str]]): The analyzers selected. Defaults to all.
+
+        Returns:
+            Dict: The approximate results.
+        """
+        registry = self.get_analyzers()
+        names = list(registry) if names is None else list(names)
+        self._extracted_data = {}
+        if "analyze_get_statement_type" in names:
+            self._extracted_data["query_type"] = text.get_statement_type_from_text(self.query)
+        if "analyze_get_tables" in names:
+            self._extracted_data["tables"] = text.extract_tables_with_regex(self.query)
+        if "analyze_count_joins" in names:
+            self._extracted_data["joins"] = text.count_join_keywords(self.query)
+        for name in names:
+            spec = registry[name]
+            if spec.requires == REQUIRES_TEXT:
                 try:
-                    method()  # Invoke the analysis method
+                    self._run_analyzer(spec)
                 except Exception as e:
                     logger.error(f"Error running {name}: {e}")
-        return self._extracted_data
\ No newline at end of file
+        self._extracted_data["approximate"] = True
+        return self._extracted_data
+
+    def _over_budget(self, budget: AnalysisBudget, names: List[str],
+                     metrics: Optional[AnalysisMetrics]) -> bool:
+        """
+        Checks the length and token limits of the budget. The query is only tokenized
+        when a token limit is set and a selected analyzer needs more than the raw text.
+        """
+        if budget.max_length is not None and len(self.source) > budget.max_length:
+            logger.warning(f"Query of {len(self.source)} characters exceeds the budget, analyzing it approximately")
+            return True
+        if budget.max_tokens is not None and any(self._analyzer_requirement(name) != REQUIRES_TEXT for name in names):
+            tokens = self._run_stage(metrics, "tokenize", lambda: self.tokens)
+            if len(tokens) > budget.max_tokens:
+                logger.warning(f"Query of {len(tokens)} tokens exceeds the budget, analyzing it approximately")
+                return True
+        return False
+
+    @staticmethod
+    def _past_deadline(deadline: Optional[float]) -> bool:
+        """
+        Checks whether the max_seconds limit of the budget has elapsed.
+        """
+        if deadline is not None and time.perf_counter() >= deadline:
+            logger.warning("Analysis exceeded its time budget, analyzing the query approximately")
+            return True
+        return False
+
+    def _finish_approximately(self, names: List[str], metrics: Optional[AnalysisMetrics],
+                              start: float, errors: int) -> Dict:
+        """
+        Replaces the results with the approximate analysis and completes the metrics.
+        """
+        self._run_stage(metrics, "approximate", lambda: self.approximate_analysis(names))
+        if metrics is not None:
+            metrics.counters["approximate"] = 1
+            self._finish_metrics(metrics, start, errors)
+        return self._extracted_data
+
+    def cache_key(self, names: Iterable[str], by_template: bool = False) -> str:
+        """
+        Computes the key of the analysis of the query by the given analyzers. The key
+        hashes the query text together with ANALYSIS_VERSION, the analyzer class, the
+        backend, the table extraction mode and the analyzer names, so that a change to any
+        of them never returns a stale result.
+
+        Args:
+            names (Iterable[str]): The names of the analyzers run.
+            by_template (bool): Whether to hash the normalized query of utils.normalize_query
+                instead of its text, so that every query of a template shares the key.
+
+        Returns:
+            str: The hexadecimal cache key.
+        """
+        version = "\0".join([
+            ANALYSIS_VERSION,
+            f"{type(self).__module__}.{type(self).__qualname__}",
+            self.backend.name,
+            self.table_extraction,
+            ",".join(names),
+        ])
+        query = utils.normalize_query(self.query) if by_template else self.query
+        return text.content_hash(f"{version}\0{query}")
+
+    def _finish_metrics(self, metrics: AnalysisMetrics, start: float, errors: int) -> None:
+        """
+        Completes metrics with the total time and the counters, and records them in the sink.
+        """
+        metrics.total_seconds = time.perf_counter() - start
+        self._count_sizes(metrics, errors)
+        self.metrics_sink.record(metrics)
+
+    @staticmethod
+    def _run_stage(metrics: Optional[AnalysisMetrics], stage: str, func: Callable) -> Any:
+        """
+        Calls func, adding its wall time to the given stage of metrics when instrumentation
+        is enabled. The time of a failing stage is recorded as well.
+        """
+        if metrics is None:
+            return func()
+        start = time.perf_counter()
+        try:
+            return func()
+        finally:
+            metrics.stage_seconds[stage] = metrics.stage_seconds.get(stage, 0.0) + time.perf_counter() - start
+
+    def _count_sizes(self, metrics: AnalysisMetrics, errors: int) -> None:
+        """
+        Fills the counters of metrics from the token stream and parse tree built during
+        the analysis. Nothing is parsed or tokenized for the sake of counting.
+        """
+        metrics.counters["query_length"] = len(self.query)
+        metrics.counters["errors"] = errors
+        if self._parsed_query is not None:
+            metrics.counters["tokens"], metrics.counters["tree_nodes"] = utils.count_tree_size(self._parsed_query)
+        elif self._tokens is not None:
+            metrics.counters["tokens"] = len(self._tokens)
+
+
+def merge_analysis_results(results: Iterable[Dict]) -> Dict:
+    """
+    Merges the analysis results of several statements into a single summary.
+
+    Counts are summed, the maximum subquery depth is the deepest of all statements,
+    tables are united and statement types are counted.
+
+    Args:
+        results (Iterable[Dict]): Results returned by perform_full_analysis.
+
+    Returns:
+        Dict: The merged summary, with the number of statements under 'statements' and
+        the count of each statement type under 'query_types'.
+    """
+    summary: Dict[str, Any] = {
+        "statements": 0,
+        "query_types": Counter(),
+        "joins": 0,
+        "functions": 0,
+        "where": 0,
+        "subqueries_and_maxdepth": (0, 0),
+        "tables": set(),
+    }
+    for result in results:
+        summary["statements"] += 1
+        if "query_type" in result:
+            summary["query_types"][result["query_type"]] += 1
+        for key in ("joins", "functions", "where"):
+            summary[key] += result.get(key, 0)
+        n_queries, depth = result.get("subqueries_and_maxdepth", (0, 0))
+        total, max_depth = summary["subqueries_and_maxdepth"]
+        summary["subqueries_and_maxdepth"] = (total + n_queries, max(max_depth, depth))
+        summary["tables"] |= result.get("tables", set())
+    summary["query_types"] = dict(summary["query_types"])
+    return summary
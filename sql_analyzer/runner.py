@@ -0,0 +1,512 @@
+from typing import (Any, Dict, Iterator, List, NamedTuple, Optional, Sequence)
+from concurrent import futures
+from itertools import islice
+import argparse
+import fcntl
+import json
+import logging
+import os
+import shutil
+import socket
+import sys
+
+from sql_analyzer.batch import analyze_query
+from sql_analyzer.cli import (STDIN, add_budget_arguments, budget_from_args, iter_sources, iter_statements,
+                              to_json, to_record)
+from sql_analyzer.raw_sql_analyzer import AnalysisBudget
+
+
+logger = logging.getLogger(__name__)
+
+# Version of the manifest written by CorpusRunner
+MANIFEST_VERSION = 1
+MANIFEST = "manifest.json"
+SHARDS = "shards"
+DEFAULT_CHECKPOINT_EVERY = 1000
+
+
+class Shard(NamedTuple):
+    """
+    An input file of a corpus run, processed by one worker at a time.
+
+    Attributes:
+        id (str): The name of the shard files, from the position of the input in the run.
+        source (str): The absolute path of the input file.
+        size (int): The size of the input when the run was planned.
+        mtime_ns (int): The modification time of the input when the run was planned.
+    """
+    id: str
+    source: str
+    size: int
+    mtime_ns: int
+
+
+class ShardStatus(NamedTuple):
+    """
+    The progress of a shard, as recorded by its checkpoint.
+
+    Attributes:
+        id (str): The shard id.
+        source (str): The input file.
+        statements (int): The number of statements analyzed and checkpointed.
+        failures (int): The number of them that could not be analyzed.
+        complete (bool): Whether the output of the shard is final.
+        error (Optional[str]): Why the last attempt stopped early, if it did.
+    """
+    id: str
+    source: str
+    statements: int = 0
+    failures: int = 0
+    complete: bool = False
+    error: Optional[str] = None
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    """
+    Replaces a JSON file atomically, so a crash leaves either the old or the new content.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Reads a JSON file, or returns None if it does not exist.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _claim(lock: str) -> Optional[int]:
+    """
+    Takes the lock of a shard with an exclusive flock on its lock file. The kernel drops
+    the flock when its holder exits, so a lock file left by a process that died is taken
+    over by whichever runner locks it first, without any window where two runners hold it.
+
+    Returns:
+        Optional[int]: The descriptor of the locked file, to pass to _release, or None if
+        another process holds the lock.
+    """
+    while True:
+        descriptor = os.open(lock, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(descriptor)
+            return None
+        try:
+            current = os.stat(lock)
+        except FileNotFoundError:
+            current = None
+        if current is not None and current.st_ino == os.fstat(descriptor).st_ino:
+            break
+        # The previous holder removed the file between our open and flock; lock the new one
+        os.close(descriptor)
+
+    with os.fdopen(os.dup(descriptor), "r+", encoding="utf-8") as f:
+        holder = f.read()
+        if holder:
+            logger.warning(f"Taking over the stale lock {lock} of {holder}")
+        f.seek(0)
+        f.truncate()
+        json.dump({"host": socket.gethostname(), "pid": os.getpid()}, f)
+    return descriptor
+
+
+def _release(lock: str, descriptor: int) -> None:
+    """
+    Removes a lock file taken by _claim, then drops its flock. Runners waiting on the
+    removed file see that it is gone and lock a new one.
+    """
+    try:
+        os.remove(lock)
+    finally:
+        os.close(descriptor)
+
+
+def run_shard(shard: Shard, directory: str, options: Dict[str, Any]) -> ShardStatus:
+    """
+    Analyzes the statements of a shard, resuming after its last checkpoint.
+
+    Records are appended to <id>.ndjson.part. Every checkpoint_every statements the
+    file is synced and the number of statements and bytes written are recorded in
+    <id>.json; a restarted shard truncates the part file to the recorded size, skips
+    the recorded statements and carries on. The part file is renamed to <id>.ndjson
+    once the shard is complete; a complete shard whose output is missing is started
+    over.
+
+    Args:
+        shard (Shard): The shard to process.
+        directory (str): The directory of the run.
+        options (Dict[str, Any]): The options of the run, see CorpusRunner, with the
+            checkpoint_every interval and, on a pool, the pid of the coordinating runner:
+            a worker whose runner was killed stops at its next checkpoint.
+
+    Returns:
+        ShardStatus: The progress of the shard.
+    """
+    base = os.path.join(directory, SHARDS, shard.id)
+    output, part, checkpoint, lock = f"{base}.ndjson", f"{base}.ndjson.part", f"{base}.json", f"{base}.lock"
+    descriptor = _claim(lock)
+    if descriptor is None:
+        return ShardStatus(shard.id, shard.source, error="The shard is being processed by another runner.")
+    try:
+        state = _read_json(checkpoint) or {"statements": 0, "failures": 0, "bytes": 0, "complete": False}
+        if state["complete"] and not os.path.exists(output) and os.path.exists(part):
+            os.replace(part, output)  # The run stopped between the checkpoint and the rename
+        if state["complete"] and os.path.exists(output):
+            return ShardStatus(shard.id, shard.source, state["statements"], state["failures"], True)
+        if state["complete"] or not os.path.exists(part) or os.path.getsize(part) < state["bytes"]:
+            # Start over if the records are gone, e.g. the output of a complete shard was deleted
+            state = {"statements": 0, "failures": 0, "bytes": 0, "complete": False}
+
+        budget = AnalysisBudget(*options["budget"]) if options.get("budget") else None
+        every = options.get("checkpoint_every") or DEFAULT_CHECKPOINT_EVERY
+        coordinator = options.get("coordinator")
+
+        def save(f) -> None:
+            f.flush()
+            os.fsync(f.fileno())
+            state["bytes"] = f.tell()
+            _write_json(checkpoint, state)
+
+        with open(part, "r+b" if os.path.exists(part) else "w+b") as f:
+            # Drop the records written after the last checkpoint
+            f.truncate(state["bytes"])
+            f.seek(state["bytes"])
+            statements = iter_statements([shard.source], options.get("fmt"), options.get("column", "query"))
+            for _, number, query in islice(statements, state["statements"], None):
+                item = analyze_query(state["statements"], query, include=options.get("include"),
+                                     exclude=options.get("exclude"),
+                                     compact_literals=options.get("compact_literals", False), budget=budget)
+                record = to_record(shard.source, number, item)
+                f.write((json.dumps(record, default=to_json) + "\n").encode("utf-8"))
+                state["statements"] += 1
+                state["failures"] += item.error is not None
+                if state["statements"] % every == 0:
+                    save(f)
+                    if coordinator is not None and os.getppid() != coordinator:
+                        # The runner was killed; stop rather than keep the shard locked
+                        return ShardStatus(shard.id, shard.source, state["statements"], state["failures"],
+                                           error="The runner stopped.")
+            state["complete"] = True
+            save(f)
+        os.replace(part, output)
+        return ShardStatus(shard.id, shard.source, state["statements"], state["failures"], True)
+    finally:
+        _release(lock, descriptor)
+
+
+class CorpusRunner:
+    """
+    This class runs the analysis of a corpus of query files that takes hours, in a way
+    that survives crashes and preemption. Each input file is a shard; shards are
+    processed in parallel worker processes, and the filesystem is the only point of
+    coordination:
+
+    - manifest.json records the inputs and the options of the run;
+    - shards/<id>.ndjson.part receives the records of a shard in progress, and
+      shards/<id>.json its checkpoint, replaced atomically;
+    - shards/<id>.ndjson is the output of a complete shard, one NDJSON record per
+      statement as written by python -m sql_analyzer;
+    - shards/<id>.lock is held while a process works on the shard, so that several
+      runners started on the same directory share the shards instead of repeating them.
+
+    Running again over the same directory skips complete shards and resumes the others
+    from their last checkpoint; inputs modified since the run was planned are started
+    over. merge then combines the shard outputs in input order.
+
+    Attributes:
+        directory (str): The directory of the run.
+        options (Dict[str, Any]): The analysis options, stored in the manifest.
+    """
+
+    def __init__(self, directory: os.PathLike,
+                 fmt: Optional[str] = None,
+                 column: str = "query",
+                 include: Optional[Sequence[str]] = None,
+                 exclude: Optional[Sequence[str]] = None,
+                 compact_literals: bool = False,
+                 budget: Optional[AnalysisBudget] = None,
+                 checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY):
+        """
+        Initializes a runner.
+
+        Args:
+            directory (os.PathLike): The directory of the run, created if needed.
+            fmt (Optional[str]): The input format, see iter_statements. Inferred from each
+                extension if omitted.
+            column (str): The query field of JSONL and CSV logs.
+            include (Optional[Sequence[str]]): The analyzers to run, see perform_full_analysis.
+            exclude (Optional[Sequence[str]]): The analyzers to skip.
+            compact_literals (bool): Whether literal runs are collapsed before parsing.
+            budget (Optional[AnalysisBudget]): Limits on the work spent on each query.
+            checkpoint_every (int): The number of statements between two checkpoints.
+
+        Raises:
+            ValueError: If checkpoint_every is not a positive integer.
+        """
+        if checkpoint_every < 1:
+            raise ValueError("checkpoint_every must be a positive integer.")
+        self.directory = os.fspath(directory)
+        self.checkpoint_every = checkpoint_every
+        self.options = {
+            "fmt": fmt,
+            "column": column,
+            "include": list(include) if include else None,
+            "exclude": list(exclude) if exclude else None,
+            "compact_literals": compact_literals,
+            "budget": list(budget) if budget else None,
+        }
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST)
+
+    def shards(self) -> List[Shard]:
+        """
+        Returns the shards recorded in the manifest.
+
+        Raises:
+            FileNotFoundError: If the directory holds no run.
+        """
+        manifest = _read_json(self.manifest_path)
+        if manifest is None:
+            raise FileNotFoundError(f"No run in {self.directory}")
+        return [Shard(**shard) for shard in manifest["shards"]]
+
+    def plan(self, paths: Sequence[str]) -> List[Shard]:
+        """
+        Records the inputs of the run in the manifest, or checks them against the
+        manifest of a previous run over the same directory. The checkpoints and outputs
+        of inputs modified since then are discarded.
+
+        Args:
+            paths (Sequence[str]): Files, directories or glob patterns, see iter_sources.
+
+        Returns:
+            List[Shard]: The shards of the run, in input order.
+
+        Raises:
+            ValueError: If stdin is given, or if the directory holds a run over other
+                inputs or with other options.
+        """
+        shards = []
+        for position, source in enumerate(iter_sources(paths)):
+            if source == STDIN:
+                raise ValueError("stdin cannot be processed in shards.")
+            stat = os.stat(source)
+            shards.append(Shard(f"{position:05d}", os.path.abspath(source), stat.st_size, stat.st_mtime_ns))
+
+        os.makedirs(os.path.join(self.directory, SHARDS), exist_ok=True)
+        manifest = _read_json(self.manifest_path)
+        if manifest is not None:
+            if manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"{self.manifest_path} is not a manifest of version {MANIFEST_VERSION}.")
+            previous = [Shard(**shard) for shard in manifest["shards"]]
+            if [shard.source for shard in previous] != [shard.source for shard in shards]:
+                raise ValueError(f"{self.directory} holds a run over other inputs.")
+            if manifest["options"] != self.options:
+                raise ValueError(f"{self.directory} holds a run with other options: {manifest['options']}")
+            for old, new in zip(previous, shards):
+                if old != new:
+                    logger.warning(f"{new.source} changed since the run was planned, starting its shard over")
+                    self._discard(new)
+        _write_json(self.manifest_path, {"version": MANIFEST_VERSION, "options": self.options,
+                                         "shards": [shard._asdict() for shard in shards]})
+        return shards
+
+    def _discard(self, shard: Shard) -> None:
+        """
+        Removes the checkpoint and the outputs of a shard.
+        """
+        base = os.path.join(self.directory, SHARDS, shard.id)
+        for path in (f"{base}.json", f"{base}.ndjson", f"{base}.ndjson.part"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def status(self) -> List[ShardStatus]:
+        """
+        Reads the progress of every shard from its checkpoint. A shard is complete once
+        its checkpoint says so and its output exists; one whose output is missing, e.g.
+        after a crash before the rename of its part file, is finished by the next run.
+
+        Returns:
+            List[ShardStatus]: The progress of the shards, in input order.
+        """
+        statuses = []
+        for shard in self.shards():
+            base = os.path.join(self.directory, SHARDS, shard.id)
+            state = _read_json(f"{base}.json") or {}
+            complete = state.get("complete", False) and os.path.exists(f"{base}.ndjson")
+            statuses.append(ShardStatus(shard.id, shard.source, state.get("statements", 0),
+                                        state.get("failures", 0), complete))
+        return statuses
+
+    def run(self, paths: Sequence[str], workers: Optional[int] = None) -> List[ShardStatus]:
+        """
+        Processes the shards that are not complete, workers at a time. A shard that fails,
+        or is held by another runner, is reported with its error and picked up again by
+        the next run.
+
+        Args:
+            paths (Sequence[str]): Files, directories or glob patterns, see iter_sources.
+            workers (Optional[int]): The number of worker processes. Defaults to the
+                number of CPUs; 1 processes the shards in the calling process.
+
+        Returns:
+            List[ShardStatus]: The progress of every shard, in input order.
+        """
+        shards = self.plan(paths)
+        done = {status.id for status in self.status() if status.complete}
+        pending = [shard for shard in shards if shard.id not in done]
+        if done:
+            logger.info(f"Skipping {len(done)} complete shard(s)")
+        options = dict(self.options, checkpoint_every=self.checkpoint_every)
+
+        errors: Dict[str, str] = {}
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            outcomes = []
+            for shard in pending:
+                try:
+                    outcomes.append(run_shard(shard, self.directory, options))
+                except Exception as e:
+                    errors[shard.id] = f"{type(e).__name__}: {e}"
+        else:
+            # Workers check that the runner is still their parent at every checkpoint
+            options["coordinator"] = os.getpid()
+            with futures.ProcessPoolExecutor(max_workers=min(workers, max(len(pending), 1))) as executor:
+                submitted = {executor.submit(run_shard, shard, self.directory, options): shard for shard in pending}
+                outcomes = []
+                for future in futures.as_completed(submitted):
+                    try:
+                        outcomes.append(future.result())
+                    except Exception as e:
+                        errors[submitted[future].id] = f"{type(e).__name__}: {e}"
+        errors.update((outcome.id, outcome.error) for outcome in outcomes if outcome.error is not None)
+        for shard_id, error in errors.items():
+            logger.error(f"Shard {shard_id} stopped early: {error}")
+        return [status._replace(error=errors.get(status.id)) for status in self.status()]
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Reads the records of the complete shards, in input order, e.g. to feed a
+        WorkloadAggregator or a QueryIndex.
+
+        Returns:
+            Iterator[Dict[str, Any]]: The records, as written by python -m sql_analyzer.
+        """
+        for status in self.status():
+            if status.complete:
+                with open(os.path.join(self.directory, SHARDS, f"{status.id}.ndjson"), encoding="utf-8") as f:
+                    for line in f:
+                        yield json.loads(line)
+
+    def merge(self, output: os.PathLike) -> int:
+        """
+        Concatenates the outputs of the shards, in input order, into one NDJSON file,
+        written atomically.
+
+        Args:
+            output (os.PathLike): The merged file.
+
+        Returns:
+            int: The number of records written.
+
+        Raises:
+            ValueError: If a shard is not complete.
+        """
+        statuses = self.status()
+        incomplete = [status.id for status in statuses if not status.complete]
+        if incomplete:
+            raise ValueError(f"Shards not complete: {', '.join(incomplete)}. Run the corpus again first.")
+        temporary = f"{os.fspath(output)}.tmp"
+        with open(temporary, "wb") as merged:
+            for status in statuses:
+                with open(os.path.join(self.directory, SHARDS, f"{status.id}.ndjson"), "rb") as f:
+                    shutil.copyfileobj(f, merged)
+            merged.flush()
+            os.fsync(merged.fileno())
+        os.replace(temporary, output)
+        return sum(status.statements for status in statuses)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the argument parser of python -m sql_analyzer.runner.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m sql_analyzer.runner",
+        description="Analyze a corpus of query files in resumable shards, one per file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Process the shards that are not complete.")
+    run.add_argument("directory", help="Directory of the run; rerun with the same one to resume.")
+    run.add_argument("paths", nargs="+", help="Files, directories (walked for .sql files) or glob patterns.")
+    run.add_argument("--input-format", choices=("sql", "jsonl", "csv"),
+                     help="Input format; inferred from each file extension by default.")
+    run.add_argument("--column", default="query", help="Query field of JSONL and CSV logs.")
+    run.add_argument("-w", "--workers", type=int, help="Number of worker processes; defaults to the number of CPUs.")
+    run.add_argument("--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                     help="Statements between two checkpoints of a shard.")
+    run.add_argument("--include", action="append", metavar="ANALYZER", help="Run only this analyzer; may be repeated.")
+    run.add_argument("--exclude", action="append", metavar="ANALYZER", help="Skip this analyzer; may be repeated.")
+    run.add_argument("--compact-literals", action="store_true",
+                     help="Collapse huge IN lists and VALUES blocks before parsing.")
+    add_budget_arguments(run)
+    run.add_argument("-o", "--output", help="Merge the shard outputs into this file once all are complete.")
+
+    merge = commands.add_parser("merge", help="Combine the outputs of a complete run.")
+    merge.add_argument("directory", help="Directory of the run.")
+    merge.add_argument("output", help="The merged NDJSON file.")
+
+    status = commands.add_parser("status", help="Show the progress of each shard.")
+    status.add_argument("directory", help="Directory of the run.")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entry point of python -m sql_analyzer.runner.
+
+    Args:
+        argv (Optional[List[str]]): The command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit status: 0 when every shard is complete, 1 otherwise, 2 on invalid usage.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "run":
+            if (args.workers is not None and args.workers < 1) or args.checkpoint_every < 1:
+                parser.error("--workers and --checkpoint-every must be positive integers.")
+            runner = CorpusRunner(args.directory, args.input_format, args.column, args.include, args.exclude,
+                                  args.compact_literals, budget_from_args(args), args.checkpoint_every)
+            statuses = runner.run(args.paths, args.workers)
+            if args.output is not None and all(status.complete for status in statuses):
+                runner.merge(args.output)
+        else:
+            runner = CorpusRunner(args.directory)
+            statuses = runner.status()
+            if args.command == "merge":
+                runner.merge(args.output)
+    except (ValueError, FileNotFoundError) as e:
+        parser.error(str(e))
+
+    for status in statuses:
+        state = "complete" if status.complete else status.error or "pending"
+        print(f"{status.id}\t{status.statements}\t{status.failures}\t{state}\t{status.source}")
+    return 0 if all(status.complete for status in statuses) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+from typing import (Dict, Hashable, List, Optional, Tuple)
+from array import array
+import hashlib
+import math
+
+
+def _hash128(item: str) -> Tuple[int, int]:
+    """
+    Hashes a string into two independent 64-bit integers. blake2b is used instead of the
+    built-in hash so that sketches filled in different processes agree and can be merged.
+    """
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+
+class CountMinSketch:
+    """
+    This class estimates the frequency of items in a stream in fixed memory. Estimates
+    never undercount; with width w and depth d, an estimate exceeds the true count by more
+    than 2.72 / w of the stream total with probability at most exp(-d).
+
+    Two sketches of the same width and depth merge exactly: the merged sketch is the one
+    that would have been built from the concatenated streams.
+
+    Attributes:
+        width (int): The number of counters per row.
+        depth (int): The number of rows, i.e. of hash functions.
+        total (int): The sum of all counts added.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        """
+        Initializes an empty sketch.
+
+        Args:
+            width (int): The number of counters per row.
+            depth (int): The number of rows.
+
+        Raises:
+            ValueError: If width or depth is not a positive integer.
+        """
+        if width < 1 or depth < 1:
+            raise ValueError("width and depth must be positive integers.")
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self._counters = array("q", bytes(8 * width * depth))
+
+    def _cells(self, item: str) -> List[int]:
+        """
+        Returns the position of the counter of item in each row, derived from two hashes.
+        """
+        h1, h2 = _hash128(item)
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, item: str, count: int = 1) -> int:
+        """
+        Adds occurrences of an item.
+
+        Args:
+            item (str): The item.
+            count (int): The number of occurrences.
+
+        Returns:
+            int: The estimated count of the item after the update.
+        """
+        counters = self._counters
+        estimate = None
+        for cell in self._cells(item):
+            counters[cell] += count
+            estimate = counters[cell] if estimate is None else min(estimate, counters[cell])
+        self.total += count
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        """
+        Estimates the count of an item.
+
+        Args:
+            item (str): The item.
+
+        Returns:
+            int: An upper bound of the number of occurrences added.
+        """
+        return min(self._counters[cell] for cell in self._cells(item))
+
+    def merge(self, other: "CountMinSketch") -> None:
+        """
+        Adds the counts of another sketch of the same shape.
+
+        Args:
+            other (CountMinSketch): The sketch to merge into this one.
+
+        Raises:
+            ValueError: If the sketches have different widths or depths.
+        """
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Only sketches of the same width and depth can be merged.")
+        counters = self._counters
+        for cell, value in enumerate(other._counters):
+            if value:
+                counters[cell] += value
+        self.total += other.total
+
+
+class HeavyHitters:
+    """
+    This class tracks the most frequent items of a stream: a CountMinSketch estimates
+    every count and the k items with the highest estimates are kept as candidates.
+    Memory is bounded by the sketch and the k candidates.
+
+    Attributes:
+        k (int): The number of items kept.
+        sketch (CountMinSketch): The frequency estimates.
+    """
+
+    def __init__(self, k: int = 100, width: int = 2048, depth: int = 4):
+        """
+        Initializes an empty tracker.
+
+        Args:
+            k (int): The number of items kept.
+            width (int): The width of the underlying CountMinSketch.
+            depth (int): The depth of the underlying CountMinSketch.
+        """
+        if k < 1:
+            raise ValueError("k must be a positive integer.")
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self._candidates: Dict[str, int] = {}
+
+    def add(self, item: str, count: int = 1) -> None:
+        """
+        Adds occurrences of an item.
+
+        Args:
+            item (str): The item.
+            count (int): The number of occurrences.
+        """
+        estimate = self.sketch.add(item, count)
+        candidates = self._candidates
+        if item in candidates or len(candidates) < self.k:
+            candidates[item] = estimate
+            return
+        weakest = min(candidates, key=candidates.get)
+        if estimate > candidates[weakest]:
+            del candidates[weakest]
+            candidates[item] = estimate
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Returns the most frequent items with their estimated counts.
+
+        Args:
+            n (Optional[int]): The number of items. Defaults to k.
+
+        Returns:
+            List[Tuple[str, int]]: Items and estimates, most frequent first.
+        """
+        ranked = sorted(((item, self.sketch.estimate(item)) for item in self._candidates),
+                        key=lambda entry: (-entry[1], entry[0]))
+        return ranked[:n if n is not None else self.k]
+
+    def merge(self, other: "HeavyHitters") -> None:
+        """
+        Merges the sketch of another tracker exactly and keeps the k best candidates of
+        both, re-estimated against the merged sketch.
+
+        Args:
+            other (HeavyHitters): The tracker to merge into this one.
+        """
+        self.sketch.merge(other.sketch)
+        candidates = set(self._candidates) | set(other._candidates)
+        estimates = sorted(((item, self.sketch.estimate(item)) for item in candidates),
+                           key=lambda entry: (-entry[1], entry[0]))
+        self._candidates = dict(estimates[:self.k])
+
+
+class HyperLogLog:
+    """
+    This class estimates the number of distinct items of a stream with 2 ** precision
+    one-byte registers. The relative standard error is about 1.04 / sqrt(2 ** precision),
+    i.e. 1.6% with the default precision of 12 (4 KiB).
+
+    Two sketches of the same precision merge exactly by keeping the maximum of each register.
+
+    Attributes:
+        precision (int): The number of hash bits selecting a register.
+    """
+
+    def __init__(self, precision: int = 12):
+        """
+        Initializes an empty sketch.
+
+        Args:
+            precision (int): Between 4 and 18.
+
+        Raises:
+            ValueError: If precision is out of range.
+        """
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18.")
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    def add(self, item: str) -> None:
+        """
+        Adds an item.
+
+        Args:
+            item (str): The item.
+        """
+        value = _hash128(item)[0]
+        index = value & ((1 << self.precision) - 1)
+        remaining = value >> self.precision
+        rank = (64 - self.precision) - remaining.bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def count(self) -> int:
+        """
+        Estimates the number of distinct items added.
+
+        Returns:
+            int: The estimated cardinality.
+        """
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small cardinalities
+        return round(estimate)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """
+        Merges another sketch of the same precision.
+
+        Args:
+            other (HyperLogLog): The sketch to merge into this one.
+
+        Raises:
+            ValueError: If the sketches have different precisions.
+        """
+        if self.precision != other.precision:
+            raise ValueError("Only sketches of the same precision can be merged.")
+        self._registers = bytearray(map(max, self._registers, other._registers))
+
+
+class Histogram:
+    """
+    This class counts small non-negative integers, such as subquery depths or JOIN
+    counts, exactly. Values at or above max_value share an overflow bucket.
+
+    Attributes:
+        max_value (int): The first value counted in the overflow bucket.
+        count (int): The number of values added.
+        total (int): The sum of the values added.
+        max_seen (int): The largest value added, or -1 if none.
+    """
+
+    def __init__(self, max_value: int = 64):
+        """
+        Initializes an empty histogram.
+
+        Args:
+            max_value (int): The first value counted in the overflow bucket.
+        """
+        if max_value < 1:
+            raise ValueError("max_value must be a positive integer.")
+        self.max_value = max_value
+        self.count = 0
+        self.total = 0
+        self.max_seen = -1
+        self._buckets = array("q", bytes(8 * (max_value + 1)))
+
+    def add(self, value: int) -> None:
+        """
+        Adds a value. Negative values, which mark figures that were not computed, are ignored.
+
+        Args:
+            value (int): The value.
+        """
+        if value < 0:
+            return
+        self._buckets[min(value, self.max_value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max_seen:
+            self.max_seen = value
+
+    def mean(self) -> float:
+        """
+        Returns the mean of the values added, or 0.0 if none.
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, fraction: float) -> int:
+        """
+        Returns the smallest value v such that at least fraction of the values are <= v.
+        Quantiles falling in the overflow bucket are reported as the largest value seen.
+
+        Args:
+            fraction (float): Between 0 and 1.
+
+        Returns:
+            int: The quantile, or -1 if the histogram is empty.
+        """
+        if not self.count:
+            return -1
+        threshold = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for value, bucket in enumerate(self._buckets):
+            seen += bucket
+            if seen >= threshold:
+                return value if value < self.max_value else self.max_seen
+        return self.max_seen
+
+    def buckets(self) -> Dict[Hashable, int]:
+        """
+        Returns the non-empty buckets.
+
+        Returns:
+            Dict[Hashable, int]: The count of each value, with the overflow bucket under
+            the key f'>={max_value}'.
+        """
+        result: Dict[Hashable, int] = {value: bucket for value, bucket in enumerate(self._buckets[:-1]) if bucket}
+        if self._buckets[-1]:
+            result[f">={self.max_value}"] = self._buckets[-1]
+        return result
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Adds the values of another histogram with the same max_value.
+
+        Args:
+            other (Histogram): The histogram to merge into this one.
+
+        Raises:
+            ValueError: If the histograms have different max_value.
+        """
+        if self.max_value != other.max_value:
+            raise ValueError("Only histograms with the same max_value can be merged.")
+        for value, bucket in enumerate(other._buckets):
+            self._buckets[value] += bucket
+        self.count += other.count
+        self.total += other.total
+        self.max_seen = max(self.max_seen, other.max_seen)
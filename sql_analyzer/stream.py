@@ -0,0 +1,401 @@
+from typing import (Any, Iterable, Iterator, List, Optional, TextIO, Tuple)
+from pathlib import Path
+import codecs
+import csv
+import json
+import logging
+import mmap
+import os
+import re
+
+from sql_analyzer.batch import (analyze_many, QueryResult)
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Characters that may change the splitter state outside of quotes and comments
+_SPECIAL_CHARS = re.compile(r"[;'\"`$/-]")
+_NON_SPACE = re.compile(r"\S")
+_DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+_PARTIAL_DOLLAR_TAG = re.compile(r"\$[A-Za-z0-9_]*")
+_QUOTE_END = {
+    "'": re.compile(r"['\\]"),
+    '"': re.compile(r'["\\]'),
+    "`": re.compile(r"`"),
+}
+
+_NORMAL = "normal"
+_QUOTED = "quoted"
+_LINE_COMMENT = "line_comment"
+_BLOCK_COMMENT = "block_comment"
+_DOLLAR_QUOTED = "dollar_quoted"
+
+
+class StatementSplitter:
+    """
+    This class splits SQL text into statements incrementally, as it is fed in chunks of
+    arbitrary size. Semicolons only end a statement outside of single-, double- and
+    backtick-quoted strings, '--' and '/* */' comments, and dollar-quoted bodies
+    ($$ ... $$ or $tag$ ... $tag$). Statements made only of whitespace and comments are
+    dropped.
+
+    Only the text of the statement currently being read is held in memory, plus the few
+    characters at the end of a chunk that need the next chunk to be classified.
+    """
+
+    def __init__(self):
+        """
+        Initializes the splitter at the start of a script.
+        """
+        self._state = _NORMAL
+        self._closing = ""  # The quote character or dollar tag that ends the current state
+        self._pending = ""  # Unprocessed tail of the previous chunk
+        self._parts: List[str] = []
+        self._has_code = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Processes a chunk of SQL text.
+
+        Args:
+            chunk (str): The next piece of the script.
+
+        Returns:
+            List[str]: The statements completed by this chunk, stripped of surrounding whitespace.
+        """
+        return self._process(self._pending + chunk, final=False)
+
+    def close(self) -> List[str]:
+        """
+        Flushes the statement left at the end of the script, which may lack a terminating
+        semicolon.
+
+        Returns:
+            List[str]: The remaining statement, if it contains any code.
+        """
+        statements = self._process(self._pending, final=True)
+        statement = self._emit()
+        if statement:
+            statements.append(statement)
+        self._state = _NORMAL
+        self._closing = ""
+        return statements
+
+    def _emit(self) -> Optional[str]:
+        """
+        Returns the accumulated statement, or None if it holds no code, and resets the buffer.
+        """
+        statement = "".join(self._parts).strip() if self._has_code else None
+        self._parts = []
+        self._has_code = False
+        return statement
+
+    def _process(self, buf: str, final: bool) -> List[str]:
+        """
+        Runs the state machine over buf, keeping any tail that needs more input in _pending.
+        """
+        statements = []
+        n = len(buf)
+        i = 0
+        segment_start = 0
+
+        while i < n:
+            if self._state == _NORMAL:
+                match = _SPECIAL_CHARS.search(buf, i)
+                end = match.start() if match else n
+                if not self._has_code and _NON_SPACE.search(buf, i, end):
+                    self._has_code = True
+                if match is None:
+                    i = n
+                    break
+
+                i = end
+                char = buf[i]
+                if char == ";":
+                    self._parts.append(buf[segment_start:i + 1])
+                    segment_start = i + 1
+                    i += 1
+                    statement = self._emit()
+                    if statement:
+                        statements.append(statement)
+                elif char in _QUOTE_END:
+                    self._has_code = True
+                    self._state, self._closing = _QUOTED, char
+                    i += 1
+                elif char in "-/":
+                    if i + 1 >= n and not final:
+                        break
+                    if buf.startswith("--", i):
+                        self._state = _LINE_COMMENT
+                        i += 2
+                    elif buf.startswith("/*", i):
+                        self._state = _BLOCK_COMMENT
+                        i += 2
+                    else:
+                        self._has_code = True
+                        i += 1
+                else:  # "$"
+                    self._has_code = True
+                    tag = _DOLLAR_TAG.match(buf, i)
+                    if tag:
+                        self._state, self._closing = _DOLLAR_QUOTED, tag.group()
+                        i = tag.end()
+                    elif not final and _PARTIAL_DOLLAR_TAG.match(buf, i).end() == n:
+                        break  # The tag may continue in the next chunk
+                    else:
+                        i += 1
+
+            elif self._state == _QUOTED:
+                match = _QUOTE_END[self._closing].search(buf, i)
+                if match is None:
+                    i = n
+                    break
+                j = match.start()
+                if j + 1 >= n and not final:
+                    i = j  # A doubled quote or an escaped character may follow
+                    break
+                if buf[j] == "\\" or buf.startswith(self._closing * 2, j):
+                    i = j + 2
+                else:
+                    self._state = _NORMAL
+                    i = j + 1
+
+            elif self._state == _LINE_COMMENT:
+                j = buf.find("\n", i)
+                if j == -1:
+                    i = n
+                    break
+                self._state = _NORMAL
+                i = j + 1
+
+            else:
+                closing = "*/" if self._state == _BLOCK_COMMENT else self._closing
+                j = buf.find(closing, i)
+                if j == -1:
+                    # Keep enough characters to recognise a delimiter split across chunks
+                    i = n if final else max(i, n - len(closing) + 1)
+                    break
+                self._state = _NORMAL
+                i = j + len(closing)
+
+        if final:
+            i = n
+        self._parts.append(buf[segment_start:i])
+        self._pending = buf[i:]
+        return statements
+
+
+def split_statements(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Splits a stream of SQL text chunks into statements.
+
+    Args:
+        chunks (Iterable[str]): Consecutive pieces of a SQL script.
+
+    Returns:
+        Iterator[str]: The statements of the script, in order.
+    """
+    splitter = StatementSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+
+def iter_file_chunks(path: os.PathLike,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     encoding: str = "utf-8",
+                     use_mmap: bool = True) -> Iterator[str]:
+    """
+    Reads a text file as a sequence of decoded chunks of bounded size.
+
+    The file is memory-mapped when possible, so the operating system pages it in
+    sequentially; otherwise it is read with plain buffered reads. Multi-byte characters
+    split across chunk boundaries are decoded correctly.
+
+    Args:
+        path (os.PathLike): The file to read.
+        chunk_size (int): The number of bytes decoded at a time.
+        encoding (str): The text encoding of the file.
+        use_mmap (bool): Whether to memory-map the file.
+
+    Returns:
+        Iterator[str]: The decoded chunks of the file.
+
+    Raises:
+        ValueError: If chunk_size is not a positive integer.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer.")
+
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap and size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                for offset in range(0, size, chunk_size):
+                    yield decoder.decode(mapped[offset:offset + chunk_size])
+        else:
+            while True:
+                block = f.read(chunk_size)
+                if not block:
+                    break
+                yield decoder.decode(block)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_log_queries(path: os.PathLike,
+                     fmt: str,
+                     column: str = "query",
+                     encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Reads the queries of a JSONL or CSV query log one record at a time.
+
+    Records that cannot be decoded or that lack the query column are logged and skipped.
+    CSV fields longer than csv.field_size_limit() are rejected by the csv module; raise
+    the limit beforehand for logs with very large queries.
+
+    Args:
+        path (os.PathLike): The log file to read.
+        fmt (str): Either 'jsonl' or 'csv'.
+        column (str): The name of the field holding the query text.
+        encoding (str): The text encoding of the file.
+
+    Returns:
+        Iterator[str]: The query of each record, in file order.
+
+    Raises:
+        ValueError: If fmt is not a supported log format.
+    """
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Unsupported log format: {fmt}")
+
+    with open(path, "r", encoding=encoding, newline="") as f:
+        for _, query in iter_log_records(f, fmt, column, str(path)):
+            yield query
+
+
+def iter_log_records(f: TextIO,
+                     fmt: str,
+                     column: str = "query",
+                     name: str = "<stream>") -> Iterator[Tuple[int, str]]:
+    """
+    Reads the queries of an open JSONL or CSV query log with their position in it.
+
+    The position is the line number in JSONL logs, blank lines included, and the 1-based
+    record number in CSV logs, so that it still points at the input when records are
+    skipped. Records that cannot be decoded or that lack the query column are logged
+    and skipped.
+
+    Args:
+        f (TextIO): The log, opened in text mode.
+        fmt (str): Either 'jsonl' or 'csv'.
+        column (str): The name of the field holding the query text.
+        name (str): The name of the log in warnings.
+
+    Returns:
+        Iterator[Tuple[int, str]]: The position and the query of each record, in order.
+
+    Raises:
+        ValueError: If fmt is not a supported log format.
+    """
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Unsupported log format: {fmt}")
+
+    if fmt == "jsonl":
+        records = _iter_json_lines(f, name)
+    else:
+        records = enumerate(csv.DictReader(f), start=1)
+
+    for number, record in records:
+        query = record.get(column) if isinstance(record, dict) else None
+        if not isinstance(query, str):
+            logger.warning(f"Skipping record {number} of {name}: no '{column}' string field")
+            continue
+        yield number, query
+
+
+def _iter_json_lines(f: TextIO, name: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Decodes one JSON document per non-empty line with its line number, logging and
+    skipping the lines that fail to decode.
+    """
+    for line_number, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping line {line_number} of {name}: invalid JSON: {e}")
+
+
+def detect_format(path: os.PathLike) -> str:
+    """
+    Infers the input format of a file from its extension.
+
+    Args:
+        path (os.PathLike): The file to inspect.
+
+    Returns:
+        str: 'jsonl' for .jsonl/.ndjson files, 'csv' for .csv files and 'sql' otherwise.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix == ".csv":
+        return "csv"
+    return "sql"
+
+
+def iter_queries(path: os.PathLike,
+                 fmt: Optional[str] = None,
+                 column: str = "query",
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Streams the queries of a SQL script or query log without loading the file in memory.
+
+    Args:
+        path (os.PathLike): The file to read.
+        fmt (Optional[str]): 'sql', 'jsonl' or 'csv'. Inferred from the extension if omitted.
+        column (str): The query field of JSONL and CSV logs.
+        chunk_size (int): The number of bytes read at a time from SQL scripts.
+        encoding (str): The text encoding of the file.
+
+    Returns:
+        Iterator[str]: The statements of a script, or the queries of a log, in file order.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "sql":
+        return split_statements(iter_file_chunks(path, chunk_size, encoding))
+    return iter_log_queries(path, fmt, column, encoding)
+
+
+def analyze_file(path: os.PathLike,
+                 fmt: Optional[str] = None,
+                 column: str = "query",
+                 workers: Optional[int] = 1,
+                 **batch_options) -> Iterator[QueryResult]:
+    """
+    Lazily analyzes every statement of a SQL script or query log.
+
+    Statements are read and dispatched as they are found, so memory use does not depend
+    on the size of the file.
+
+    Args:
+        path (os.PathLike): The file to analyze.
+        fmt (Optional[str]): 'sql', 'jsonl' or 'csv'. Inferred from the extension if omitted.
+        column (str): The query field of JSONL and CSV logs.
+        workers (Optional[int]): The number of worker processes passed to analyze_many.
+        **batch_options: Further keyword arguments for analyze_many.
+
+    Returns:
+        Iterator[QueryResult]: One result per statement, indexed by its position in the file.
+    """
+    return analyze_many(iter_queries(path, fmt, column), workers=workers, **batch_options)
@@ -0,0 +1,280 @@
+from typing import (Any, Dict, Optional, Tuple)
+import hashlib
+import re
+
+def content_hash(text: str) -> str:
+    """
+    Computes a stable hash of a text, identical across processes and runs.
+
+    Args:
+        text (str): The text to hash.
+
+    Returns:
+        str: A 32-character hexadecimal blake2b digest.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+_STRING = r"'[^'\\]*(?:(?:''|\\.)[^'\\]*)*'"
+_LITERAL = (rf"(?:[NnEeXxBb]?{_STRING}"
+            r"|[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?(?![\w.])"
+            r"|(?:NULL|TRUE|FALSE)\b)")
+# Run candidates, or units consumed whole so that runs are never looked for inside them
+_LITERAL_RUN_SCANNER = re.compile(
+    rf"(?P<row>\(\s*{_LITERAL})|(?P<literal>{_LITERAL})"
+    rf"|{_STRING}|\"[^\"]*\"|`[^`]*`|--[^\n]*|/\*.*?\*/"
+    r"|\$(?P<tag>[A-Za-z_]\w*)?\$.*?\$(?P=tag)\$|[A-Za-z_][\w$]*|\d[\w.]*",
+    re.IGNORECASE | re.DOTALL)
+_NEXT_LITERAL = re.compile(rf"\s*,\s*{_LITERAL}", re.IGNORECASE)
+_NEXT_ROW = re.compile(rf"\s*,\s*\(\s*{_LITERAL}", re.IGNORECASE)
+_ROW_END = re.compile(r"\s*\)")
+
+
+def _skip_literals(query: str, position: int) -> Tuple[int, int]:
+    """
+    Follows the comma-separated literals starting at position, one at a time so that
+    the state of the regex engine does not grow with the length of the run.
+
+    Returns:
+        Tuple[int, int]: The end of the last literal and the number of literals followed.
+    """
+    count = 0
+    while True:
+        match = _NEXT_LITERAL.match(query, position)
+        if match is None:
+            return position, count
+        position, count = match.end(), count + 1
+
+
+def _skip_row(query: str, position: int) -> Optional[int]:
+    """
+    Completes a parenthesized row of literals whose first literal ends at position.
+
+    Returns:
+        Optional[int]: The end of the row, or None if it holds anything but literals.
+    """
+    position, _ = _skip_literals(query, position)
+    match = _ROW_END.match(query, position)
+    return match.end() if match else None
+
+
+def compact_literal_runs(query: str, min_run: int = 32) -> str:
+    """
+    Collapses long comma-separated runs of literals, such as huge IN lists or multi-row
+    VALUES blocks, into their first element before the query is tokenized.
+
+    A run is at least min_run literals (numbers, strings, NULL, TRUE or FALSE) or at least
+    min_run parenthesized rows made only of literals. Keeping the first element leaves
+    the query valid SQL with the same statement type, tables, functions, clauses, joins
+    and subqueries, while the token stream no longer grows with the size of the data.
+    String and quoted identifier contents, comments and dollar-quoted bodies are skipped
+    as a whole, so runs are never looked for inside them.
+
+    Args:
+        query (str): The raw SQL query string.
+        min_run (int): The minimum number of elements of a run that is collapsed.
+
+    Returns:
+        str: The compacted query, or the query itself if it contains no such run.
+
+    Raises:
+        ValueError: If the query is not a valid string or min_run is less than 2.
+    """
+    if not isinstance(query, str):
+        raise ValueError("The query must be a string.")
+    if min_run < 2:
+        raise ValueError("min_run must be at least 2.")
+    if query.count(",") < min_run - 1:
+        return query
+
+    parts = []
+    copied = position = 0
+    while True:
+        match = _LITERAL_RUN_SCANNER.search(query, position)
+        if match is None:
+            break
+        if match.group("row") is not None:
+            end = _skip_row(query, match.end())
+            if end is None:
+                position = match.start() + 1  # Not a row, look for literals inside
+                continue
+            count = 1
+            while True:
+                following = _NEXT_ROW.match(query, end)
+                row_end = following and _skip_row(query, following.end())
+                if row_end is None:
+                    break
+                end, count = row_end, count + 1
+            if count < min_run:
+                position = match.start() + 1  # Look for a run of literals inside the rows
+                continue
+        elif match.group("literal") is not None:
+            end, count = _skip_literals(query, match.end())
+            count += 1
+            if count < min_run:
+                position = end
+                continue
+        else:
+            position = match.end()
+            continue
+        # Keep the first literal or row of the run
+        first_end = match.end() if match.group("literal") is not None else _skip_row(query, match.end())
+        parts.append(query[copied:first_end])
+        copied = position = end
+    if not parts:
+        return query
+    parts.append(query[copied:])
+    return "".join(parts)
+
+
+# Keywords reported as statement types, as classified by the sqlparse lexer
+_STATEMENT_KEYWORDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "MERGE", "REPLACE", "UPSERT",
+                       "CREATE", "ALTER", "DROP", "TRUNCATE", "COMMIT", "ROLLBACK", "START"}
+_DML_KEYWORDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "MERGE", "REPLACE", "UPSERT"}
+_WORD_SCANNER = re.compile(
+    rf"{_STRING}|\"[^\"]*\"|`[^`]*`|--[^\n]*|/\*.*?\*/|(?P<word>[A-Za-z_]\w*)|(?P<paren>[()])",
+    re.DOTALL)
+_JOIN_SCANNER = re.compile(rf"{_STRING}|\"[^\"]*\"|`[^`]*`|--[^\n]*|/\*.*?\*/|(?P<join>\bJOIN\b)",
+                           re.IGNORECASE | re.DOTALL)
+
+
+def get_statement_type_from_text(query: str) -> str:
+    """
+    Approximates get_statement_type from the raw query, without tokenizing it: the first
+    word is returned if it is a DML or DDL keyword, and for a query starting with WITH,
+    the first DML keyword outside parentheses. Strings, quoted identifiers and comments
+    are skipped.
+
+    Args:
+        query (str): The raw SQL query string.
+
+    Returns:
+        str: The upper-cased statement type, or 'UNKNOWN'.
+    """
+    depth = 0
+    first = None
+    for match in _WORD_SCANNER.finditer(query):
+        if match.group("paren"):
+            depth += 1 if match.group("paren") == "(" else -1
+            continue
+        word = match.group("word")
+        if word is None:
+            continue
+        word = word.upper()
+        if first is None:
+            if word in _STATEMENT_KEYWORDS:
+                return word
+            if word != "WITH":
+                return "UNKNOWN"
+            first = word
+        elif depth == 0 and word in _DML_KEYWORDS:
+            return word
+    return "UNKNOWN"
+
+
+def count_join_keywords(query: str) -> int:
+    """
+    Approximates count_join_tokens from the raw query, without tokenizing it, by counting
+    the JOIN keywords outside strings, quoted identifiers and comments.
+
+    Args:
+        query (str): The raw SQL query string.
+
+    Returns:
+        int: The number of JOIN keywords.
+    """
+    return sum(1 for match in _JOIN_SCANNER.finditer(query) if match.group("join"))
+
+
+# def extract_tables_with_regex(query):
+#     # Regex pattern to match table names in various SQL commands
+#     pattern = (
+#         r'\bFROM\s+([\w]+)|\bJOIN\s+([\w]+)|'          # Matches table names in SELECT, JOIN
+#         r'\bINSERT\s+INTO\s+([\w]+)|'                  # Matches table names in INSERT INTO
+#         r'\bUPDATE\s+([\w]+)\b|'                       # Matches table names in UPDATE
+#         r'\bDELETE\s+FROM\s+([\w]+)'                   # Matches table names in DELETE
+#     )
+
+#     # Find all matches in the query
+#     matches = re.findall(pattern, query, re.IGNORECASE)
+
+#     # Process matches to extract table names
+#     tables = set()
+#     for match in matches:
+#         # Each match is a tuple, but only one element in the tuple is the table name
+#         table_name = [m for m in match if m][0]
+#         tables.add(table_name)
+#     return tables
+def extract_tables_with_regex(query: str) -> set:
+    """
+    Extracts table names from a given SQL query.
+
+    This function uses regular expressions to identify table names in different SQL commands 
+    including SELECT, INSERT, UPDATE, DELETE, and various JOINs. It is designed to handle 
+    nested queries, table names in different contexts, and to exclude common aliases, CTE names, 
+    and SQL keywords.
+
+    Args:
+        query (str): The SQL query string from which table names are to be extracted.
+
+    Returns:
+        set: A set of unique table names found in the query.
+
+    Raises:
+        ValueError: If the query is not a valid string.
+    """
+    if not isinstance(query, str):
+        raise ValueError("The query must be a string.")
+
+    pattern = (
+        r'\bFROM\s+(?:\(?([^\s,()]+)\)?)|'            # Matches table names in FROM, possibly within parentheses
+        r'\bJOIN\s+(?:\(?([^\s,()]+)\)?)|'             # Matches table names in JOIN, possibly within parentheses
+        r'\bINTO\s+(?:\(?([^\s,()]+)\)?)|'             # Matches table names in INSERT INTO, possibly within parentheses
+        r'\bUPDATE\s+(?:\(?([^\s,()]+)\)?)\b|'         # Matches table names in UPDATE, possibly within parentheses
+        r'\bDELETE\s+FROM\s+(?:\(?([^\s,()]+)\)?)'     # Matches table names in DELETE, possibly within parentheses
+    )
+
+    # Exclude patterns typically used for CTEs and their aliases
+    exclude_patterns = ['as', 'on', 'using', 'with', 'cte', 'select']
+
+    try:
+        matches = re.findall(pattern, query, re.IGNORECASE)
+
+        tables = set()
+        for match in matches:
+            for m in match:
+                if m and m.lower() not in exclude_patterns:
+                    tables.add(m)
+        return tables
+    except Exception as e:
+        # Log the exception for debugging purposes
+        print(f"An error occurred while extracting table names: {e}")
+        return set()
+
+
+def analyze_text(query: str) -> Dict[str, Any]:
+    """
+    Analyzes a query from its raw text alone, with regular expressions: the statement type
+    from its first keyword, the tables with extract_tables_with_regex and the JOIN count
+    from the JOIN keywords. This is the entry point of short-lived processes that cannot
+    afford to load the parser; it neither imports sqlparse nor builds a RawSQLAnalyzer,
+    and returns the same keys as RawSQLAnalyzer.approximate_analysis.
+
+    Args:
+        query (str): The raw SQL query string.
+
+    Returns:
+        Dict[str, Any]: The 'query_type', 'tables' and 'joins' of the query, and an
+        'approximate' key set to True.
+
+    Raises:
+        ValueError: If the query is not a valid string.
+    """
+    if not isinstance(query, str):
+        raise ValueError("The query must be a string.")
+    return {
+        "query_type": get_statement_type_from_text(query),
+        "tables": extract_tables_with_regex(query),
+        "joins": count_join_keywords(query),
+        "approximate": True,
+    }
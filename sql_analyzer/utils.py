@@ -1,13 +1,169 @@
-from typing import (List, Type, Callable, Tuple)
+from typing import (Any, List, Type, Callable, Tuple, Dict, Iterable, Optional)
+from itertools import chain
 import logging
-from sqlparse.sql import (Statement, TokenList, Token)
-import re
+from sqlparse.sql import (Statement, TokenList, Token, Function, Where, Comment)
+from sqlparse.tokens import Token as TokenType
+from sqlparse import lexer
+from sql_analyzer.text import (content_hash, compact_literal_runs, get_statement_type_from_text,
+                               count_join_keywords, extract_tables_with_regex)
 logger = logging.getLogger(__name__)
 
+JOIN_KEYWORDS = ["JOIN", "INNER JOIN", "LEFT JOIN", "RIGHT JOIN", "FULL JOIN", "CROSS JOIN"]
+
+
+class TokenIndex:
+    """
+    This class indexes the tokens of a parsed statement, built with a single traversal
+    of the tree, so that repeated lookups by Python class, by ttype or by value do not
+    walk the tree again. Tokens are bucketed by their class and their ttype, in document
+    order; the lower-cased values used by find_by_ttype_and_values are computed once per
+    ttype, and the answers to every query are cached.
+
+    Lookups return tuples shared with the cache. Custom analyzers get the Function nodes
+    or the JOIN keywords of a statement, once indexed, in constant time.
+
+    The index is a snapshot: a tree modified after it was built must be indexed again.
+
+    Attributes:
+        tokens (Tuple[Token, ...]): Every token of the statement, groups included, in
+            document order.
+    """
+
+    __slots__ = ("tokens", "_by_class", "_by_ttype", "_lowered", "_by_upper_value", "_cache")
+
+    def __init__(self, statement: TokenList):
+        """
+        Indexes a parsed statement.
+
+        Args:
+            statement (TokenList): The parsed SQL statement, or any group of tokens.
+        """
+        tokens = []
+        by_class: Dict[type, List[int]] = {}
+        by_ttype: Dict[Any, List[Token]] = {}
+        stack = [iter(statement.tokens)]
+        while stack:
+            for token in stack[-1]:
+                by_class.setdefault(type(token), []).append(len(tokens))
+                by_ttype.setdefault(token.ttype, []).append(token)
+                tokens.append(token)
+                if token.is_group:
+                    stack.append(iter(token.tokens))
+                    break
+            else:
+                stack.pop()
+        self.tokens: Tuple[Token, ...] = tuple(tokens)
+        self._by_class = by_class
+        self._by_ttype = {ttype: tuple(bucket) for ttype, bucket in by_ttype.items()}
+        self._lowered: Dict[Any, Tuple[str, ...]] = {}
+        self._by_upper_value: Optional[Dict[str, Tuple[Token, ...]]] = None
+        self._cache: Dict[Any, Tuple[Token, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def find_by_type(self, element_type: Type) -> Tuple[Token, ...]:
+        """
+        Returns the tokens that are instances of a class, in document order.
+
+        Args:
+            element_type (Type): The class, e.g. Function or Where.
+
+        Returns:
+            Tuple[Token, ...]: The tokens found.
+        """
+        key = ("type", element_type)
+        found = self._cache.get(key)
+        if found is None:
+            buckets = [positions for cls, positions in self._by_class.items() if issubclass(cls, element_type)]
+            positions = buckets[0] if len(buckets) == 1 else sorted(chain.from_iterable(buckets))
+            found = self._cache[key] = tuple(self.tokens[position] for position in positions)
+        return found
+
+    def find_by_ttype(self, ttype: Any) -> Tuple[Token, ...]:
+        """
+        Returns the tokens of exactly a token type, in document order.
+
+        Args:
+            ttype (TokenType): The token type, e.g. TokenType.Keyword.
+
+        Returns:
+            Tuple[Token, ...]: The tokens found.
+        """
+        return self._by_ttype.get(ttype, ())
+
+    def find_by_value(self, value: str) -> Tuple[Token, ...]:
+        """
+        Returns the tokens whose value equals value, ignoring case, in document order.
+
+        Args:
+            value (str): The value to search for.
+
+        Returns:
+            Tuple[Token, ...]: The tokens found.
+        """
+        if self._by_upper_value is None:
+            by_value: Dict[str, List[Token]] = {}
+            for token in self.tokens:
+                by_value.setdefault(token.value.upper(), []).append(token)
+            self._by_upper_value = {key: tuple(bucket) for key, bucket in by_value.items()}
+        return self._by_upper_value.get(value.upper(), ())
+
+    def find_by_ttype_and_values(self, ttype: Any, values: Iterable[str]) -> Tuple[Token, ...]:
+        """
+        Returns the tokens of exactly a token type whose value contains any of values,
+        ignoring case, in document order.
+
+        Args:
+            ttype (TokenType): The token type, e.g. TokenType.Keyword.
+            values (Iterable[str]): The values to search for, e.g. JOIN_KEYWORDS.
+
+        Returns:
+            Tuple[Token, ...]: The tokens found.
+        """
+        values_lower = tuple(value.lower() for value in values)
+        key = ("ttype_and_values", ttype, values_lower)
+        found = self._cache.get(key)
+        if found is None:
+            bucket = self._by_ttype.get(ttype, ())
+            lowered = self._lowered.get(ttype)
+            if lowered is None:
+                lowered = self._lowered[ttype] = tuple(token.value.lower() for token in bucket)
+            found = self._cache[key] = tuple(
+                token for token, token_lower in zip(bucket, lowered)
+                if any(value in token_lower for value in values_lower))
+        return found
+
+
+def token_index(statement: TokenList) -> TokenIndex:
+    """
+    Returns the TokenIndex of a parsed statement, building it on first use. The index is
+    kept on the statement, so every helper and analyzer working on the same tree shares
+    a single traversal.
+
+    Args:
+        statement (TokenList): The parsed SQL statement.
+
+    Returns:
+        TokenIndex: The index of the statement.
+    """
+    index = getattr(statement, "_token_index", None)
+    if index is None:
+        index = TokenIndex(statement)
+        try:
+            statement._token_index = index
+        except AttributeError:
+            pass  # Plain TokenList instances have no __dict__ to keep the index in
+    return index
+
 
 def search_tokens(statement: Statement, condition: Callable[[TokenList], bool]) -> List:
     """
-    Recursively searches tokens in a SQL statement based on a given condition.
+    Searches tokens in a SQL statement based on a given condition.
+
+    The tokens are read from the TokenIndex of the statement, so the tree is only
+    walked once, without recursion, whatever the number of searches. Tokens are
+    returned in document order.
 
     Args:
         statement (Statement): The parsed SQL statement.
@@ -16,17 +172,7 @@ def search_tokens(statement: Statement, condition: Callable[[TokenList], bool])
     Returns:
         List: A list of tokens that meet the search condition.
     """
-    found_elements = []
-
-    def search(tokens: TokenList):
-        for token in tokens:
-            if condition(token):
-                found_elements.append(token)
-            if token.is_group:
-                search(token.tokens)
-
-    search(statement.tokens)
-    return found_elements
+    return [token for token in token_index(statement).tokens if condition(token)]
 
 def find_by_type(statement: Statement, element_type: Type) -> List:
     """
@@ -39,7 +185,7 @@ def find_by_type(statement: Statement, element_type: Type) -> List:
     Returns:
         List: A list of found elements of the specified type.
     """
-    return search_tokens(statement, lambda token: isinstance(token, element_type))
+    return list(token_index(statement).find_by_type(element_type))
 
 
 def find_by_value(statement: Statement, value: str) -> List:
@@ -53,7 +199,7 @@ def find_by_value(statement: Statement, value: str) -> List:
     Returns:
         List: A list of found elements with the specified value.
     """
-    return search_tokens(statement, lambda token: token.value.upper() == value.upper())
+    return list(token_index(statement).find_by_value(value))
 
 def find_by_ttype_and_values(statement: Statement, ttype: Token, values: List[str]) -> List:
     """
@@ -67,18 +213,36 @@ def find_by_ttype_and_values(statement: Statement, ttype: Token, values: List[st
     Returns:
         List: A list of tokens of the specified token type and any of the specified values.
     """
-    values_lower = [value.lower() for value in values]
-    return search_tokens(statement, lambda token: 
-                         token.ttype is ttype and 
-                         any(value in token.value.lower() for value in values_lower))
+    return list(token_index(statement).find_by_ttype_and_values(ttype, values))
+
+def is_subquery(group: TokenList) -> bool:
+    """
+    Checks whether a group of tokens is a subquery, i.e. whether one of its direct
+    children starts with SELECT.
+
+    Only the first characters of each child are inspected, so the check does not
+    depend on the size of the children.
+
+    Args:
+        group (TokenList): A group of tokens from a parsed SQL statement.
+
+    Returns:
+        bool: True if the group is a subquery.
+    """
+    return any(sub_token.value[:6].upper().startswith("SELECT") for sub_token in group.tokens)
+
 
 def count_subqueries_and_depth(statement: Statement, current_depth: int = 0) -> Tuple[int, int]:
     """
-    Recursively counts the number and depth of subqueries in a SQL query.
+    Counts the number and depth of subqueries in a SQL query.
+
+    The tree is walked with an explicit stack, visiting every token once, so the cost
+    is linear in the size of the statement and nesting depth is not limited by the
+    recursion limit.
 
     Args:
-        tokens (TokenList): Tokens from a parsed SQL statement.
-        current_depth (int): The current depth of nested subqueries.
+        statement (Statement): A parsed SQL statement, or a list of its tokens.
+        current_depth (int): The depth of nested subqueries the statement is at.
 
     Returns:
         Tuple[int, int]: A tuple containing the total count of subqueries and the maximum depth.
@@ -87,19 +251,18 @@ def count_subqueries_and_depth(statement: Statement, current_depth: int = 0) ->
         subquery_count = 0
         max_depth = current_depth
 
-        for token in statement:
-            if token.is_group:
-                is_subquery = any(sub_token.value.upper().startswith("SELECT") for sub_token in token.tokens)
-                if is_subquery:
-                    nested_count, nested_depth = count_subqueries_and_depth(token.tokens, current_depth + 1)
-                    subquery_count += 1  # Count this as a subquery
-                    subquery_count += nested_count  # Add nested subqueries count
-                    max_depth = max(max_depth, nested_depth)
-                else:
-                    # Check nested tokens without incrementing depth
-                    nested_count, nested_depth = count_subqueries_and_depth(token.tokens, current_depth)
-                    subquery_count += nested_count
-                    max_depth = max(max_depth, nested_depth)
+        stack = [(statement, current_depth)]
+        while stack:
+            tokens, depth = stack.pop()
+            for token in tokens:
+                if token.is_group:
+                    if is_subquery(token):
+                        subquery_count += 1  # Count this as a subquery
+                        stack.append((token.tokens, depth + 1))
+                        max_depth = max(max_depth, depth + 1)
+                    else:
+                        # Check nested tokens without incrementing depth
+                        stack.append((token.tokens, depth))
 
         return subquery_count, max_depth
     except Exception as e:
@@ -107,39 +270,161 @@ def count_subqueries_and_depth(statement: Statement, current_depth: int = 0) ->
         raise
 
 
-# def extract_tables_with_regex(query):
-#     # Regex pattern to match table names in various SQL commands
-#     pattern = (
-#         r'\bFROM\s+([\w]+)|\bJOIN\s+([\w]+)|'          # Matches table names in SELECT, JOIN
-#         r'\bINSERT\s+INTO\s+([\w]+)|'                  # Matches table names in INSERT INTO
-#         r'\bUPDATE\s+([\w]+)\b|'                       # Matches table names in UPDATE
-#         r'\bDELETE\s+FROM\s+([\w]+)'                   # Matches table names in DELETE
-#     )
+def get_statement_type(tokens: List[Token]) -> str:
+    """
+    Extracts the type of a statement from its ungrouped tokens.
+
+    Mirrors sqlparse.sql.Statement.get_type without requiring the grouped tree: the first
+    DML or DDL keyword is returned, and for a statement starting with WITH, the first DML
+    keyword outside parentheses that follows a CTE definition.
 
-#     # Find all matches in the query
-#     matches = re.findall(pattern, query, re.IGNORECASE)
+    Args:
+        tokens (List[Token]): The leaf tokens of a statement, in order.
 
-#     # Process matches to extract table names
-#     tables = set()
-#     for match in matches:
-#         # Each match is a tuple, but only one element in the tuple is the table name
-#         table_name = [m for m in match if m][0]
-#         tables.add(table_name)
-#     return tables
-def extract_tables_with_regex(query: str) -> set:
+    Returns:
+        str: The upper-cased statement type, or 'UNKNOWN'.
     """
-    Extracts table names from a given SQL query.
+    significant = (token for token in tokens
+                   if not token.is_whitespace and token.ttype not in TokenType.Comment)
+    first = next(significant, None)
+    if first is None:
+        return "UNKNOWN"
+    if first.ttype in (TokenType.Keyword.DML, TokenType.Keyword.DDL):
+        return first.normalized
+    if first.ttype == TokenType.Keyword.CTE:
+        depth = 0
+        previous = first
+        for token in significant:
+            if token.ttype is TokenType.Punctuation and token.value in "()":
+                depth += 1 if token.value == "(" else -1
+            elif (depth == 0 and token.ttype == TokenType.Keyword.DML
+                  and (previous.value == ")" or previous.ttype in TokenType.Name)):
+                return token.normalized
+            previous = token
+    return "UNKNOWN"
+
+
+def count_join_tokens(tokens: List[Token], join_keywords: List[str] = JOIN_KEYWORDS) -> int:
+    """
+    Counts JOIN keywords in the ungrouped tokens of a statement, matching them the same
+    way as find_by_ttype_and_values.
 
-    This function uses regular expressions to identify table names in different SQL commands 
-    including SELECT, INSERT, UPDATE, DELETE, and various JOINs. It is designed to handle 
-    nested queries, table names in different contexts, and to exclude common aliases, CTE names, 
-    and SQL keywords.
+    Args:
+        tokens (List[Token]): The leaf tokens of a statement.
+        join_keywords (List[str]): The keywords counted as JOIN clauses.
+
+    Returns:
+        int: The number of JOIN keywords.
+    """
+    join_values = [value.lower() for value in join_keywords]
+    return sum(1 for token in tokens
+               if token.ttype is TokenType.Keyword
+               and any(value in token.value.lower() for value in join_values))
+
+
+def is_empty_statement(statement: Statement) -> bool:
+    """
+    Checks whether a parsed statement holds only whitespace and comments.
 
     Args:
-        query (str): The SQL query string from which table names are to be extracted.
+        statement (Statement): The parsed SQL statement.
 
     Returns:
-        set: A set of unique table names found in the query.
+        bool: True if the statement contains no SQL code.
+    """
+    return all(token.is_whitespace or isinstance(token, Comment) or token.ttype in TokenType.Comment
+               for token in statement.tokens)
+
+
+def count_tree_size(statement: TokenList) -> Tuple[int, int]:
+    """
+    Measures a parse tree without recursion.
+
+    Args:
+        statement (TokenList): The parsed SQL statement or any token group.
+
+    Returns:
+        Tuple[int, int]: The number of leaf tokens and the number of nodes, groups included,
+        below the root.
+    """
+    leaves = nodes = 0
+    stack = [statement.tokens]
+    while stack:
+        tokens = stack.pop()
+        nodes += len(tokens)
+        for token in tokens:
+            if token.is_group:
+                stack.append(token.tokens)
+            else:
+                leaves += 1
+    return leaves, nodes
+
+
+def collect_statement_metrics(statement: Statement, join_keywords: List[str] = JOIN_KEYWORDS) -> Dict[str, int]:
+    """
+    Collects the tree-based metrics of a SQL statement in a single traversal.
+
+    Produces the same figures as running find_by_type for Function and Where,
+    find_by_ttype_and_values for the JOIN keywords and count_subqueries_and_depth
+    separately, but visits every token only once.
+
+    Args:
+        statement (Statement): The parsed SQL statement.
+        join_keywords (List[str]): The keywords counted as JOIN clauses.
+
+    Returns:
+        Dict[str, int]: The counts of 'functions', 'where', 'joins' and 'subqueries',
+        and the maximum subquery depth under 'max_depth'.
+    """
+    join_values = [value.lower() for value in join_keywords]
+    functions = wheres = joins = subqueries = max_depth = 0
+
+    stack = [(statement.tokens, 0)]
+    while stack:
+        tokens, depth = stack.pop()
+        for token in tokens:
+            if isinstance(token, Function):
+                functions += 1
+            elif isinstance(token, Where):
+                wheres += 1
+            elif token.ttype is TokenType.Keyword:
+                value = token.value.lower()
+                if any(join_value in value for join_value in join_values):
+                    joins += 1
+
+            if token.is_group:
+                nested_depth = depth
+                if is_subquery(token):
+                    subqueries += 1
+                    nested_depth += 1
+                    max_depth = max(max_depth, nested_depth)
+                stack.append((token.tokens, nested_depth))
+
+    return {
+        "functions": functions,
+        "where": wheres,
+        "joins": joins,
+        "subqueries": subqueries,
+        "max_depth": max_depth,
+    }
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a SQL query into the shape shared by all queries of the same template.
+
+    The query is tokenized without grouping; comments are dropped, whitespace runs are
+    collapsed into a single space, keywords are upper-cased, and string, numeric and
+    dollar-quoted literals as well as parameter placeholders are replaced with '?'.
+    Comma-separated runs of such placeholders, as in IN lists, collapse into one '?'.
+    Identifiers, including quoted ones, keep their original spelling so that table
+    names extracted from any query of the template are the same.
+
+    Args:
+        query (str): The raw SQL query string.
+
+    Returns:
+        str: The normalized query.
 
     Raises:
         ValueError: If the query is not a valid string.
@@ -147,30 +432,182 @@ def extract_tables_with_regex(query: str) -> set:
     if not isinstance(query, str):
         raise ValueError("The query must be a string.")
 
-    pattern = (
-        r'\bFROM\s+(?:\(?([^\s,()]+)\)?)|'            # Matches table names in FROM, possibly within parentheses
-        r'\bJOIN\s+(?:\(?([^\s,()]+)\)?)|'             # Matches table names in JOIN, possibly within parentheses
-        r'\bINTO\s+(?:\(?([^\s,()]+)\)?)|'             # Matches table names in INSERT INTO, possibly within parentheses
-        r'\bUPDATE\s+(?:\(?([^\s,()]+)\)?)\b|'         # Matches table names in UPDATE, possibly within parentheses
-        r'\bDELETE\s+FROM\s+(?:\(?([^\s,()]+)\)?)'     # Matches table names in DELETE, possibly within parentheses
-    )
+    parts = []
+    pending_space = False
+    for ttype, value in lexer.tokenize(query):
+        if ttype in TokenType.Comment or ttype in TokenType.Text.Whitespace:
+            pending_space = True
+            continue
+        if ((ttype in TokenType.Literal and ttype not in TokenType.Literal.String.Symbol)
+                or ttype in TokenType.Name.Placeholder):
+            if parts[-2:] == ["?", ","] or parts[-3:] == ["?", " ", ","]:
+                # Extend the previous placeholder instead of starting a new one
+                while parts[-1] != "?":
+                    parts.pop()
+                pending_space = False
+                continue
+            value = "?"
+        elif ttype in TokenType.Keyword:
+            value = value.upper()
+        if pending_space and parts:
+            parts.append(" ")
+        pending_space = False
+        parts.append(value)
+    return "".join(parts)
+
+
+def fingerprint_query(query: str) -> str:
+    """
+    Computes a stable fingerprint of a SQL query from its normalized form.
+
+    Queries that differ only in literal values, comments, whitespace or keyword case
+    share the same fingerprint.
+
+    Args:
+        query (str): The raw SQL query string.
+
+    Returns:
+        str: A hexadecimal digest of the normalized query.
+    """
+    return content_hash(normalize_query(query))
+
+
+# Keywords that may precede a table name without being one
+_TABLE_PREFIX_KEYWORDS = {"ONLY", "LATERAL", "TABLE", "RECURSIVE"}
+# Keywords that can never be a table name in table position
+_NON_TABLE_KEYWORDS = {"AS", "ON", "USING", "WHERE", "SET", "VALUES", "DEFAULT", "NATURAL"}
+# First words of the clauses that end a FROM list
+_FROM_LIST_END_KEYWORDS = {"WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET", "UNION", "EXCEPT",
+                           "INTERSECT", "WINDOW", "QUALIFY", "RETURNING", "FETCH", "FOR", "SET"}
+# Keywords after which no table reference is expected, such as the SET of an UPDATE
+_NO_TABLE_KEYWORDS = {"SET", "WHEN", "THEN"}
+# Statements whose USING introduces tables rather than JOIN columns
+_USING_TABLES_STATEMENTS = {"DELETE", "MERGE"}
+
+
+def _is_name_token(token: Token) -> bool:
+    """
+    Checks whether a token can be (part of) an identifier: a name, a quoted name, or a
+    non-reserved keyword such as 'data' or 'user'.
+    """
+    if token.ttype in TokenType.Name:
+        return token.ttype not in TokenType.Name.Placeholder
+    if token.ttype in TokenType.Literal.String.Symbol:
+        return True
+    return token.ttype is TokenType.Keyword and token.normalized not in _NON_TABLE_KEYWORDS
+
+
+def _unquote(name: str) -> str:
+    """
+    Normalizes an identifier for comparison by dropping quotes and case.
+    """
+    return name.strip('"`[]').lower()
+
+
+def extract_tables_from_tokens(tokens: List[Token]) -> set:
+    """
+    Extracts table names from the ungrouped tokens of a SQL statement.
+
+    Identifiers are resolved after FROM, JOIN, INTO and UPDATE, including every item of a
+    comma-separated FROM list and tables inside parenthesized joins, and after the USING
+    of DELETE and MERGE statements. Names defined by a
+    WITH clause, aliases, table functions and the FROM of calls such as EXTRACT(... FROM ...)
+    are not reported. Because the input is tokenized, text inside string literals and
+    comments is never mistaken for a table. Qualified names are kept as written, e.g.
+    'schema.table'.
+
+    Args:
+        tokens (List[Token]): The leaf tokens of a statement, in order.
+
+    Returns:
+        set: A set of unique table names found in the statement.
+    """
+    significant = [token for token in tokens
+                   if not token.is_whitespace and token.ttype not in TokenType.Comment]
+    n = len(significant)
+
+    tables = set()
+    cte_names = set()
+    calls = []  # For each open parenthesis, whether it belongs to a function call
+    from_lists = []  # Depths of the open FROM lists, whose commas introduce more tables
+    with_clauses = []  # Depths of the open WITH clauses, whose commas introduce more CTEs
+    statements = {}  # The DML keyword of the statement open at each depth
+    expect_table = None  # The keyword whose table reference is expected next
+    expect_cte_name = False
+
+    i = 0
+    while i < n:
+        token = significant[i]
+        ttype = token.ttype
+        depth = len(calls)
+
+        if ttype is TokenType.Punctuation and token.value == "(":
+            previous = significant[i - 1] if i else None
+            calls.append(previous is not None and previous.ttype in TokenType.Name and expect_table is None)
+        elif ttype is TokenType.Punctuation and token.value == ")":
+            if calls:
+                calls.pop()
+            while from_lists and from_lists[-1] > len(calls):
+                from_lists.pop()
+            while with_clauses and with_clauses[-1] > len(calls):
+                with_clauses.pop()
+            statements.pop(depth, None)
+        elif ttype is TokenType.Punctuation and token.value == ",":
+            if with_clauses and with_clauses[-1] == depth:
+                expect_cte_name = True
+            elif from_lists and from_lists[-1] == depth:
+                expect_table = "FROM"
+        elif ttype in (TokenType.Keyword.DML, TokenType.Keyword.DDL):
+            expect_table = "UPDATE" if token.normalized == "UPDATE" else None
+            statements[depth] = token.normalized
+            if with_clauses and with_clauses[-1] == depth:
+                with_clauses.pop()
+        elif ttype == TokenType.Keyword.CTE:
+            with_clauses.append(depth)
+            expect_cte_name = True
+        elif ttype is TokenType.Keyword and token.normalized in _TABLE_PREFIX_KEYWORDS:
+            pass
+        elif ttype is TokenType.Keyword and token.normalized == "FROM":
+            if not (calls and calls[-1]):
+                expect_table = "FROM"
+                if not from_lists or from_lists[-1] != depth:
+                    from_lists.append(depth)
+        elif ttype is TokenType.Keyword and "JOIN" in token.normalized:
+            expect_table = "JOIN"
+        elif ttype is TokenType.Keyword and token.normalized == "INTO":
+            expect_table = "INTO"
+        elif (ttype is TokenType.Keyword and token.normalized == "USING"
+              and statements.get(depth) in _USING_TABLES_STATEMENTS):
+            expect_table = "FROM"
+            if statements[depth] == "DELETE" and (not from_lists or from_lists[-1] != depth):
+                from_lists.append(depth)
+        elif _is_name_token(token) and (expect_table or expect_cte_name):
+            # Read a possibly qualified name such as schema.table
+            end = i
+            while (end + 2 < n and significant[end + 1].match(TokenType.Punctuation, ".")
+                   and _is_name_token(significant[end + 2])):
+                end += 2
+            name = "".join(part.value for part in significant[i:end + 1])
+            is_call = end + 1 < n and significant[end + 1].match(TokenType.Punctuation, "(")
+
+            if expect_cte_name:
+                cte_names.add(_unquote(name))
+                expect_cte_name = False
+            elif (expect_table == "INTO" or not is_call) and _unquote(name) not in cte_names:
+                tables.add(name)
+            expect_table = None
+            i = end
+        elif (ttype is TokenType.Keyword and from_lists and from_lists[-1] == depth
+              and token.normalized.split()[0] in _FROM_LIST_END_KEYWORDS):
+            from_lists.pop()
+            expect_table = None
+        elif ttype is TokenType.Keyword and token.normalized in _NO_TABLE_KEYWORDS:
+            expect_table = None
+
+        i += 1
+    return tables
 
-    # Exclude patterns typically used for CTEs and their aliases
-    exclude_patterns = ['as', 'on', 'using', 'with', 'cte', 'select']
 
-    try:
-        matches = re.findall(pattern, query, re.IGNORECASE)
-
-        tables = set()
-        for match in matches:
-            for m in match:
-                if m and m.lower() not in exclude_patterns:
-                    tables.add(m)
-        return tables
-    except Exception as e:
-        # Log the exception for debugging purposes
-        print(f"An error occurred while extracting table names: {e}")
-        return set()
 # from google.cloud import bigquery
 
 # def estimate_query_cost(query, client):
@@ -0,0 +1,203 @@
+from typing import (Any, Dict, Iterable, Optional, Union)
+from itertools import (combinations, repeat)
+
+from sql_analyzer.batch import QueryResult
+from sql_analyzer.sketches import (HeavyHitters, HyperLogLog, Histogram)
+from sql_analyzer.lazy import lazy_import
+
+
+utils = lazy_import("sql_analyzer.utils")
+
+# Queries accessing more tables than this add no co-accessed pairs
+DEFAULT_MAX_PAIR_TABLES = 16
+
+
+class WorkloadAggregator:
+    """
+    This class turns a stream of perform_full_analysis results into workload-level facts
+    in bounded memory: table access frequencies, the most frequent pairs of tables accessed
+    together, the number of distinct tables and query templates, and the distributions of
+    subquery depth and JOIN counts.
+
+    Frequencies are kept in count-min sketches, distinct counts in HyperLogLog sketches
+    and distributions in histograms. Aggregators built on parallel shards with the same
+    parameters can be merged: the sketches and histograms merge exactly, so the merged
+    counts equal those of a single aggregator over the whole stream; the lists of most
+    frequent items are re-ranked from the candidates of both shards.
+
+    Co-accessed pairs are the pairs of tables accessed by the same query, wherever they
+    appear in it: results record which tables a query uses but not which ones are joined
+    to which, so a table read in a subquery or an EXISTS clause pairs with the others as
+    well. A query with n tables adds n * (n - 1) / 2 pairs; queries with more than
+    max_pair_tables tables add none, which bounds the cost of pathological queries.
+
+    Attributes:
+        queries (int): The number of results added.
+        failures (int): The number of failed analyses skipped by add_results.
+        query_types (Dict[str, int]): The number of queries of each statement type.
+    """
+
+    def __init__(self, top_k: int = 100, width: int = 2048, depth: int = 4,
+                 precision: int = 12, max_histogram_value: int = 64,
+                 max_pair_tables: int = DEFAULT_MAX_PAIR_TABLES):
+        """
+        Initializes an empty aggregator.
+
+        Args:
+            top_k (int): The number of most frequent tables, co-accessed pairs and templates kept.
+            width (int): The width of the count-min sketches.
+            depth (int): The depth of the count-min sketches.
+            precision (int): The precision of the HyperLogLog sketches.
+            max_histogram_value (int): The first value counted in the overflow bucket of
+                the histograms.
+            max_pair_tables (int): The number of tables above which a query adds no
+                co-accessed pairs.
+        """
+        self.queries = 0
+        self.failures = 0
+        self.query_types: Dict[str, int] = {}
+        self.tables = HeavyHitters(top_k, width, depth)
+        self.max_pair_tables = max_pair_tables
+        self.co_accessed = HeavyHitters(top_k, width, depth)
+        self.templates = HeavyHitters(top_k, width, depth)
+        self.distinct_tables = HyperLogLog(precision)
+        self.distinct_templates = HyperLogLog(precision)
+        self.depth_histogram = Histogram(max_histogram_value)
+        self.subquery_histogram = Histogram(max_histogram_value)
+        self.join_histogram = Histogram(max_histogram_value)
+
+    def add(self, result: Dict[str, Any], query: Optional[str] = None) -> None:
+        """
+        Adds the analysis of one query.
+
+        Args:
+            result (Dict[str, Any]): The dictionary returned by perform_full_analysis.
+            query (Optional[str]): The query text. Templates are only counted when it is given.
+        """
+        self.queries += 1
+        query_type = result.get("query_type")
+        if query_type is not None:
+            self.query_types[query_type] = self.query_types.get(query_type, 0) + 1
+
+        tables = sorted(result.get("tables", ()))
+        for table in tables:
+            self.tables.add(table)
+            self.distinct_tables.add(table)
+
+        self.join_histogram.add(result.get("joins", -1))
+        if len(tables) <= self.max_pair_tables:
+            for left, right in combinations(tables, 2):
+                self.co_accessed.add(f"{left}, {right}")
+
+        subqueries, max_depth = result.get("subqueries_and_maxdepth", (-1, -1))
+        self.subquery_histogram.add(subqueries)
+        self.depth_histogram.add(max_depth)
+
+        if query is not None:
+            template = utils.normalize_query(query)
+            self.templates.add(template)
+            self.distinct_templates.add(template)
+
+    def add_results(self, results: Iterable[Union[QueryResult, Dict[str, Any]]],
+                    queries: Optional[Iterable[str]] = None) -> "WorkloadAggregator":
+        """
+        Adds a stream of results, such as the output of analyze_many. Failed analyses are
+        counted in failures and skipped. Results carry no query text, so templates are
+        only counted when the queries are given as well.
+
+        Args:
+            results (Iterable[Union[QueryResult, Dict[str, Any]]]): The results to add.
+            queries (Optional[Iterable[str]]): The query of each result, in the same order,
+                such as the input of an ordered analyze_many.
+
+        Returns:
+            WorkloadAggregator: The aggregator itself.
+        """
+        for item, query in zip(results, repeat(None) if queries is None else queries):
+            if isinstance(item, QueryResult):
+                if item.result is None:
+                    self.failures += 1
+                    continue
+                item = item.result
+            self.add(item, query)
+        return self
+
+    def merge(self, other: "WorkloadAggregator") -> None:
+        """
+        Adds the workload aggregated by another aggregator, e.g. one per shard.
+
+        Args:
+            other (WorkloadAggregator): An aggregator built with the same parameters.
+
+        Raises:
+            ValueError: If the aggregators were built with different parameters, in which
+                case this aggregator is left unchanged.
+        """
+        parameters, other_parameters = self._parameters(), other._parameters()
+        different = [name for name in parameters if parameters[name] != other_parameters[name]]
+        if different:
+            raise ValueError(f"Cannot merge aggregators with different {', '.join(different)}.")
+        self.queries += other.queries
+        self.failures += other.failures
+        for query_type, count in other.query_types.items():
+            self.query_types[query_type] = self.query_types.get(query_type, 0) + count
+        self.tables.merge(other.tables)
+        self.co_accessed.merge(other.co_accessed)
+        self.templates.merge(other.templates)
+        self.distinct_tables.merge(other.distinct_tables)
+        self.distinct_templates.merge(other.distinct_templates)
+        self.depth_histogram.merge(other.depth_histogram)
+        self.subquery_histogram.merge(other.subquery_histogram)
+        self.join_histogram.merge(other.join_histogram)
+
+    def _parameters(self) -> Dict[str, int]:
+        """
+        Returns the parameters that must match for two aggregators to be merged.
+        """
+        return {
+            "width": self.tables.sketch.width,
+            "depth": self.tables.sketch.depth,
+            "precision": self.distinct_tables.precision,
+            "max_histogram_value": self.depth_histogram.max_value,
+            "max_pair_tables": self.max_pair_tables,
+        }
+
+    @staticmethod
+    def _describe(histogram: Histogram) -> Dict[str, Any]:
+        """
+        Summarizes a histogram for the report.
+        """
+        return {
+            "buckets": histogram.buckets(),
+            "mean": histogram.mean(),
+            "p50": histogram.quantile(0.5),
+            "p99": histogram.quantile(0.99),
+            "max": histogram.max_seen,
+        }
+
+    def report(self, top_n: int = 10) -> Dict[str, Any]:
+        """
+        Summarizes the workload.
+
+        Args:
+            top_n (int): The number of most frequent tables, co-accessed pairs and templates listed.
+
+        Returns:
+            Dict[str, Any]: The query and failure counts, the statement type counts, the
+            estimated number of distinct tables and templates, the most frequent tables,
+            co-accessed pairs and templates with their estimated counts, and the subquery depth,
+            subquery count and JOIN count distributions.
+        """
+        return {
+            "queries": self.queries,
+            "failures": self.failures,
+            "query_types": dict(self.query_types),
+            "distinct_tables": self.distinct_tables.count(),
+            "distinct_templates": self.distinct_templates.count(),
+            "top_tables": self.tables.top(top_n),
+            "top_co_accessed_tables": self.co_accessed.top(top_n),
+            "top_templates": self.templates.top(top_n),
+            "subquery_depth": self._describe(self.depth_histogram),
+            "subqueries": self._describe(self.subquery_histogram),
+            "joins": self._describe(self.join_histogram),
+        }
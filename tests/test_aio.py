@@ -0,0 +1,121 @@
+import unittest
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import sys
+import time
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.aio import AsyncAnalyzer
+
+# A query large enough to keep a worker busy for a noticeable time
+LARGE_QUERY = "SELECT " + ",\n".join(f"COUNT(c{i}) AS n{i}" for i in range(1500)) + "\nFROM big_table"
+
+class TestAsyncAnalyzer(unittest.IsolatedAsyncioTestCase):
+    """
+    The TestAsyncAnalyzer class contains unit tests for the asyncio facade.
+    """
+
+    def setUp(self):
+        """
+        Initializes the SQL queries and expected results used in the tests.
+        """
+        self.queries = sql_queries
+        self.results = results
+
+    async def test_analyze_matches_sync(self):
+        """
+        Tests that the facade returns the results of perform_full_analysis, on threads and processes.
+        """
+        with ThreadPoolExecutor(2) as executor:
+            async with AsyncAnalyzer(executor=executor) as analyzer:
+                self.assertEqual(await analyzer.analyze(self.queries[0]), self.results[0])
+        async with AsyncAnalyzer(workers=2) as analyzer:
+            batch = await analyzer.analyze_batch(self.queries)
+        self.assertEqual([item.result for item in batch], self.results)
+
+    async def test_invalid_query(self):
+        """
+        Tests that invalid queries raise ValueError and are reported per query in batches.
+        """
+        async with AsyncAnalyzer(executor=ThreadPoolExecutor(1)) as analyzer:
+            with self.assertRaises(ValueError):
+                await analyzer.analyze(1908)
+            batch = await analyzer.analyze_batch([self.queries[0], 1908])
+        self.assertIsNone(batch[0].error)
+        self.assertTrue(batch[1].error.startswith("ValueError"))
+
+    async def test_in_flight_limit(self):
+        """
+        Tests that no more than max_in_flight analyses are submitted at a time.
+        """
+        peak = 0
+        async with AsyncAnalyzer(executor=ThreadPoolExecutor(4), max_in_flight=2) as analyzer:
+            async def watch():
+                nonlocal peak
+                while True:
+                    peak = max(peak, analyzer.in_flight)
+                    await asyncio.sleep(0)
+
+            watcher = asyncio.create_task(watch())
+            await analyzer.analyze_batch(self.queries * 3)
+            watcher.cancel()
+            self.assertEqual(analyzer.in_flight, 0)
+        self.assertGreater(peak, 0)
+        self.assertLessEqual(peak, 2)
+
+    async def test_timeout_keeps_slot_until_done(self):
+        """
+        Tests that a timed-out analysis raises TimeoutError and keeps its slot until the
+        executor is done with it.
+        """
+        async with AsyncAnalyzer(executor=ThreadPoolExecutor(1), max_in_flight=1) as analyzer:
+            with self.assertRaises(asyncio.TimeoutError):
+                await analyzer.analyze(LARGE_QUERY, timeout=0.01)
+            self.assertEqual(analyzer.in_flight, 1)
+            self.assertEqual(await analyzer.analyze(self.queries[0], timeout=60), self.results[0])
+            self.assertEqual(analyzer.in_flight, 0)
+
+    async def test_cancel_pending_request(self):
+        """
+        Tests that cancelling a request waiting for a slot never runs it.
+        """
+        async with AsyncAnalyzer(executor=ThreadPoolExecutor(1), max_in_flight=1) as analyzer:
+            running = asyncio.create_task(analyzer.analyze(LARGE_QUERY))
+            waiting = asyncio.create_task(analyzer.analyze(self.queries[0]))
+            await asyncio.sleep(0.01)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            await running
+            self.assertEqual(analyzer.in_flight, 0)
+
+    async def test_event_loop_not_blocked(self):
+        """
+        Tests that the event loop keeps running while a large query is analyzed.
+        """
+        async with AsyncAnalyzer(workers=1) as analyzer:
+            await analyzer.analyze(self.queries[0])  # Start the worker process
+            gaps = []
+
+            async def heartbeat():
+                last = time.perf_counter()
+                while True:
+                    await asyncio.sleep(0.005)
+                    now = time.perf_counter()
+                    gaps.append(now - last)
+                    last = now
+
+            beats = asyncio.create_task(heartbeat())
+            await analyzer.analyze(LARGE_QUERY)
+            beats.cancel()
+        self.assertLess(max(gaps), 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+from pathlib import Path
+import os
+import sys
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.batch import (analyze_many, analyze_by_template)
+from sql_analyzer.raw_sql_analyzer import AnalysisBudget
+
+class WorkerKiller:
+    """
+    A query that ends the worker process unpickling it, which breaks the pool.
+    """
+
+    def __reduce__(self):
+        return (os._exit, (1,))
+
+class TestAnalyzeMany(unittest.TestCase):
+    """
+    The TestAnalyzeMany class contains unit tests for the analyze_many batch entry point.
+    """
+
+    def setUp(self):
+        """
+        Initializes the SQL queries and expected results used in the tests, with an invalid
+        query inserted in the middle of the batch.
+        """
+        self.queries = sql_queries[:5] + [1908] + sql_queries[5:]
+        self.results = results[:5] + [None] + results[5:]
+
+    def test_in_process_results_in_order(self):
+        """
+        Tests that a single worker analyzes the queries in the calling process, in input order.
+        """
+        batch = list(analyze_many(self.queries, workers=1))
+        self.assertEqual([item.index for item in batch], list(range(len(self.queries))))
+        self.assertEqual([item.result for item in batch], self.results)
+
+    def test_process_pool_results_in_order(self):
+        """
+        Tests that results from the process pool are yielded in input order.
+        """
+        batch = list(analyze_many(iter(self.queries), workers=2, chunksize=3))
+        self.assertEqual([item.index for item in batch], list(range(len(self.queries))))
+        self.assertEqual([item.result for item in batch], self.results)
+
+    def test_process_pool_completion_order(self):
+        """
+        Tests that unordered results cover every query exactly once.
+        """
+        batch = list(analyze_many(self.queries, workers=2, chunksize=2, ordered=False))
+        batch.sort(key=lambda item: item.index)
+        self.assertEqual([item.result for item in batch], self.results)
+
+    def test_failure_is_reported_per_query(self):
+        """
+        Tests that a query that cannot be analyzed yields an error without stopping the batch.
+        """
+        batch = list(analyze_many(self.queries, workers=2, chunksize=4))
+        failed = [item for item in batch if item.error is not None]
+        self.assertEqual([item.index for item in failed], [5])
+        self.assertIn('ValueError', failed[0].error)
+
+    def test_budget(self):
+        """
+        Tests that queries over budget are analyzed approximately in worker processes.
+        """
+        batch = list(analyze_many(self.queries, workers=2, chunksize=4, budget=AnalysisBudget(max_length=1)))
+        approximate = [item.result for item in batch if item.result is not None]
+        self.assertEqual(len(approximate), len(sql_queries))
+        self.assertTrue(all(result["approximate"] for result in approximate))
+        self.assertEqual([result["query_type"] for result in approximate],
+                         [result["query_type"] for result in results])
+
+    def test_analyze_by_template(self):
+        """
+        Tests that queries sharing a template are analyzed once and that every query gets
+        the result of its template, in process and on the process pool.
+        """
+        variants = [query.replace("1", "42") for query in sql_queries]
+        queries = self.queries + variants
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                batch = analyze_by_template(queries, workers=workers, chunksize=4)
+                self.assertEqual([item.index for item in batch.results], list(range(len(queries))))
+                self.assertEqual([item.result for item in batch.results[:len(self.queries)]], self.results)
+                self.assertIn('ValueError', batch.results[5].error)
+                self.assertEqual(sum(group.count for group in batch.groups), len(queries) - 1)
+                self.assertLess(len(batch.groups), len(queries) - 1)
+                for group in batch.groups:
+                    self.assertEqual([batch.results[member].result for member in group.members],
+                                     [group.result] * group.count)
+                self.assertEqual(max(batch.counts().values()), 2)
+
+    def test_broken_pool(self):
+        """
+        Tests that a worker dying breaks only the results of the chunks it affects, which
+        become per-query errors, including the chunks submitted after the pool broke.
+        """
+        queries = sql_queries[:2] + [WorkerKiller()] + sql_queries[2:6]
+        batch = list(analyze_many(queries, workers=2, chunksize=1, max_pending=1))
+        self.assertEqual([item.index for item in batch], list(range(len(queries))))
+        self.assertEqual([item.result for item in batch[:2]], results[:2])
+        self.assertTrue(all(item.result is None and "Broken" in item.error for item in batch[2:]))
+
+    def test_broken_pool_by_template(self):
+        """
+        Tests that a worker dying while normalizing turns the queries of the chunks it
+        affects into per-query errors, and that the other queries are still analyzed.
+        """
+        queries = sql_queries[:2] + [WorkerKiller()] + sql_queries[2:6]
+        batch = analyze_by_template(queries, workers=2, chunksize=1)
+        expected = results[:2] + [None] + results[2:6]
+        self.assertEqual([item.index for item in batch.results], list(range(len(queries))))
+        self.assertIn("Broken", batch.results[2].error)
+        broken = [item.index for item in batch.results if item.error is not None and "Broken" in item.error]
+        for item in batch.results:
+            if item.index not in broken:
+                self.assertEqual(item.result, expected[item.index])
+        self.assertEqual(sorted(member for group in batch.groups for member in group.members),
+                         [index for index in range(len(queries)) if index not in broken])
+
+    def test_invalid_arguments(self):
+        """
+        Tests that a non-positive number of workers, chunk size or pending chunks raises
+        a ValueError.
+        """
+        for arguments in ({"chunksize": 0}, {"workers": 0}, {"max_pending": 0}):
+            with self.subTest(**arguments), self.assertRaises(ValueError):
+                analyze_many(self.queries, **arguments)
+        with self.assertRaises(ValueError):
+            analyze_by_template(self.queries, workers=0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+import unittest
+from pathlib import Path
+import sys
+import pickle
+import tempfile
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.cache import (AnalysisCache, SQLiteAnalysisCache)
+from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer
+from sql_analyzer.batch import analyze_many
+from sql_analyzer.utils import (normalize_query, fingerprint_query)
+
+class TestAnalysisCache(unittest.TestCase):
+    """
+    The TestAnalysisCache class contains unit tests for query normalization and the
+    fingerprint-keyed AnalysisCache.
+    """
+
+    def setUp(self):
+        """
+        Initializes the SQL queries and expected results used in the tests.
+        """
+        self.queries = sql_queries
+        self.results = results
+
+    def test_normalize_query(self):
+        """
+        Tests that literals, comments, whitespace and keyword case are normalized away
+        while identifiers keep their spelling.
+        """
+        query = "select Col, 'x''y' -- note\n  from  Table1 /* c */ where id in (1, 2, 3) and b = :p"
+        self.assertEqual(normalize_query(query), "SELECT Col, ? FROM Table1 WHERE id IN (?) AND b = ?")
+
+    def test_fingerprint_shared_by_template(self):
+        """
+        Tests that queries of the same template share a fingerprint and different templates do not.
+        """
+        self.assertEqual(fingerprint_query("SELECT a FROM t WHERE id = 1"),
+                         fingerprint_query("select a\n from t where id = 42 -- later"))
+        self.assertNotEqual(fingerprint_query("SELECT a FROM t"), fingerprint_query("SELECT a FROM u"))
+
+    def test_analyze_matches_full_analysis(self):
+        """
+        Tests that cached and uncached lookups return the expected analysis results.
+        """
+        cache = AnalysisCache()
+        for _ in range(2):
+            for idx, query in enumerate(self.queries):
+                with self.subTest(query_number=idx+1, query=query):
+                    self.assertEqual(cache.analyze(query), self.results[idx])
+        self.assertEqual(cache.misses, len(self.queries))
+        self.assertEqual(cache.hits, len(self.queries))
+
+    def test_cached_result_is_copied(self):
+        """
+        Tests that mutating a returned result does not alter the cached entry.
+        """
+        cache = AnalysisCache()
+        cache.analyze(self.queries[0])['tables'].add('mutated')
+        self.assertEqual(cache.analyze(self.queries[0]), self.results[0])
+
+    def test_lru_eviction(self):
+        """
+        Tests that the least recently used entry is evicted once the cache is full.
+        """
+        cache = AnalysisCache(maxsize=2)
+        cache.analyze("SELECT a FROM t1")
+        cache.analyze("SELECT a FROM t2")
+        cache.analyze("SELECT a FROM t1")
+        cache.analyze("SELECT a FROM t3")
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.stats()['size'], 2)
+        cache.analyze("SELECT a FROM t1")
+        self.assertEqual(cache.hits, 2)
+        cache.analyze("SELECT a FROM t2")
+        self.assertEqual(cache.misses, 4)
+
+    def test_analyzer_hook_keys_by_template(self):
+        """
+        Tests that analyzers and batches given the cache share the results of a template,
+        and that analyses with other options are stored under other keys.
+        """
+        cache = AnalysisCache()
+        queries = [f"SELECT a FROM t WHERE id = {n} -- run {n}" for n in range(100)]
+        for query in queries:
+            RawSQLAnalyzer(query, cache=cache).perform_full_analysis()
+        self.assertEqual((cache.hits, cache.misses), (99, 1))
+        batch = list(analyze_many(queries, workers=1, cache=cache))
+        self.assertEqual(cache.hits, 199)
+        self.assertEqual(batch[0].result["tables"], {"t"})
+
+        query = "SELECT a FROM t WHERE b = 'orders'"
+        full = cache.analyze(query)
+        self.assertEqual(cache.analyze(query, include=["analyze_get_tables"]), {"tables": full["tables"]})
+        cache.analyze(query, table_extraction="regex")
+        self.assertEqual(len(cache), 4)
+        self.assertEqual(cache.hits, 199)
+
+    def test_invalid_maxsize(self):
+        """
+        Tests that a non-positive maxsize raises a ValueError.
+        """
+        with self.assertRaises(ValueError):
+            AnalysisCache(maxsize=0)
+
+class TestSQLiteAnalysisCache(unittest.TestCase):
+    """
+    The TestSQLiteAnalysisCache class contains unit tests for the persistent SQLite cache.
+    """
+
+    def setUp(self):
+        """
+        Initializes the SQL queries, the expected results and a temporary cache file.
+        """
+        self.queries = sql_queries
+        self.results = results
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "analyses.sqlite"
+
+    def tearDown(self):
+        """
+        Removes the temporary cache file.
+        """
+        self.directory.cleanup()
+
+    def test_persists_across_instances(self):
+        """
+        Tests that a result stored by one cache instance is returned by another without parsing.
+        """
+        with SQLiteAnalysisCache(self.path) as cache:
+            for idx, query in enumerate(self.queries):
+                self.assertEqual(cache.analyze(query), self.results[idx])
+            self.assertEqual(cache.misses, len(self.queries))
+
+        with SQLiteAnalysisCache(self.path) as cache:
+            for idx, query in enumerate(self.queries):
+                with self.subTest(query_number=idx+1):
+                    analyzer = RawSQLAnalyzer(query, cache=cache)
+                    self.assertEqual(analyzer.perform_full_analysis(), self.results[idx])
+                    self.assertIsNone(analyzer._parsed_query)
+                    self.assertIsNone(analyzer._tokens)
+            self.assertEqual(cache.hits, len(self.queries))
+
+    def test_key_depends_on_configuration(self):
+        """
+        Tests that analyses with other analyzers or options are stored under other keys,
+        and that namespaces are isolated.
+        """
+        query = self.queries[0]
+        with SQLiteAnalysisCache(self.path) as cache:
+            full = RawSQLAnalyzer(query, cache=cache).perform_full_analysis()
+            partial = RawSQLAnalyzer(query, cache=cache).perform_full_analysis(include=["analyze_get_tables"])
+            self.assertEqual(partial, {"tables": full["tables"]})
+            RawSQLAnalyzer(query, cache=cache, table_extraction="regex").perform_full_analysis()
+            self.assertEqual(len(cache), 3)
+            self.assertEqual(cache.hits, 0)
+
+        with SQLiteAnalysisCache(self.path, namespace="other") as cache:
+            self.assertEqual(len(cache), 0)
+            self.assertIsNone(cache.get(RawSQLAnalyzer(query).cache_key(RawSQLAnalyzer.get_analyzers())))
+
+    def test_failed_analyses_not_cached(self):
+        """
+        Tests that analyses with errors are not stored.
+        """
+        with SQLiteAnalysisCache(self.path) as cache:
+            RawSQLAnalyzer("", cache=cache).perform_full_analysis()
+            self.assertEqual(len(cache), 0)
+
+    def test_unreadable_entry_is_a_miss(self):
+        """
+        Tests that a truncated or stale pickle is dropped and counted as a miss instead of
+        failing the analysis.
+        """
+        query = self.queries[0]
+        with SQLiteAnalysisCache(self.path) as cache:
+            cache.analyze(query)
+            blob = pickle.dumps(self.results[0])
+            # A truncated blob, and the pickle of a class whose module was renamed
+            for broken in (blob[:len(blob) // 2], b"cmissing_module\nResult\n."):
+                with self.subTest(blob=broken[:16]):
+                    cache._connect().execute("UPDATE analyses SET result = ?", (broken,))
+                    misses = cache.misses
+                    with self.assertLogs("sql_analyzer.cache", level="WARNING"):
+                        self.assertEqual(cache.analyze(query), self.results[0])
+                    self.assertEqual(cache.misses, misses + 1)
+                    self.assertEqual(len(cache), 1)
+
+    def test_size_based_eviction(self):
+        """
+        Tests that the least recently used entries are evicted once the file exceeds max_bytes.
+        """
+        with SQLiteAnalysisCache(self.path, max_bytes=64 * 1024) as cache:
+            cache._EVICTION_CHECK_INTERVAL = 1
+            for i in range(400):
+                cache.put(f"key{i}", {"tables": {f"table_{i}_{'x' * 200}"}})
+            stats = cache.stats()
+            self.assertGreater(stats["evictions"], 0)
+            self.assertLessEqual(stats["bytes"], 64 * 1024)
+            self.assertIsNone(cache.get("key0"))
+            self.assertIsNotNone(cache.get("key399"))
+
+    def test_eviction_with_worker_processes(self):
+        """
+        Tests that worker processes evict from the shared file although each task works on
+        its own copy of the cache, and that the counters of the caller are not updated.
+        """
+        queries = [f"SELECT a, b FROM t{n} JOIN u{n} ON t{n}.id = u{n}.id WHERE x = {n}" for n in range(600)]
+        with SQLiteAnalysisCache(self.path, max_bytes=40000) as cache:
+            for item in analyze_many(queries, workers=2, chunksize=8, cache=cache):
+                self.assertIsNone(item.error)
+            stats = cache.stats()
+            self.assertLess(stats["size"], len(queries))
+            self.assertLess(stats["bytes"], 2 * 40000)
+            self.assertEqual((stats["hits"], stats["misses"]), (0, 0))
+
+    def test_shared_by_worker_processes(self):
+        """
+        Tests that worker processes write to the same cache concurrently and that a second
+        run is answered entirely from the cache.
+        """
+        queries = self.queries * 4
+        with SQLiteAnalysisCache(self.path) as cache:
+            first = [item.result for item in analyze_many(queries, workers=2, chunksize=3, cache=cache)]
+            self.assertEqual(first, self.results * 4)
+            self.assertEqual(len(cache), len(set(self.queries)))
+
+            hits_before = cache.hits
+            second = [item.result for item in analyze_many(queries, workers=1, cache=cache)]
+            self.assertEqual(second, self.results * 4)
+            self.assertEqual(cache.hits - hits_before, len(queries))
+
+
+if __name__ == '__main__':
+    unittest.main()
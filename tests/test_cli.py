@@ -0,0 +1,149 @@
+import unittest
+from pathlib import Path
+import contextlib
+import csv
+import io
+import json
+import sys
+import tempfile
+from unittest import mock
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.cli import (iter_sources, main)
+
+class TestCommandLine(unittest.TestCase):
+    """
+    The TestCommandLine class contains unit tests for the python -m sql_analyzer entry point.
+    """
+
+    def setUp(self):
+        """
+        Writes the test queries to a directory tree: a script per query in nested
+        directories, a JSONL log and a file that is not SQL.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        for idx, query in enumerate(sql_queries):
+            folder = self.root / f"group{idx % 3}"
+            folder.mkdir(exist_ok=True)
+            (folder / f"query{idx:02}.sql").write_text(query.rstrip().rstrip(";") + ";\n")
+        (self.root / "notes.txt").write_text("SELECT 1")
+        self.log = self.root / "log.jsonl"
+        self.log.write_text("".join(json.dumps({"query": query}) + "\n" for query in sql_queries[:3]))
+        self.output = self.root / "out"
+
+    def tearDown(self):
+        """
+        Removes the temporary directory tree.
+        """
+        self.directory.cleanup()
+
+    def expected(self):
+        """
+        Returns the expected results of the scripts in the walk order of the directory.
+        """
+        order = sorted(range(len(sql_queries)), key=lambda idx: (idx % 3, idx))
+        return [json.loads(json.dumps(results[idx], default=sorted)) for idx in order]
+
+    def test_iter_sources(self):
+        """
+        Tests that directories are walked for .sql files in sorted order and globs are expanded.
+        """
+        files = list(iter_sources([str(self.root)]))
+        self.assertEqual(len(files), len(sql_queries))
+        self.assertTrue(all(name.endswith(".sql") for name in files))
+        self.assertEqual(files, sorted(files))
+        self.assertEqual(list(iter_sources([str(self.root / "**" / "query01.sql")])),
+                         [str(self.root / "group1" / "query01.sql")])
+        with self.assertRaises(FileNotFoundError):
+            list(iter_sources([str(self.root / "missing.sql")]))
+
+    def test_ndjson_output(self):
+        """
+        Tests that one NDJSON record per statement is written, in order, in process and on a pool.
+        """
+        for workers in ("1", "2"):
+            with self.subTest(workers=workers):
+                status = main([str(self.root), str(self.log), "-w", workers, "-o", str(self.output)])
+                self.assertEqual(status, 0)
+                records = [json.loads(line) for line in self.output.read_text().splitlines()]
+                self.assertEqual([record["result"] for record in records[:len(sql_queries)]], self.expected())
+                self.assertEqual([record["statement"] for record in records[len(sql_queries):]], [1, 2, 3])
+                self.assertEqual(records[-1]["source"], str(self.log))
+
+    def test_csv_and_analyzer_selection(self):
+        """
+        Tests the CSV output with a restricted set of analyzers.
+        """
+        status = main([str(self.log), "-w", "1", "-f", "csv", "-o", str(self.output),
+                       "--include", "analyze_get_tables", "--include", "analyze_get_statement_type"])
+        self.assertEqual(status, 0)
+        with open(self.output, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row["query_type"] for row in rows], [result["query_type"] for result in results[:3]])
+        self.assertEqual([row["functions"] for row in rows], [""] * 3)
+
+    def test_catalog(self):
+        """
+        Tests that --catalog adds the estimated cost of each statement to NDJSON and CSV output.
+        """
+        catalog = self.root / "catalog.json"
+        catalog.write_text(json.dumps({f"table{n}": {"rows": 1000, "bytes": 8000} for n in range(1, 7)}))
+        status = main([str(self.log), "-w", "1", "--catalog", str(catalog), "-o", str(self.output)])
+        self.assertEqual(status, 0)
+        records = [json.loads(line) for line in self.output.read_text().splitlines()]
+        self.assertEqual([record["cost"]["scan_bytes"] for record in records],
+                         [8000 * len(result["tables"]) for result in results[:3]])
+
+        status = main([str(self.log), "-w", "1", "--catalog", str(catalog), "-f", "csv", "-o", str(self.output)])
+        self.assertEqual(status, 0)
+        with open(self.output, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row["complexity"] for row in rows], [str(record["cost"]["complexity"]) for record in records])
+
+    def test_regex_only(self):
+        """
+        Tests that --regex-only writes the approximate analysis of every statement.
+        """
+        status = main([str(self.log), "--regex-only", "-o", str(self.output)])
+        self.assertEqual(status, 0)
+        records = [json.loads(line) for line in self.output.read_text().splitlines()]
+        self.assertEqual([record["result"]["query_type"] for record in records],
+                         [result["query_type"] for result in results[:3]])
+        self.assertTrue(all(record["result"]["approximate"] for record in records))
+
+    def test_stdin_log(self):
+        """
+        Tests that invalid JSONL lines on stdin are skipped and that statements are numbered by input line.
+        """
+        lines = [json.dumps({"query": "SELECT a FROM t"}), "not json", "", json.dumps({"query": "SELECT b FROM u"})]
+        with mock.patch("sys.stdin", io.StringIO("\n".join(lines) + "\n")), \
+                self.assertLogs("sql_analyzer.stream", level="WARNING"):
+            status = main(["-", "--input-format", "jsonl", "-w", "1", "-o", str(self.output)])
+        self.assertEqual(status, 0)
+        records = [json.loads(line) for line in self.output.read_text().splitlines()]
+        self.assertEqual([(record["source"], record["statement"]) for record in records], [("-", 1), ("-", 4)])
+        self.assertEqual([record["result"]["tables"] for record in records], [["t"], ["u"]])
+
+    def test_invalid_usage(self):
+        """
+        Tests that unknown analyzers, missing paths and invalid worker counts exit with status 2.
+        """
+        for argv in ([str(self.root), "--include", "analyze_unknown"],
+                     [str(self.root / "missing.sql")],
+                     [str(self.root), "--workers", "0"],
+                     [str(self.root), "--regex-only", "--exclude", "analyze_count_functions"],
+                     [str(self.root), "--catalog", str(self.root / "notes.txt")],
+                     [str(self.root), "--max-length", "0"]):
+            with self.subTest(argv=argv), contextlib.redirect_stderr(io.StringIO()):
+                with self.assertRaises(SystemExit) as context:
+                    main(argv)
+                self.assertEqual(context.exception.code, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from pathlib import Path
+import importlib.util
+import sys
+import tempfile
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.batch import analyze_many
+from sql_analyzer.raw_sql_analyzer import AnalysisBudget
+from sql_analyzer.columnar import (AnalysisResult, ResultBatch, MISSING)
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+class TestColumnar(unittest.TestCase):
+    """
+    The TestColumnar class contains unit tests for the compact AnalysisResult and the
+    columnar ResultBatch with its NumPy, Arrow and Parquet exports.
+    """
+
+    def setUp(self):
+        """
+        Initializes the SQL queries, the expected results and a batch holding their analyses
+        followed by a failed query.
+        """
+        self.queries = sql_queries
+        self.results = results
+        self.batch = ResultBatch.from_results(analyze_many(self.queries + [1908], workers=1))
+
+    def test_analysis_result_round_trip(self):
+        """
+        Tests that converting a result to AnalysisResult and back is lossless.
+        """
+        for idx, result in enumerate(self.results):
+            with self.subTest(query_number=idx+1):
+                self.assertEqual(AnalysisResult.from_dict(result).to_dict(), result)
+        partial = {"tables": set(), "has_limit": True}
+        self.assertEqual(AnalysisResult.from_dict(partial).to_dict(), partial)
+        approximate = {"query_type": "SELECT", "tables": {"t"}, "joins": 0, "approximate": True}
+        self.assertTrue(AnalysisResult.from_dict(approximate).approximate)
+        self.assertEqual(AnalysisResult.from_dict(approximate).to_dict(), approximate)
+
+    def test_analysis_result_slots(self):
+        """
+        Tests that AnalysisResult has no per-instance dictionary.
+        """
+        self.assertFalse(hasattr(AnalysisResult(), "__dict__"))
+
+    def test_batch_decodes_results(self):
+        """
+        Tests that every stored result decodes to the original analysis and failures are flagged.
+        """
+        self.assertEqual(len(self.batch), len(self.queries) + 1)
+        for idx, result in enumerate(self.results):
+            with self.subTest(query_number=idx+1):
+                self.assertEqual(self.batch[idx].to_dict(), result)
+        failed = self.batch[-1]
+        self.assertIsNone(failed.tables)
+        self.assertEqual(failed.functions, MISSING)
+        self.assertEqual(len(self.batch.table_names), len(set().union(*(r["tables"] for r in self.results))))
+
+    def test_approximate_results(self):
+        """
+        Tests that approximate results are flagged in the batch and in its exports.
+        """
+        budget = AnalysisBudget(max_length=60)
+        batch = ResultBatch.from_results(analyze_many(self.queries, workers=1, budget=budget))
+        expected = [len(query) > 60 for query in self.queries]
+        self.assertTrue(any(expected) and not all(expected))
+        self.assertEqual([result.approximate for result in batch], expected)
+        self.assertEqual([result.to_dict().get("approximate", False) for result in batch], expected)
+        if HAS_NUMPY:
+            self.assertEqual(batch.to_numpy()["approximate"].tolist(), expected)
+        if HAS_PYARROW:
+            self.assertEqual(batch.to_arrow().column("approximate").to_pylist(), expected)
+
+    @unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+    def test_to_numpy(self):
+        """
+        Tests that the NumPy export shares memory with the batch.
+        """
+        import numpy as np
+
+        arrays = self.batch.to_numpy()
+        self.assertEqual(arrays["joins"].tolist(), [r["joins"] for r in self.results] + [MISSING])
+        self.assertEqual(arrays["failed"].tolist(), [False] * len(self.results) + [True])
+        self.assertFalse(arrays["joins"].flags.owndata)
+        first_tables = arrays["table_ids"][arrays["table_offsets"][0]:arrays["table_offsets"][1]]
+        self.assertEqual(set(arrays["table_names"][first_tables]), self.results[0]["tables"])
+        self.assertTrue(np.all(arrays["query_types"][arrays["query_type"][:-1]] ==
+                               [r["query_type"] for r in self.results]))
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_to_arrow_and_parquet(self):
+        """
+        Tests that the Arrow export and the Parquet file hold the same rows as the batch.
+        """
+        import pyarrow.parquet as pq
+
+        record_batch = self.batch.to_arrow()
+        rows = record_batch.to_pylist()
+        for idx, result in enumerate(self.results):
+            with self.subTest(query_number=idx+1):
+                self.assertEqual(rows[idx]["query_type"], result["query_type"])
+                self.assertEqual(set(rows[idx]["tables"]), result["tables"])
+                self.assertEqual((rows[idx]["subqueries"], rows[idx]["max_depth"]), result["subqueries_and_maxdepth"])
+        self.assertTrue(rows[-1]["failed"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "results.parquet"
+            self.batch.write_parquet(path)
+            self.assertEqual(pq.read_table(path).to_pylist(), rows)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from pathlib import Path
+import json
+import math
+import sys
+import tempfile
+import time
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.cost import (CostEstimate, CostModel, TableCatalog, TableStats)
+
+class TestCostModel(unittest.TestCase):
+    """
+    The TestCostModel class contains unit tests for the offline cost model and its table catalog.
+    """
+
+    def setUp(self):
+        """
+        Builds a catalog giving tableN 10**N rows of 100 bytes.
+        """
+        self.catalog = TableCatalog({f"table{n}": TableStats(10 ** n, 100 * 10 ** n) for n in range(1, 7)})
+        self.model = CostModel(self.catalog)
+
+    def test_catalog_files(self):
+        """
+        Tests that JSON and CSV catalogs are loaded, matched case-insensitively and by
+        unqualified name, and that invalid ones are rejected.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "stats.json").write_text(json.dumps({"Orders": {"rows": 1000, "bytes": 64000}}))
+            (root / "stats.csv").write_text("table,rows,bytes\nsales.customers,50,3200\n")
+            (root / "bad.json").write_text(json.dumps({"orders": {"rows": -1, "bytes": 0}}))
+            (root / "bad.csv").write_text("name,rows\norders,1\n")
+
+            catalog = TableCatalog.load(root / "stats.json")
+            self.assertEqual(catalog.get("ORDERS"), TableStats(1000, 64000))
+            self.assertEqual(catalog.get("shop.orders"), TableStats(1000, 64000))
+            self.assertIsNone(catalog.get("customers"))
+            self.assertIn("sales.customers", TableCatalog.load(root / "stats.csv"))
+            for name in ("bad.json", "bad.csv"):
+                with self.subTest(name=name), self.assertRaises(ValueError):
+                    TableCatalog.load(root / name)
+
+    def test_estimate(self):
+        """
+        Tests the scan size, rows, complexity and flags estimated for the test queries.
+        """
+        for query_number, (query, result) in enumerate(zip(sql_queries, results)):
+            with self.subTest(query_number=query_number):
+                estimate = self.model.estimate(result)
+                known = [self.catalog.get(table) for table in result["tables"] if table in self.catalog]
+                self.assertEqual(estimate.scan_rows, sum(stats.rows for stats in known))
+                self.assertEqual(estimate.scan_bytes, sum(stats.bytes for stats in known))
+                self.assertEqual(len(estimate.unknown_tables), len(result["tables"]) - len(known))
+                self.assertEqual(estimate.full_scan, bool(result["tables"]) and result["where"] == 0)
+
+        # SELECT over table1 .. table6, with a WHERE clause, 1 JOIN and subqueries nested 2 deep
+        result = {"tables": {f"table{n}" for n in range(1, 7)}, "where": 1, "joins": 1,
+                  "subqueries_and_maxdepth": (3, 2)}
+        rows = sum(10 ** n for n in range(1, 7))
+        self.assertEqual(self.model.estimate(result),
+                         CostEstimate(100 * rows, rows, round(math.log10(1 + rows * 0.1) * 2 * 3, 3), False))
+        unfiltered = self.model.estimate(dict(result, where=0))
+        self.assertTrue(unfiltered.full_scan)
+        self.assertGreater(unfiltered.complexity, self.model.estimate(result).complexity)
+        self.assertEqual(self.model.estimate({"query_type": "UNKNOWN"}), CostEstimate(0, 0, 0.0, False))
+
+    def test_thresholds(self):
+        """
+        Tests that is_expensive applies the scan and complexity thresholds, and that the
+        default statistics are used for unknown tables.
+        """
+        model = CostModel(self.catalog, default_stats=TableStats(10, 1 << 30), max_scan_bytes=1 << 30,
+                          max_complexity=10)
+        small = model.estimate({"tables": {"table1"}, "where": 1})
+        self.assertFalse(model.is_expensive(small))
+        unknown = model.estimate({"tables": {"table1", "logs"}, "where": 1})
+        self.assertEqual(unknown.unknown_tables, ("logs",))
+        self.assertTrue(model.is_expensive(unknown))
+        self.assertTrue(model.is_expensive(model.estimate({"tables": {"table1"}, "joins": 3,
+                                                           "subqueries_and_maxdepth": (2, 2)})))
+        with self.assertRaises(ValueError):
+            CostModel(self.catalog, where_selectivity=0)
+
+    def test_speed(self):
+        """
+        Tests that estimating costs is cheap enough to run inline in a batch.
+        """
+        start = time.perf_counter()
+        for _ in range(1000):
+            for result in results:
+                self.model.estimate(result)
+        self.assertLess((time.perf_counter() - start) / (1000 * len(results)), 1e-4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from pathlib import Path
+import sys
+import tempfile
+import time
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.batch import QueryResult
+from sql_analyzer.index import QueryIndex
+
+class TestQueryIndex(unittest.TestCase):
+    """
+    The TestQueryIndex class contains unit tests for the inverted index over analysis results.
+    """
+
+    def setUp(self):
+        """
+        Indexes the expected results of the test queries under their positions.
+        """
+        self.index = QueryIndex().add_results(results)
+
+    def scan(self, condition):
+        """
+        Returns the positions of the results matching a condition, by a full scan.
+        """
+        return [idx for idx, result in enumerate(results) if condition(result)]
+
+    def test_lookups_match_a_full_scan(self):
+        """
+        Tests that table, statement type and metric range lookups agree with a scan.
+        """
+        self.assertEqual(len(self.index), len(sql_queries))
+        for table in {table for result in results for table in result["tables"]}:
+            with self.subTest(table=table):
+                self.assertEqual(self.index.with_table(table.upper()),
+                                 self.scan(lambda result: table in result["tables"]))
+        self.assertEqual(self.index.with_query_type("select"),
+                         self.scan(lambda result: result["query_type"] == "SELECT"))
+        self.assertEqual(self.index.with_metric("max_depth", minimum=2),
+                         self.scan(lambda result: result["subqueries_and_maxdepth"][1] >= 2))
+        self.assertEqual(self.index.with_metric("joins", 1, 2),
+                         self.scan(lambda result: 1 <= result["joins"] <= 2))
+        with self.assertRaises(ValueError):
+            self.index.with_metric("tables")
+
+    def test_find_intersects_conditions(self):
+        """
+        Tests that find returns the queries matching every condition, and all queries without any.
+        """
+        joined = [(idx, sorted(result["tables"])) for idx, result in enumerate(results)
+                  if result["joins"] > 0 and len(result["tables"]) >= 2]
+        idx, (left, right, *_) = joined[0]
+        self.assertIn(idx, self.index.find(tables=[right, left]))
+        self.assertEqual(self.index.find(tables=[left, right], ranges={"joins": (1, None)}),
+                         self.scan(lambda result: result["joins"] > 0
+                                   and {left, right} <= {table.lower() for table in result["tables"]}))
+        self.assertEqual(self.index.find(), list(range(len(results))))
+        self.assertEqual(self.index.find(tables=["no_such_table"]), [])
+
+    def test_postings_sorted_and_distinct(self):
+        """
+        Tests that ids added out of order or twice, and shards with overlapping ids, keep
+        every posting list sorted and free of duplicates.
+        """
+        index = QueryIndex()
+        for query_id in (5, 1, 3, 1, 5):
+            index.add({"query_type": "SELECT", "tables": {"t", "T"}, "joins": 0}, query_id)
+        other = QueryIndex()
+        for query_id in (4, 3, 8):
+            other.add({"query_type": "SELECT", "tables": {"t"}, "joins": 1}, query_id)
+        index.merge(other)
+        self.assertEqual(index.with_table("t"), [1, 3, 4, 5, 8])
+        self.assertEqual(index.with_metric("joins"), [1, 3, 4, 5, 8])
+        self.assertEqual(index.find(tables=["t"], query_type="SELECT", ranges={"joins": (1, None)}), [3, 4, 8])
+        self.assertEqual(index.find(), [1, 3, 4, 5, 8])
+
+    def test_persistence_and_appends(self):
+        """
+        Tests that a saved index loads with the same postings and keeps growing after loading.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "corpus.idx"
+            QueryIndex().add_results(results[:5]).save(path)
+            index = QueryIndex.load(path)
+            index.add_results([QueryResult(idx, result, None) for idx, result in enumerate(results) if idx >= 5])
+            index.add_results([QueryResult(len(results), None, "ValueError")])
+            index.save(path)
+            index = QueryIndex.load(path)
+        self.assertEqual(index.failures, 1)
+        self.assertEqual(index.tables(), self.index.tables())
+        self.assertEqual(index.find(query_type="SELECT"), self.index.find(query_type="SELECT"))
+        self.assertEqual(index.add({"query_type": "SELECT"}), len(results) + 1)
+
+    def test_merge(self):
+        """
+        Tests that merging the indexes of two shards gives the index of the whole corpus.
+        """
+        merged = QueryIndex().add_results(results[:7])
+        merged.merge(QueryIndex().add_results(QueryResult(idx, result, None)
+                                              for idx, result in enumerate(results) if idx >= 7))
+        for metric in ("functions", "where", "subqueries"):
+            self.assertEqual(merged.with_metric(metric, 1), self.index.with_metric(metric, 1))
+        self.assertEqual(merged.tables(), self.index.tables())
+
+    def test_lookup_speed(self):
+        """
+        Tests that lookups over 200k indexed queries take milliseconds.
+        """
+        index = QueryIndex()
+        for idx in range(200000):
+            index.add({"query_type": "SELECT", "tables": {f"t{idx % 1000}", f"u{idx % 7}"},
+                       "joins": 1, "subqueries_and_maxdepth": (idx % 3, idx % 3)})
+        start = time.perf_counter()
+        found = index.find(tables=["t1", "u1"], ranges={"max_depth": (2, None)})
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertTrue(found and all(idx % 1000 == 1 and idx % 7 == 1 and idx % 3 == 2 for idx in found))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+from pathlib import Path
+import pickle
+import sys
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer
+from sql_analyzer.backends import TokenOnlyBackend
+from sql_analyzer.batch import analyze_many
+from sql_analyzer.instrumentation import (AnalysisMetrics, CallbackSink, MetricsAggregator, QUERY_PREFIX_LENGTH)
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    The TestInstrumentation class contains unit tests for the metrics reported by
+    perform_full_analysis and their aggregation across a batch.
+    """
+
+    def setUp(self):
+        """
+        Initializes the SQL queries and expected results used in the tests.
+        """
+        self.queries = sql_queries
+        self.results = results
+
+    def test_results_unchanged_with_sink(self):
+        """
+        Tests that instrumentation does not change the analysis results.
+        """
+        recorded = []
+        sink = CallbackSink(recorded.append)
+        for idx, query in enumerate(self.queries):
+            with self.subTest(query_index=idx):
+                self.assertEqual(RawSQLAnalyzer(query, metrics_sink=sink).perform_full_analysis(),
+                                 self.results[idx])
+        self.assertEqual(len(recorded), len(self.queries))
+
+    def test_stages_and_counters(self):
+        """
+        Tests that the parse, the single pass and the token analyzers are timed separately
+        and that the sizes of the query are counted.
+        """
+        recorded = []
+        query = "SELECT COUNT(a) FROM t1 JOIN t2 ON t1.id = t2.id WHERE a IN (SELECT b FROM t3)"
+        RawSQLAnalyzer(query, metrics_sink=CallbackSink(recorded.append)).perform_full_analysis()
+
+        metrics = recorded[0]
+        self.assertEqual(set(metrics.stage_seconds),
+                         {"parse", "single_pass", "analyze_get_statement_type", "analyze_get_tables"})
+        self.assertGreaterEqual(metrics.total_seconds, sum(metrics.stage_seconds.values()))
+        self.assertEqual(metrics.counters["query_length"], len(query))
+        self.assertEqual(metrics.counters["errors"], 0)
+        self.assertEqual(metrics.counters["tokens"], len(list(RawSQLAnalyzer(query).parsed_query.flatten())))
+        self.assertGreater(metrics.counters["tree_nodes"], metrics.counters["tokens"])
+
+    def test_token_only_backend_counters(self):
+        """
+        Tests that without a parse tree the tokens are still counted and no tree is built for it.
+        """
+        recorded = []
+        analyzer = RawSQLAnalyzer("SELECT a FROM t", backend=TokenOnlyBackend(),
+                                  metrics_sink=CallbackSink(recorded.append))
+        analyzer.perform_full_analysis()
+        self.assertIsNone(analyzer._parsed_query)
+        self.assertEqual(recorded[0].counters["tokens"], 7)
+        self.assertNotIn("tree_nodes", recorded[0].counters)
+        self.assertNotIn("parse", recorded[0].stage_seconds)
+
+    def test_errors_counted(self):
+        """
+        Tests that failing stages are counted as errors.
+        """
+        recorded = []
+        RawSQLAnalyzer("", metrics_sink=CallbackSink(recorded.append)).perform_full_analysis()
+        self.assertGreater(recorded[0].counters["errors"], 0)
+
+    def test_class_level_sink(self):
+        """
+        Tests that a sink set on the class instruments every analyzer, including the
+        per-statement analyzers of a script.
+        """
+        recorded = []
+
+        class InstrumentedAnalyzer(RawSQLAnalyzer):
+            metrics_sink = CallbackSink(recorded.append)
+
+        InstrumentedAnalyzer("SELECT a FROM t1; SELECT b FROM t2").perform_script_analysis()
+        self.assertEqual([m.query for m in recorded], ["SELECT a FROM t1; ", "SELECT b FROM t2"])
+
+    def test_aggregator_report(self):
+        """
+        Tests that the aggregator sums stages and counters and keeps the slowest queries.
+        """
+        aggregator = MetricsAggregator(top_n=2)
+        for label, seconds in enumerate([0.3, 0.1, 0.5]):
+            metrics = AnalysisMetrics(f"SELECT {label}", label)
+            metrics.total_seconds = seconds
+            metrics.stage_seconds = {"parse": seconds / 2, "single_pass": seconds / 4}
+            metrics.counters = {"tokens": 10}
+            aggregator.record(metrics)
+
+        report = aggregator.report()
+        self.assertEqual(report["queries"], 3)
+        self.assertAlmostEqual(report["total_seconds"], 0.9)
+        self.assertEqual(list(report["stages"]), ["parse", "single_pass"])
+        self.assertEqual(report["stages"]["parse"]["calls"], 3)
+        self.assertAlmostEqual(report["stages"]["parse"]["max_ms"], 250.0)
+        self.assertEqual(report["counters"], {"tokens": 30})
+        self.assertEqual([entry["label"] for entry in report["slowest_queries"]], [2, 0])
+        self.assertEqual(report["slowest_queries"][0]["slowest_stage"], "parse")
+        self.assertIn("slowest queries:", aggregator.format_report())
+
+    def test_aggregator_merge(self):
+        """
+        Tests that merging aggregators gives the same report as recording into one.
+        """
+        single, first, second = MetricsAggregator(), MetricsAggregator(), MetricsAggregator()
+        for label in range(6):
+            metrics = AnalysisMetrics("SELECT 1", label)
+            metrics.total_seconds = label / 10
+            metrics.stage_seconds = {"parse": label / 20}
+            single.record(metrics)
+            (first if label % 2 else second).record(metrics)
+        first.merge(second)
+        self.assertEqual(first.report(), single.report())
+
+    def test_batch_metrics(self):
+        """
+        Tests that batches attach labelled metrics to their results, also from worker processes.
+        """
+        queries = list(self.queries)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                aggregator = MetricsAggregator()
+                for item in analyze_many(queries, workers=workers, chunksize=2, collect_metrics=True):
+                    self.assertEqual(item.metrics.label, item.index)
+                    aggregator.record(item.metrics)
+                self.assertEqual(aggregator.report()["queries"], len(queries))
+        self.assertIsNone(next(analyze_many(queries, workers=1)).metrics)
+
+    def test_query_prefix(self):
+        """
+        Tests that metrics keep only the beginning of long queries, and that the slowest
+        queries are summarized from it when the report is built.
+        """
+        query = "SELECT " + ", ".join(f"column_{n}" for n in range(10000)) + " FROM t"
+        recorded = []
+        RawSQLAnalyzer(query, metrics_sink=CallbackSink(recorded.append)).perform_full_analysis()
+        self.assertEqual(recorded[0].query, query[:QUERY_PREFIX_LENGTH])
+        self.assertEqual(recorded[0].counters["query_length"], len(query))
+        aggregator = MetricsAggregator()
+        aggregator.record(recorded[0])
+        self.assertEqual(aggregator.report()["slowest_queries"][0]["query"], query[:QUERY_PREFIX_LENGTH])
+
+    def test_metrics_pickle(self):
+        """
+        Tests that metrics survive the round trip from a worker process.
+        """
+        metrics = AnalysisMetrics("SELECT 1", 3)
+        metrics.stage_seconds["parse"] = 0.5
+        restored = pickle.loads(pickle.dumps(metrics))
+        self.assertEqual((restored.label, restored.stage_seconds), (3, {"parse": 0.5}))
+
+
+if __name__ == '__main__':
+    unittest.main()
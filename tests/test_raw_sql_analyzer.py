@@ -65,7 +65,8 @@ from results import results
 path_to_append: Path = Path.cwd().resolve().parent
 sys.path.append(str(path_to_append))
 
-from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer
+from sql_analyzer.raw_sql_analyzer import (RawSQLAnalyzer, AnalysisBudget, REQUIRES_TOKENS)
+from sql_analyzer.backends import TokenOnlyBackend
 
 class TestRawSQLAnalyzer(unittest.TestCase):
     """
@@ -93,6 +94,242 @@ class TestRawSQLAnalyzer(unittest.TestCase):
                 results = analyzer.perform_full_analysis()
                 self.assertEqual(results, self.results[idx])
 
+    def test_single_pass_matches_individual_analyzers(self):
+        """
+        Tests that the single-pass traversal used by 'perform_full_analysis' produces the same
+        results as running each tree-based analyze_* method on its own.
+        """
+        for idx, query in enumerate(self.queries):
+            with self.subTest(query_number=idx+1, query=query):
+                analyzer = RawSQLAnalyzer(query)
+                expected = {
+                    'functions': analyzer.analyze_count_functions(),
+                    'where': analyzer.analyze_count_where(),
+                    'joins': analyzer.analyze_count_joins(),
+                    'subqueries_and_maxdepth': analyzer.analyze_count_subqueries_and_depth(),
+                }
+                fused = RawSQLAnalyzer(query)
+                fused._analyze_single_pass()
+                self.assertEqual(fused._extracted_data, expected)
+
+    def test_parsed_query_only_first_statement(self):
+        """
+        Tests that 'parsed_query' returns the first statement of a multi-statement query.
+        """
+        analyzer = RawSQLAnalyzer(self.queries[0] + ';' + self.queries[4])
+        self.assertEqual(analyzer.parsed_query.get_type(), 'SELECT')
+        self.assertEqual(str(analyzer.parsed_query), self.queries[0] + ';')
+
+    def test_perform_script_analysis(self):
+        """
+        Tests that every statement of a script is analyzed and merged into a summary.
+        """
+        script = '\n;\n'.join(query.strip().rstrip(';') for query in self.queries) + '\n; -- end of script\n'
+        analysis = RawSQLAnalyzer(script).perform_script_analysis()
+        self.assertEqual(len(analysis['statements']), len(self.queries))
+        for idx, result in enumerate(analysis['statements']):
+            with self.subTest(query_number=idx+1):
+                self.assertEqual(result, self.results[idx])
+
+        summary = analysis['summary']
+        self.assertEqual(summary['statements'], len(self.queries))
+        self.assertEqual(summary['query_types'], {'SELECT': 8, 'INSERT': 2, 'UPDATE': 3, 'DELETE': 2})
+        self.assertEqual(summary['joins'], sum(result['joins'] for result in self.results))
+        self.assertEqual(summary['subqueries_and_maxdepth'],
+                         (sum(result['subqueries_and_maxdepth'][0] for result in self.results), 3))
+        self.assertEqual(summary['tables'], set().union(*(result['tables'] for result in self.results)))
+
+    def test_perform_full_analysis_invalid_query(self):
+        """
+        Tests that 'perform_full_analysis' reports the analyzers that fail on an empty query
+        and keeps the results that could be computed.
+        """
+        analyzer = RawSQLAnalyzer(self.invalid_query)
+        self.assertEqual(analyzer.perform_full_analysis(), {})
+        analyzer = RawSQLAnalyzer(self.invalid_query, table_extraction='regex')
+        self.assertEqual(analyzer.perform_full_analysis(), {'tables': set()})
+
+    def test_token_analyzers_do_not_build_tree(self):
+        """
+        Tests that the statement type and join count are computed from the token stream
+        without building the parse tree, and match the results of the full analysis.
+        """
+        for idx, query in enumerate(self.queries):
+            with self.subTest(query_number=idx+1, query=query):
+                analyzer = RawSQLAnalyzer(query)
+                self.assertEqual(analyzer.analyze_get_statement_type(), self.results[idx]['query_type'])
+                self.assertEqual(analyzer.analyze_count_joins(), self.results[idx]['joins'])
+                self.assertIsNone(analyzer._parsed_query)
+
+    def test_statement_type_matches_parse_tree(self):
+        """
+        Tests that the token-based statement type agrees with sqlparse's Statement.get_type.
+        """
+        queries = self.queries + [
+            "WITH a AS (SELECT 1), b (x) AS (SELECT 2) SELECT * FROM a, b",
+            "with recursive t(n) as (select 1 union all select n + 1 from t) insert into u select n from t",
+            "-- comment\n/* block */ DELETE FROM t",
+            "(SELECT 1) UNION (SELECT 2)",
+            "CREATE TABLE t (id INT)",
+            "WITH SELECT 1",
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                analyzer = RawSQLAnalyzer(query)
+                self.assertEqual(analyzer.analyze_get_statement_type(), analyzer.parsed_query.get_type())
+
+    def test_token_only_backend(self):
+        """
+        Tests that the token-only backend skips the analyzers that need a parse tree.
+        """
+        for idx, query in enumerate(self.queries):
+            with self.subTest(query_number=idx+1, query=query):
+                analyzer = RawSQLAnalyzer(query, backend=TokenOnlyBackend())
+                expected = {key: self.results[idx][key] for key in ('joins', 'query_type', 'tables')}
+                self.assertEqual(analyzer.perform_full_analysis(), expected)
+                with self.assertRaises(NotImplementedError):
+                    analyzer.analyze_count_functions()
+
+    def test_table_extraction_modes(self):
+        """
+        Tests that the token-based and regex table extractors agree on the test queries,
+        and that only the token-based one ignores string literals and comments.
+        """
+        for idx, query in enumerate(self.queries):
+            with self.subTest(query_number=idx+1, query=query):
+                self.assertEqual(RawSQLAnalyzer(query, table_extraction='regex').analyze_get_tables(),
+                                 self.results[idx]['tables'])
+
+        query = "SELECT 'from x' FROM a t1, b -- join y\nJOIN c ON t1.id = c.id"
+        self.assertEqual(RawSQLAnalyzer(query).analyze_get_tables(), {'a', 'b', 'c'})
+        with self.assertRaises(ValueError):
+            RawSQLAnalyzer(query, table_extraction='unknown')
+
+    def test_include_exclude(self):
+        """
+        Tests that include and exclude restrict the analysis to the selected analyzers, and
+        that selecting only token-based analyzers does not build the parse tree.
+        """
+        query = self.queries[0]
+        expected = self.results[0]
+
+        analyzer = RawSQLAnalyzer(query)
+        result = analyzer.perform_full_analysis(include=["analyze_get_tables", "analyze_get_statement_type"])
+        self.assertEqual(result, {"tables": expected["tables"], "query_type": expected["query_type"]})
+        self.assertIsNone(analyzer._parsed_query)
+
+        result = RawSQLAnalyzer(query).perform_full_analysis(exclude="analyze_count_subqueries_and_depth")
+        expected_subset = dict(expected)
+        del expected_subset["subqueries_and_maxdepth"]
+        self.assertEqual(result, expected_subset)
+
+        with self.assertRaises(ValueError):
+            RawSQLAnalyzer(query).perform_full_analysis(include=["analyze_unknown"])
+
+    def test_register_analyzer(self):
+        """
+        Tests that registered analyzers run without subclassing, are inherited by subclasses
+        and can be unregistered.
+        """
+        @RawSQLAnalyzer.register_analyzer("has_limit", requires=REQUIRES_TOKENS)
+        def has_limit(analyzer):
+            return any(token.normalized == "LIMIT" for token in analyzer.tokens)
+
+        class SubAnalyzer(RawSQLAnalyzer):
+            pass
+
+        try:
+            self.assertIn("has_limit", SubAnalyzer.get_analyzers())
+            result = RawSQLAnalyzer("SELECT a FROM t LIMIT 5").perform_full_analysis()
+            self.assertTrue(result["has_limit"])
+            self.assertEqual(RawSQLAnalyzer("SELECT a FROM t").perform_full_analysis(include="has_limit"),
+                             {"has_limit": False})
+            with self.assertRaises(ValueError):
+                RawSQLAnalyzer.register_analyzer("analyze_get_tables", has_limit)
+        finally:
+            RawSQLAnalyzer.unregister_analyzer("has_limit")
+        self.assertNotIn("has_limit", RawSQLAnalyzer.get_analyzers())
+        self.assertNotIn("has_limit", SubAnalyzer.get_analyzers())
+
+    def test_registry_computed_once(self):
+        """
+        Tests that the registry is cached per class and reflects subclass overrides.
+        """
+        class CustomAnalyzer(RawSQLAnalyzer):
+            def analyze_count_where(self):
+                self._extracted_data["where"] = -1
+                return -1
+
+        self.assertIs(RawSQLAnalyzer.get_analyzers(), RawSQLAnalyzer.get_analyzers())
+        self.assertEqual(CustomAnalyzer(self.queries[0]).perform_full_analysis()["where"], -1)
+
+    def test_compact_literals(self):
+        """
+        Tests that compacting literal runs leaves the results unchanged and lets sqlparse
+        handle IN lists and VALUES blocks too large for its grouping limit.
+        """
+        for idx, query in enumerate(self.queries):
+            with self.subTest(query_number=idx+1):
+                analyzer = RawSQLAnalyzer(query, compact_literals=True)
+                self.assertEqual(analyzer.perform_full_analysis(), self.results[idx])
+
+        in_list = ", ".join(str(i) for i in range(20000))
+        query = f"SELECT a, COUNT(b) FROM t JOIN u ON t.id = u.id WHERE a IN ({in_list}) GROUP BY a"
+        self.assertEqual(RawSQLAnalyzer(query, compact_literals=True).perform_full_analysis(),
+                         {"functions": 1, "joins": 1, "subqueries_and_maxdepth": (0, 0), "where": 1,
+                          "query_type": "SELECT", "tables": {"t", "u"}})
+
+        rows = ", ".join(f"({i}, 'name {i}', NULL)" for i in range(200))
+        query = f"INSERT INTO t (id, name, note) VALUES {rows}"
+        self.assertEqual(RawSQLAnalyzer(query, compact_literals=True).perform_full_analysis(),
+                         RawSQLAnalyzer(query).perform_full_analysis())
+
+    def test_budget(self):
+        """
+        Tests that queries over budget get a flagged approximate analysis, that queries
+        within budget are analyzed exactly, and that invalid limits are rejected.
+        """
+        query = "SELECT a FROM t JOIN u ON t.id = u.id WHERE x IN (" + ", ".join(map(str, range(500))) + ")"
+        approximate = {"query_type": "SELECT", "tables": {"t", "u"}, "joins": 1, "approximate": True}
+        for budget in (AnalysisBudget(max_length=1000), AnalysisBudget(max_tokens=1000),
+                       AnalysisBudget(max_seconds=1e-9)):
+            with self.subTest(budget=budget):
+                self.assertEqual(RawSQLAnalyzer(query, budget=budget).perform_full_analysis(), approximate)
+
+        budget = AnalysisBudget(max_length=100000, max_tokens=100000, max_seconds=60)
+        for idx, query in enumerate(self.queries):
+            with self.subTest(query_number=idx+1):
+                self.assertEqual(RawSQLAnalyzer(query, budget=budget).perform_full_analysis(), self.results[idx])
+        with self.assertRaises(ValueError):
+            RawSQLAnalyzer(query, budget=AnalysisBudget(max_tokens=0))
+
+    def test_results_only(self):
+        """
+        Tests that a results-only analyzer releases its tree and texts after the analysis,
+        keeps its results, and refuses to analyze afterwards; and that close works as a
+        context manager.
+        """
+        analyzer = RawSQLAnalyzer(self.queries[0], results_only=True)
+        self.assertEqual(analyzer.perform_full_analysis(), self.results[0])
+        self.assertTrue(analyzer.closed)
+        self.assertEqual(analyzer.results, self.results[0])
+        self.assertIsNone(analyzer.query)
+        self.assertIsNone(analyzer._parsed_query)
+        self.assertIsNone(analyzer._tokens)
+        with self.assertRaises(RuntimeError):
+            analyzer.perform_full_analysis()
+        with self.assertRaises(RuntimeError):
+            analyzer.run_analyzer("analyze_get_tables")
+
+        with RawSQLAnalyzer(self.queries[1]) as analyzer:
+            analyzer.run_analyzer("analyze_count_where")
+            self.assertIsNotNone(analyzer._parsed_query)
+        self.assertTrue(analyzer.closed)
+        self.assertEqual(analyzer.results, {"where": self.results[1]["where"]})
+
+        script = RawSQLAnalyzer(";".join(self.queries[:3]), results_only=True)
+        self.assertEqual(list(script.iter_statement_analyses()), self.results[:3])
+
     def test_init_exception(self):
         """
         Tests that initializing RawSQLAnalyzer with a non-string query raises a ValueError.
@@ -0,0 +1,235 @@
+import unittest
+from pathlib import Path
+import contextlib
+import fcntl
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.runner import (CorpusRunner, _claim, _release, main, run_shard)
+
+class TestCorpusRunner(unittest.TestCase):
+    """
+    The TestCorpusRunner class contains unit tests for the sharded, resumable corpus runner.
+    """
+
+    def setUp(self):
+        """
+        Writes the test queries to three JSONL logs and creates the directory of the run.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        self.inputs = self.root / "logs"
+        self.inputs.mkdir()
+        self.groups = [list(range(start, len(sql_queries), 3)) for start in range(3)]
+        for number, group in enumerate(self.groups):
+            (self.inputs / f"log{number}.jsonl").write_text(
+                "".join(json.dumps({"query": sql_queries[idx]}) + "\n" for idx in group))
+        self.paths = [str(self.inputs / "*.jsonl")]
+        self.run_directory = self.root / "run"
+        self.output = self.root / "merged.ndjson"
+
+    def tearDown(self):
+        """
+        Removes the temporary directory tree.
+        """
+        self.directory.cleanup()
+
+    def expected(self):
+        """
+        Returns the expected results in the order of the merged output.
+        """
+        return [json.loads(json.dumps(results[idx], default=sorted)) for group in self.groups for idx in group]
+
+    def merged(self):
+        """
+        Returns the records of the merged output.
+        """
+        return [json.loads(line) for line in self.output.read_text().splitlines()]
+
+    def test_run_and_merge(self):
+        """
+        Tests that every shard completes, in process and on a pool, and that the merged
+        output holds every statement in input order.
+        """
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                runner = CorpusRunner(self.run_directory / str(workers), checkpoint_every=2)
+                statuses = runner.run(self.paths, workers=workers)
+                self.assertTrue(all(status.complete and status.error is None for status in statuses))
+                self.assertEqual([status.statements for status in statuses], [len(group) for group in self.groups])
+                self.assertEqual(runner.merge(self.output), len(sql_queries))
+                records = self.merged()
+                self.assertEqual([record["result"] for record in records], self.expected())
+                self.assertEqual([record["statement"] for record in records[:3]], [1, 2, 3])
+                self.assertEqual(list(runner.iter_records()), records)
+                leftovers = [name for name in os.listdir(self.run_directory / str(workers) / "shards")
+                             if not name.endswith((".ndjson", ".json"))]
+                self.assertEqual(leftovers, [])
+
+    def test_resume(self):
+        """
+        Tests that a rerun skips complete shards, resumes a partial shard after its last
+        checkpoint, dropping what was written after it, and starts modified inputs over.
+        """
+        runner = CorpusRunner(self.run_directory, checkpoint_every=2)
+        shards = runner.plan(self.paths)
+        options = dict(runner.options, checkpoint_every=2)
+        run_shard(shards[0], str(self.run_directory), options)
+
+        # A crash of the second shard after its first checkpoint, in the middle of a record
+        base = self.run_directory / "shards" / shards[1].id
+        marker = {"source": "resumed", "statement": 0, "result": {}}
+        kept = "".join(json.dumps(dict(marker, statement=number)) + "\n" for number in (1, 2)).encode()
+        Path(f"{base}.ndjson.part").write_bytes(kept + b'{"source": "lost", "sta')
+        Path(f"{base}.json").write_text(json.dumps(
+            {"statements": 2, "failures": 0, "bytes": len(kept), "complete": False}))
+        first_output = (self.run_directory / "shards" / f"{shards[0].id}.ndjson").read_bytes()
+
+        statuses = CorpusRunner(self.run_directory, checkpoint_every=2).run(self.paths, workers=1)
+        self.assertTrue(all(status.complete for status in statuses))
+        self.assertEqual((self.run_directory / "shards" / f"{shards[0].id}.ndjson").read_bytes(), first_output)
+        runner.merge(self.output)
+        records = self.merged()
+        start, end = len(self.groups[0]), len(self.groups[0]) + len(self.groups[1])
+        resumed = records[start:end]
+        self.assertEqual([record["source"] for record in resumed[:2]], ["resumed", "resumed"])
+        self.assertEqual([record["result"] for record in resumed[2:]], self.expected()[start + 2:end])
+        self.assertEqual([record["statement"] for record in resumed], list(range(1, len(self.groups[1]) + 1)))
+
+        # A modified input is analyzed again from its first statement
+        (self.inputs / "log1.jsonl").write_text(json.dumps({"query": "SELECT a FROM changed"}) + "\n")
+        statuses = CorpusRunner(self.run_directory, checkpoint_every=2).run(self.paths, workers=1)
+        self.assertEqual(statuses[1].statements, 1)
+        runner.merge(self.output)
+        self.assertIn({"source": str(self.inputs / "log1.jsonl"), "statement": 1,
+                       "result": {"query_type": "SELECT", "joins": 0, "functions": 0, "where": 0,
+                                  "subqueries_and_maxdepth": [0, 0], "tables": ["changed"]}}, self.merged())
+
+    def test_complete_shard_outputs(self):
+        """
+        Tests that a complete shard finishes an interrupted rename, keeps an existing output,
+        and is started over if both its output and its part file are gone.
+        """
+        runner = CorpusRunner(self.run_directory)
+        shard = runner.plan(self.paths)[0]
+        options = dict(runner.options, checkpoint_every=runner.checkpoint_every)
+        output = self.run_directory / "shards" / f"{shard.id}.ndjson"
+        part = self.run_directory / "shards" / f"{shard.id}.ndjson.part"
+        run_shard(shard, str(self.run_directory), options)
+        content = output.read_bytes()
+
+        # Stopped between the last checkpoint and the rename, then run twice more
+        output.rename(part)
+        for _ in range(2):
+            status = run_shard(shard, str(self.run_directory), options)
+            self.assertTrue(status.complete)
+            self.assertEqual(output.read_bytes(), content)
+            self.assertFalse(part.exists())
+
+        output.unlink()
+        status = run_shard(shard, str(self.run_directory), options)
+        self.assertTrue(status.complete)
+        self.assertEqual(status.statements, len(self.groups[0]))
+        self.assertEqual(output.read_bytes(), content)
+
+    def test_missing_outputs_through_run(self):
+        """
+        Tests that a rerun finishes a shard stopped before the rename of its part file and
+        regenerates a deleted output, so that merge succeeds.
+        """
+        runner = CorpusRunner(self.run_directory)
+        runner.run(self.paths, workers=1)
+        runner.merge(self.output)
+        expected = self.merged()
+
+        shards = self.run_directory / "shards"
+        (shards / "00000.ndjson").rename(shards / "00000.ndjson.part")
+        (shards / "00001.ndjson").unlink()
+        self.assertEqual([status.complete for status in runner.status()], [False, False, True])
+        with self.assertRaises(ValueError):
+            runner.merge(self.output)
+
+        statuses = runner.run(self.paths, workers=1)
+        self.assertTrue(all(status.complete for status in statuses))
+        runner.merge(self.output)
+        self.assertEqual(self.merged(), expected)
+
+    def test_coordination(self):
+        """
+        Tests that a shard locked by a live process is left to it, that a stale lock is
+        taken over, and that runs with other inputs or options are rejected.
+        """
+        runner = CorpusRunner(self.run_directory)
+        shards = runner.plan(self.paths)
+        lock = self.run_directory / "shards" / f"{shards[0].id}.lock"
+        with open(lock, "w") as held:
+            fcntl.flock(held, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            statuses = runner.run(self.paths, workers=1)
+        self.assertEqual([status.complete for status in statuses], [False, True, True])
+        self.assertIsNotNone(statuses[0].error)
+        with self.assertRaises(ValueError):
+            runner.merge(self.output)
+
+        # Left behind by a runner that died while holding the shard
+        lock.write_text(json.dumps({"host": socket.gethostname(), "pid": 2 ** 22 + 1}))
+        with self.assertLogs("sql_analyzer.runner", level="WARNING"):
+            statuses = runner.run(self.paths, workers=1)
+        self.assertTrue(all(status.complete for status in statuses))
+        self.assertFalse(lock.exists())
+
+        with self.assertRaises(ValueError):
+            CorpusRunner(self.run_directory, include=["analyze_get_tables"]).run(self.paths, workers=1)
+        with self.assertRaises(ValueError):
+            runner.run([str(self.inputs / "log0.jsonl")], workers=1)
+
+    def test_lock_is_exclusive(self):
+        """
+        Tests that a shard lock cannot be taken twice, and that a flock kept on a lock file
+        after its holder removed it does not block the next claim.
+        """
+        lock = str(self.root / "shard.lock")
+        descriptor = _claim(lock)
+        self.assertIsNotNone(descriptor)
+        self.assertIsNone(_claim(lock))
+        self.assertEqual(json.loads(Path(lock).read_text())["pid"], os.getpid())
+
+        waiting = os.open(lock, os.O_RDWR)
+        _release(lock, descriptor)
+        self.assertFalse(os.path.exists(lock))
+        fcntl.flock(waiting, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.close(waiting)
+        descriptor = _claim(lock)
+        self.assertIsNotNone(descriptor)
+        self.assertTrue(os.path.exists(lock))
+        _release(lock, descriptor)
+
+    def test_command_line(self):
+        """
+        Tests that the run command takes the analysis budget options of python -m sql_analyzer
+        and rejects limits that are not positive.
+        """
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            status = main(["run", str(self.run_directory), *self.paths, "-w", "1", "--max-length", "10",
+                           "-o", str(self.output)])
+        self.assertEqual(status, 0)
+        self.assertEqual(len(out.getvalue().splitlines()), len(self.groups))
+        manifest = json.loads((self.run_directory / "manifest.json").read_text())
+        self.assertEqual(manifest["options"]["budget"], [10, None, None])
+        self.assertTrue(all(record["result"]["approximate"] for record in self.merged()))
+
+        with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit) as context:
+            main(["run", str(self.root / "other"), *self.paths, "--max-tokens", "0"])
+        self.assertEqual(context.exception.code, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+from pathlib import Path
+import sys
+import csv
+import io
+import json
+import tempfile
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.stream import (split_statements, iter_file_chunks, iter_queries, iter_log_records, analyze_file)
+
+class TestStream(unittest.TestCase):
+    """
+    The TestStream class contains unit tests for the incremental statement splitter and the
+    streaming readers of SQL scripts and query logs.
+    """
+
+    def setUp(self):
+        """
+        Initializes a script exercising quotes, comments and dollar-quoting, and a temporary
+        directory for input files.
+        """
+        self.script = (
+            "SELECT 'a;b''c' FROM t; -- x;y\n"
+            "/* c; */ INSERT INTO \"q;\" VALUES ($$;$$, $fn$ a;$b$ $fn$); ;\n"
+            "CREATE FUNCTION f() AS $body$ BEGIN; END; $body$ LANGUAGE sql;\n"
+            "select `a;` from u -- trailing comment"
+        )
+        self.statements = [
+            "SELECT 'a;b''c' FROM t;",
+            "-- x;y\n/* c; */ INSERT INTO \"q;\" VALUES ($$;$$, $fn$ a;$b$ $fn$);",
+            "CREATE FUNCTION f() AS $body$ BEGIN; END; $body$ LANGUAGE sql;",
+            "select `a;` from u -- trailing comment",
+        ]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name: str, content: str) -> Path:
+        path = Path(self.tmpdir.name) / name
+        path.write_text(content, encoding='utf-8')
+        return path
+
+    def test_split_statements(self):
+        """
+        Tests that semicolons inside quotes, comments and dollar-quoted bodies do not split statements.
+        """
+        self.assertEqual(list(split_statements([self.script])), self.statements)
+
+    def test_split_statements_across_chunks(self):
+        """
+        Tests that splitting does not depend on where the chunk boundaries fall.
+        """
+        for size in (1, 2, 3, 7):
+            with self.subTest(chunk_size=size):
+                chunks = [self.script[i:i + size] for i in range(0, len(self.script), size)]
+                self.assertEqual(list(split_statements(chunks)), self.statements)
+
+    def test_comment_only_statement_is_dropped(self):
+        """
+        Tests that whitespace and comments after the last statement do not produce a statement.
+        """
+        self.assertEqual(list(split_statements(["SELECT 1; -- done\n /* end */ "])), ["SELECT 1;"])
+
+    def test_iter_file_chunks_multibyte(self):
+        """
+        Tests that multi-byte characters split across chunks are decoded correctly, with and without mmap.
+        """
+        path = self.write('unicode.sql', "SELECT 'héllo wörld';")
+        for use_mmap in (True, False):
+            with self.subTest(use_mmap=use_mmap):
+                self.assertEqual(''.join(iter_file_chunks(path, chunk_size=3, use_mmap=use_mmap)),
+                                 "SELECT 'héllo wörld';")
+
+    def test_iter_queries_sql_file(self):
+        """
+        Tests that a SQL script is split into statements when read in small chunks.
+        """
+        path = self.write('script.sql', self.script)
+        self.assertEqual(list(iter_queries(path, chunk_size=5)), self.statements)
+
+    def test_iter_queries_logs(self):
+        """
+        Tests that JSONL and CSV logs yield the query column and skip unusable records.
+        """
+        jsonl = self.write('log.jsonl', '\n'.join([
+            json.dumps({'query': 'SELECT 1', 'user': 'a'}),
+            'not json',
+            json.dumps({'user': 'b'}),
+            json.dumps({'query': 'SELECT 2'}),
+        ]))
+        self.assertEqual(list(iter_queries(jsonl)), ['SELECT 1', 'SELECT 2'])
+
+        path = Path(self.tmpdir.name) / 'log.csv'
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['id', 'sql'])
+            writer.writerow([1, 'SELECT a,\n b FROM t'])
+            writer.writerow([2, 'SELECT 2'])
+        self.assertEqual(list(iter_queries(path, column='sql')), ['SELECT a,\n b FROM t', 'SELECT 2'])
+
+    def test_iter_log_records(self):
+        """
+        Tests that log records keep their line or record number when records before them are skipped.
+        """
+        log = io.StringIO('\n'.join([
+            json.dumps({'query': 'SELECT 1'}),
+            '{"query": ',
+            '',
+            json.dumps({'user': 'b'}),
+            json.dumps({'query': 'SELECT 2'}),
+        ]))
+        with self.assertLogs('sql_analyzer.stream', level='WARNING') as logs:
+            self.assertEqual(list(iter_log_records(log, 'jsonl')), [(1, 'SELECT 1'), (5, 'SELECT 2')])
+        self.assertEqual(len(logs.records), 2)
+
+        log = io.StringIO('sql\nSELECT 1\n""\nSELECT 3\n')
+        self.assertEqual(list(iter_log_records(log, 'csv', 'sql')), [(1, 'SELECT 1'), (2, ''), (3, 'SELECT 3')])
+        with self.assertRaises(ValueError):
+            list(iter_log_records(log, 'xml'))
+
+    def test_analyze_file(self):
+        """
+        Tests that every statement of a script is analyzed in order.
+        """
+        path = self.write('queries.sql', '\n;\n'.join(query.strip().rstrip(';') for query in sql_queries))
+        analyzed = list(analyze_file(path))
+        self.assertEqual([item.index for item in analyzed], list(range(len(sql_queries))))
+        self.assertEqual([item.result for item in analyzed], results)
+
+if __name__ == '__main__':
+    unittest.main()
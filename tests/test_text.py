@@ -0,0 +1,62 @@
+import unittest
+from pathlib import Path
+import os
+import subprocess
+import sys
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer import text
+from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer
+
+class TestText(unittest.TestCase):
+    """
+    The TestText class contains unit tests for the regex-only entry point and the lazy imports.
+    """
+
+    def run_python(self, statement):
+        """
+        Runs a statement in a fresh interpreter from the repository root and returns its stdout.
+        """
+        env = dict(os.environ, PYTHONPATH=str(path_to_append))
+        process = subprocess.run([sys.executable, "-c", statement], capture_output=True, text=True,
+                                 env=env, cwd=path_to_append, check=True)
+        return process.stdout.strip()
+
+    def test_analyze_text(self):
+        """
+        Tests that analyze_text returns the approximate analysis of RawSQLAnalyzer, and the
+        statement types of the full analysis on the test queries.
+        """
+        for query_number, (query, expected) in enumerate(zip(sql_queries, results)):
+            with self.subTest(query_number=query_number):
+                result = text.analyze_text(query)
+                self.assertEqual(result, RawSQLAnalyzer(query).approximate_analysis())
+                self.assertEqual(result["query_type"], expected["query_type"])
+                self.assertTrue(result["approximate"])
+        with self.assertRaises(ValueError):
+            text.analyze_text(None)
+
+    def test_lazy_imports(self):
+        """
+        Tests that the package and the regex-only entry point never import sqlparse, that
+        the parser is loaded by the first analysis that needs it, and that importing the
+        package does not configure logging.
+        """
+        probe = "import sys, logging; print('sqlparse' in sys.modules, bool(logging.getLogger().handlers))"
+        self.assertEqual(self.run_python(f"import sql_analyzer; {probe}"), "False False")
+        self.assertEqual(self.run_python(
+            f"from sql_analyzer import analyze_text; analyze_text('SELECT a FROM t'); {probe}"), "False False")
+        self.assertEqual(self.run_python(
+            "from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer; "
+            f"RawSQLAnalyzer('SELECT a FROM t').approximate_analysis(); {probe}"), "False False")
+        self.assertEqual(self.run_python(
+            "from sql_analyzer.raw_sql_analyzer import RawSQLAnalyzer; "
+            f"RawSQLAnalyzer('SELECT a FROM t').perform_full_analysis(); {probe}"), "True False")
+
+if __name__ == '__main__':
+    unittest.main()
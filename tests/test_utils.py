@@ -0,0 +1,186 @@
+import unittest
+from pathlib import Path
+import sys
+import time
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sqlparse import sql
+from sqlparse import tokens as T
+
+from sql_analyzer import utils
+from queries import sql_queries
+from sql_analyzer.backends import DEFAULT_BACKEND
+
+# Wall-clock budget for each stress test, in seconds
+TIME_BUDGET = 5.0
+
+
+def nested_subqueries(depth: int) -> sql.Statement:
+    """
+    Builds the tree of 'SELECT (SELECT (... (SELECT 1) ...))' with the given nesting depth,
+    without going through sqlparse, whose grouping pass limits nesting depth.
+    """
+    inner = sql.Parenthesis([
+        sql.Token(T.Punctuation, '('), sql.Token(T.Keyword.DML, 'SELECT'),
+        sql.Token(T.Whitespace, ' '), sql.Token(T.Number.Integer, '1'), sql.Token(T.Punctuation, ')'),
+    ])
+    for _ in range(depth - 1):
+        inner = sql.Parenthesis([
+            sql.Token(T.Punctuation, '('), sql.Token(T.Keyword.DML, 'SELECT'),
+            sql.Token(T.Whitespace, ' '), inner, sql.Token(T.Punctuation, ')'),
+        ])
+    return sql.Statement([sql.Token(T.Keyword.DML, 'SELECT'), sql.Token(T.Whitespace, ' '), inner])
+
+
+def wide_statement(n_tokens: int) -> sql.Statement:
+    """
+    Builds a flat 'SELECT f(c), f(c), ...' statement with roughly n_tokens tokens.
+    """
+    tokens = [sql.Token(T.Keyword.DML, 'SELECT'), sql.Token(T.Whitespace, ' ')]
+    while len(tokens) < n_tokens:
+        tokens.append(sql.Function([
+            sql.Identifier([sql.Token(T.Name, 'f')]),
+            sql.Parenthesis([sql.Token(T.Punctuation, '('), sql.Token(T.Name, 'c'), sql.Token(T.Punctuation, ')')]),
+        ]))
+        tokens.append(sql.Token(T.Punctuation, ','))
+    return sql.Statement(tokens)
+
+
+class TestUtils(unittest.TestCase):
+    """
+    The TestUtils class contains unit tests for the traversal helpers in utils, including
+    stress tests on deeply nested and very long statements.
+    """
+
+    def test_search_tokens_document_order(self):
+        """
+        Tests that 'search_tokens' returns matching tokens in document order.
+        """
+        statement = nested_subqueries(3)
+        found = utils.search_tokens(statement, lambda token: token.ttype is T.Keyword.DML)
+        self.assertEqual(len(found), 4)
+        self.assertIs(found[0], statement.tokens[0])
+        numbers = utils.search_tokens(statement, lambda token: token.ttype is T.Number.Integer)
+        self.assertEqual([token.value for token in numbers], ['1'])
+
+    def test_token_index(self):
+        """
+        Tests that the token index answers the find_* lookups like a walk of the tree, in
+        document order, and caches its answers on the statement.
+        """
+        for query_number, query in enumerate(sql_queries):
+            with self.subTest(query_number=query_number):
+                statement = DEFAULT_BACKEND.parse(query)
+                index = utils.token_index(statement)
+                self.assertIs(utils.token_index(statement), index)
+                leaves = [token for token in index.tokens if not token.is_group]
+                self.assertEqual(leaves, list(statement.flatten()))
+                for element_type in (sql.Function, sql.Where, sql.Parenthesis, sql.TokenList):
+                    expected = [token for token in index.tokens if isinstance(token, element_type)]
+                    self.assertEqual(utils.find_by_type(statement, element_type), expected)
+                self.assertIs(index.find_by_type(sql.Function), index.find_by_type(sql.Function))
+                joins = [token for token in leaves if token.ttype is T.Keyword and 'join' in token.value.lower()]
+                self.assertEqual(utils.find_by_ttype_and_values(statement, T.Keyword, utils.JOIN_KEYWORDS), joins)
+                self.assertEqual(utils.find_by_value(statement, 'select'),
+                                 [token for token in index.tokens if token.value.upper() == 'SELECT'])
+                self.assertEqual(index.find_by_ttype(T.Keyword.DML),
+                                 tuple(token for token in leaves if token.ttype is T.Keyword.DML))
+
+        statement = nested_subqueries(3)
+        self.assertEqual(len(utils.token_index(statement)), 18)
+        self.assertEqual(utils.find_by_type(statement, sql.Parenthesis)[0], statement.tokens[2])
+        self.assertEqual(utils.find_by_value(statement, 'nothing'), [])
+
+    def test_count_subqueries_and_depth(self):
+        """
+        Tests the subquery count and depth of a small nested statement.
+        """
+        self.assertEqual(utils.count_subqueries_and_depth(nested_subqueries(3)), (3, 3))
+        self.assertEqual(utils.count_subqueries_and_depth(nested_subqueries(3).tokens, 2), (3, 5))
+
+    def test_extract_tables_from_tokens(self):
+        """
+        Tests that the token-based extractor resolves tables in FROM lists, joins, subqueries,
+        DML statements and the USING of DELETE and MERGE while skipping CTE names, aliases, table functions, literals and comments.
+        """
+        cases = [
+            ("WITH c (a) AS (SELECT a FROM base), d AS (SELECT * FROM c) SELECT * FROM d JOIN dim ON 1 = 1",
+             {'base', 'dim'}),
+            ("SELECT * FROM a AS x, b y JOIN s.c ON x.id = s.c.id, d WHERE z IN (SELECT q FROM e, f)",
+             {'a', 'b', 's.c', 'd', 'e', 'f'}),
+            ("SELECT EXTRACT(YEAR FROM ts) FROM ONLY events, generate_series(1, 3) g", {'events'}),
+            ("SELECT 'FROM fake' FROM (SELECT * FROM inner_t) sub, outer_t -- JOIN other", {'inner_t', 'outer_t'}),
+            ("INSERT INTO \"Orders\" (id) VALUES (1)", {'"Orders"'}),
+            ("UPDATE a SET x = (SELECT 1 FROM b) FROM c", {'a', 'b', 'c'}),
+            ("MERGE INTO t USING s ON t.id = s.id WHEN MATCHED THEN UPDATE SET a = 1 "
+             "WHEN NOT MATCHED THEN INSERT (a) VALUES (1)", {'t', 's'}),
+            ("MERGE INTO t USING (SELECT id FROM src) s ON t.id = s.id WHEN MATCHED THEN DELETE", {'t', 'src'}),
+            ("DELETE FROM t USING u, v WHERE t.id = u.id", {'t', 'u', 'v'}),
+            ("SELECT * FROM a JOIN b USING (id)", {'a', 'b'}),
+        ]
+        for query, expected in cases:
+            with self.subTest(query=query):
+                self.assertEqual(utils.extract_tables_from_tokens(DEFAULT_BACKEND.tokenize(query)), expected)
+
+    def test_deep_nesting_stress(self):
+        """
+        Tests that 1000 levels of nesting are traversed without RecursionError within the time budget.
+        """
+        statement = nested_subqueries(1000)
+        start = time.perf_counter()
+        self.assertEqual(utils.count_subqueries_and_depth(statement), (1000, 1000))
+        self.assertEqual(len(utils.find_by_type(statement, sql.Parenthesis)), 1000)
+        metrics = utils.collect_statement_metrics(statement)
+        self.assertEqual((metrics['subqueries'], metrics['max_depth']), (1000, 1000))
+        self.assertLess(time.perf_counter() - start, TIME_BUDGET)
+
+    def test_many_tokens_stress(self):
+        """
+        Tests that a statement with 100k tokens is traversed within the time budget.
+        """
+        statement = wide_statement(100000)
+        start = time.perf_counter()
+        self.assertEqual(len(utils.find_by_type(statement, sql.Function)), 49999)
+        self.assertEqual(utils.count_subqueries_and_depth(statement), (0, 0))
+        self.assertEqual(utils.collect_statement_metrics(statement)['functions'], 49999)
+        self.assertLess(time.perf_counter() - start, TIME_BUDGET)
+
+    def test_compact_literal_runs(self):
+        """
+        Tests that long IN lists and VALUES blocks collapse to their first element while
+        short lists, strings, comments and identifiers are left untouched.
+        """
+        in_list = ", ".join(str(i) for i in range(100))
+        self.assertEqual(utils.compact_literal_runs(f"SELECT * FROM t WHERE id IN ({in_list})"),
+                         "SELECT * FROM t WHERE id IN (0)")
+        rows = ", ".join(f"({i}, 'x{i}', NULL)" for i in range(50))
+        self.assertEqual(utils.compact_literal_runs(f"INSERT INTO t VALUES {rows};"),
+                         "INSERT INTO t VALUES (0, 'x0', NULL);")
+        for query in ("SELECT * FROM t WHERE id IN (1, 2, 3)",
+                      f"SELECT '{in_list}' FROM t -- {in_list}",
+                      f"SELECT {', '.join(f'c{i}' for i in range(100))} FROM t"):
+            self.assertEqual(utils.compact_literal_runs(query), query)
+        self.assertEqual(utils.compact_literal_runs("SELECT 1, 2, 3", min_run=3), "SELECT 1")
+        with self.assertRaises(ValueError):
+            utils.compact_literal_runs("SELECT 1", min_run=1)
+
+    def test_text_approximations(self):
+        """
+        Tests that the statement type and JOIN count read from the raw text agree with
+        the token-based functions on the test queries, ignoring strings and comments.
+        """
+        for idx, query in enumerate(sql_queries):
+            with self.subTest(query_number=idx+1):
+                tokens = DEFAULT_BACKEND.tokenize(query)
+                self.assertEqual(utils.get_statement_type_from_text(query), utils.get_statement_type(tokens))
+                self.assertEqual(utils.count_join_keywords(query), utils.count_join_tokens(tokens))
+        query = "-- JOIN\nWITH c AS (SELECT 'JOIN' FROM t) INSERT INTO u SELECT * FROM c JOIN v ON c.a = v.a"
+        self.assertEqual(utils.get_statement_type_from_text(query), "INSERT")
+        self.assertEqual(utils.count_join_keywords(query), 1)
+        self.assertEqual(utils.get_statement_type_from_text("GRANT SELECT ON t TO u"), "UNKNOWN")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+import unittest
+from pathlib import Path
+import pickle
+import random
+import sys
+from queries import sql_queries
+from results import results
+
+# Append the parent directory of the current working directory to the system path
+path_to_append: Path = Path.cwd().resolve().parent
+sys.path.append(str(path_to_append))
+
+from sql_analyzer.batch import analyze_many
+from sql_analyzer.sketches import (CountMinSketch, HeavyHitters, HyperLogLog, Histogram)
+from sql_analyzer.workload import WorkloadAggregator
+
+class TestSketches(unittest.TestCase):
+    """
+    The TestSketches class contains unit tests for the count-min, heavy hitters,
+    HyperLogLog and histogram sketches.
+    """
+
+    def test_count_min_never_undercounts(self):
+        """
+        Tests that count-min estimates are upper bounds and close to the true counts.
+        """
+        rng = random.Random(0)
+        counts = {}
+        sketch = CountMinSketch(width=512, depth=4)
+        for _ in range(20000):
+            item = f"table{int(rng.paretovariate(1.2))}"
+            counts[item] = counts.get(item, 0) + 1
+            sketch.add(item)
+        for item, count in counts.items():
+            self.assertGreaterEqual(sketch.estimate(item), count)
+            self.assertLessEqual(sketch.estimate(item), count + 2.72 / 512 * sketch.total * 3)
+
+    def test_merges_are_exact(self):
+        """
+        Tests that merging sketches of two halves of a stream gives the sketch of the whole stream.
+        """
+        items = [f"item{i % 997}" for i in range(5000)]
+        whole, first, second = CountMinSketch(256, 3), CountMinSketch(256, 3), CountMinSketch(256, 3)
+        hll_whole, hll_first, hll_second = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+        hist_whole, hist_first, hist_second = Histogram(8), Histogram(8), Histogram(8)
+        for position, item in enumerate(items):
+            whole.add(item)
+            hll_whole.add(item)
+            hist_whole.add(position % 11)
+            (first if position % 2 else second).add(item)
+            (hll_first if position % 2 else hll_second).add(item)
+            (hist_first if position % 2 else hist_second).add(position % 11)
+        first.merge(second)
+        hll_first.merge(hll_second)
+        hist_first.merge(hist_second)
+        self.assertEqual(first._counters, whole._counters)
+        self.assertEqual(hll_first._registers, hll_whole._registers)
+        self.assertEqual(hist_first.buckets(), hist_whole.buckets())
+        with self.assertRaises(ValueError):
+            first.merge(CountMinSketch(128, 3))
+
+    def test_hyperloglog_accuracy(self):
+        """
+        Tests that distinct counts are within a few standard errors, for small and large cardinalities.
+        """
+        for cardinality in (10, 1000, 50000):
+            with self.subTest(cardinality=cardinality):
+                sketch = HyperLogLog(12)
+                for i in range(cardinality):
+                    sketch.add(f"SELECT * FROM t WHERE c{i} = ?")
+                    sketch.add(f"SELECT * FROM t WHERE c{i} = ?")
+                self.assertAlmostEqual(sketch.count() / cardinality, 1.0, delta=0.05)
+
+    def test_heavy_hitters(self):
+        """
+        Tests that the most frequent items are found in order.
+        """
+        tracker = HeavyHitters(k=3, width=1024)
+        for i in range(1, 50):
+            tracker.add(f"rare{i}")
+        for count, item in ((300, "orders"), (200, "users"), (100, "items")):
+            tracker.add(item, count)
+        self.assertEqual([item for item, _ in tracker.top()], ["orders", "users", "items"])
+
+    def test_histogram_quantiles(self):
+        """
+        Tests histogram statistics, the overflow bucket and that missing values are ignored.
+        """
+        histogram = Histogram(max_value=4)
+        for value in [0, 1, 1, 2, 3, 9, -1]:
+            histogram.add(value)
+        self.assertEqual(histogram.count, 6)
+        self.assertEqual(histogram.buckets(), {0: 1, 1: 2, 2: 1, 3: 1, ">=4": 1})
+        self.assertEqual(histogram.quantile(0.5), 1)
+        self.assertEqual(histogram.quantile(1.0), 9)
+
+class TestWorkloadAggregator(unittest.TestCase):
+    """
+    The TestWorkloadAggregator class contains unit tests for the streaming workload aggregator.
+    """
+
+    def setUp(self):
+        """
+        Initializes the SQL queries and expected results used in the tests.
+        """
+        self.queries = sql_queries
+        self.results = results
+
+    def test_report(self):
+        """
+        Tests the workload facts reported for the test queries.
+        """
+        aggregator = WorkloadAggregator(top_k=5)
+        for query, result in zip(self.queries, self.results):
+            aggregator.add(result, query)
+        report = aggregator.report(top_n=3)
+
+        table_counts = {}
+        for result in self.results:
+            for table in result["tables"]:
+                table_counts[table] = table_counts.get(table, 0) + 1
+        self.assertEqual(report["queries"], len(self.queries))
+        self.assertEqual(report["query_types"], {"SELECT": 8, "INSERT": 2, "UPDATE": 3, "DELETE": 2})
+        self.assertEqual(report["distinct_tables"], len(table_counts))
+        top_table, top_count = report["top_tables"][0]
+        self.assertEqual(top_count, max(table_counts.values()))
+        self.assertEqual(table_counts[top_table], top_count)
+        self.assertEqual(report["subquery_depth"]["max"], 3)
+        self.assertEqual(sum(report["joins"]["buckets"].values()), len(self.queries))
+        self.assertTrue(all(", " in pair for pair, _ in report["top_co_accessed_tables"]))
+        self.assertEqual(report["distinct_templates"], len(set(self.queries)))
+
+    def test_shards_merge(self):
+        """
+        Tests that aggregating shards in worker processes and merging them matches a single aggregator.
+        """
+        single = WorkloadAggregator().add_results(analyze_many(self.queries, workers=1))
+        shards = [WorkloadAggregator().add_results(analyze_many(self.queries[start::3], workers=1))
+                  for start in range(3)]
+        merged = pickle.loads(pickle.dumps(shards[0]))
+        for shard in shards[1:]:
+            merged.merge(shard)
+        self.assertEqual(merged.report(), single.report())
+
+    def test_failed_merge_leaves_aggregator_unchanged(self):
+        """
+        Tests that merging an aggregator built with other sketch parameters raises ValueError
+        before anything is merged.
+        """
+        aggregator = WorkloadAggregator().add_results(analyze_many(self.queries, workers=1))
+        report = aggregator.report()
+        for options in ({"width": 1024}, {"depth": 3}, {"precision": 10}, {"max_histogram_value": 32},
+                        {"max_pair_tables": 4}):
+            with self.subTest(options=options):
+                other = WorkloadAggregator(**options).add_results(analyze_many(self.queries, workers=1))
+                with self.assertRaises(ValueError):
+                    aggregator.merge(other)
+                self.assertEqual(aggregator.report(), report)
+
+    def test_co_accessed_tables(self):
+        """
+        Tests that pairs are counted for every query accessing several tables, but not for
+        queries over max_pair_tables tables.
+        """
+        aggregator = WorkloadAggregator(max_pair_tables=3)
+        aggregator.add({"tables": {"a", "b"}, "joins": 0})
+        aggregator.add({"tables": {"a", "b", "c"}, "joins": 1})
+        aggregator.add({"tables": {f"t{n}" for n in range(100)}, "joins": 99})
+        self.assertEqual(dict(aggregator.report()["top_co_accessed_tables"]), {"a, b": 2, "a, c": 1, "b, c": 1})
+        with self.assertRaises(ValueError):
+            aggregator.merge(WorkloadAggregator())
+
+    def test_templates_from_results(self):
+        """
+        Tests that add_results counts templates when the queries are given.
+        """
+        queries = [f"SELECT a FROM t WHERE id = {n}" for n in range(5)] + ["SELECT b FROM u", 1908]
+        aggregator = WorkloadAggregator().add_results(analyze_many(queries, workers=1), queries)
+        self.assertEqual(aggregator.failures, 1)
+        self.assertEqual(aggregator.report()["top_templates"][0], ("SELECT a FROM t WHERE id = ?", 5))
+        self.assertEqual(aggregator.report()["distinct_templates"], 2)
+        self.assertEqual(WorkloadAggregator().add_results(analyze_many(queries, workers=1)).report()["top_templates"], [])
+
+    def test_failures_counted(self):
+        """
+        Tests that failed analyses are counted and skipped.
+        """
+        aggregator = WorkloadAggregator().add_results(analyze_many([self.queries[0], 1908], workers=1))
+        self.assertEqual((aggregator.queries, aggregator.failures), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()